@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+from collections import deque
 from collections.abc import Callable, Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
+from itertools import islice
 from typing import Generic, TypeVar
 
 I = TypeVar("I")
@@ -30,10 +33,17 @@ class Generator(Generic[I]):
         return Generator(supplier, expected_length)
 
     @staticmethod
-    def from_list(l: list[L], map_fn: Callable[[L, int], I]) -> Generator[I]:
+    def from_list(
+        l: list[L], map_fn: Callable[[L, int], I], workers: int = 0
+    ) -> Generator[I]:
         """
         Creates a new generator from a list that is mapped using the given
         function. The iterable will be equivalent to `map(map_fn, l)`.
+
+        If `workers` is positive, items are mapped on a thread pool with that many
+        threads, up to `workers` items ahead of the consumer. Items are still
+        yielded in order. This is useful if `map_fn` is slow and releases the GIL,
+        e.g. when reading and decoding files.
         """
 
         def supplier():
@@ -43,7 +53,26 @@ class Generator(Generic[I]):
                 except Exception as e:
                     yield e
 
-        return Generator(supplier, len(l))
+        def parallel_supplier():
+            with ThreadPoolExecutor(workers, thread_name_prefix="generator") as pool:
+                items = enumerate(l)
+                pending: deque[Future[I]] = deque()
+                try:
+                    while True:
+                        for i, x in islice(items, workers + 1 - len(pending)):
+                            pending.append(pool.submit(map_fn, x, i))
+                        if not pending:
+                            break
+                        try:
+                            yield pending.popleft().result()
+                        except Exception as e:
+                            yield e
+                finally:
+                    # the consumer might stop early
+                    for f in pending:
+                        f.cancel()
+
+        return Generator(supplier if workers <= 0 else parallel_supplier, len(l))
 
     @staticmethod
     def from_range(count: int, map_fn: Callable[[int], I]) -> Generator[I]:
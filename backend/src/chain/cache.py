@@ -1,7 +1,11 @@
 from __future__ import annotations
 
-import gc
-from collections.abc import Iterable
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from pathlib import Path
 from typing import Generic, TypeVar
 
 from api import NodeId
@@ -77,82 +81,283 @@ def get_cache_strategies(chain: Chain) -> dict[NodeId, CacheStrategy]:
 T = TypeVar("T")
 
 
+def get_value_size(value: object) -> int:
+    """
+    Returns the number of bytes held by the array buffers (anything with an integer
+    `nbytes`, e.g. numpy arrays) in the given value. Lists, tuples, and dict values
+    are searched recursively. Everything else is counted as 0 bytes.
+    """
+    if isinstance(value, (list, tuple)):
+        return sum(get_value_size(v) for v in value)
+    if isinstance(value, dict):
+        return sum(get_value_size(v) for v in value.values())
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    return 0
+
+
 class _CacheEntry(Generic[T]):
-    def __init__(self, value: T, hits_to_live: int):
-        assert hits_to_live > 0
-        self.value: T = value
-        self.hits_to_live: int = hits_to_live
+    def __init__(
+        self,
+        value: T,
+        hits_to_live: int | None,
+        size: int,
+        cost: float,
+        recomputable: bool = True,
+    ):
+        assert hits_to_live is None or hits_to_live > 0
+        self.value: T | None = value
+        self.hits_to_live: int | None = hits_to_live
+        """The remaining hits of counted entries. `None` for static entries."""
+        self.size: int = size
+        self.cost: float = cost
+        self.priority: float = 0
+        self.spill_path: str | None = None
+        """The file the value was moved to. The value is `None` while spilled."""
+        self.recomputable: bool = recomputable
+        """
+        Whether the value can be dropped and computed again. Entries that can't
+        (e.g. the current item of an iterator) are only spilled.
+        """
+
+    @property
+    def static(self) -> bool:
+        return self.hits_to_live is None
 
 
 class OutputCache(Generic[T]):
+    """
+    A cache for the outputs of nodes.
+
+    If `max_bytes` is set, the cache keeps the bytes of all entries (as returned by
+    `size_of`) in memory below that budget. Entries are evicted using the
+    GreedyDual-Size policy: every entry has a priority of `L + cost / size`, where
+    `cost` is the time it took to compute the value and `L` is the priority of the
+    last evicted entry. Accessing an entry refreshes its priority. So cold entries
+    that are large and cheap to recompute go first, and entries with equal
+    priority are evicted least recently used first.
+
+    Evicted entries are written to `spill_dir` if given and loaded again when
+    accessed. Otherwise, they are dropped and the node will be computed again.
+    Entries set with `recomputable=False` (e.g. the current item of an iterator
+    or outputs of nodes with side effects) are only spilled, never dropped. Entries with a size of 0
+    (e.g. generator outputs) are never evicted.
+    """
+
     def __init__(
         self,
         parent: OutputCache[T] | None = None,
         static_data: dict[NodeId, T] | None = None,
+        max_bytes: int | None = None,
+        spill_dir: str | Path | None = None,
+        size_of: Callable[[T], int] = get_value_size,
     ):
         super().__init__()
-        self.__static: dict[NodeId, T] = static_data.copy() if static_data else {}
-        self.__counted: dict[NodeId, _CacheEntry[T]] = {}
+        self.__entries: OrderedDict[NodeId, _CacheEntry[T]] = OrderedDict()
         self.parent: OutputCache[T] | None = parent
+        self.max_bytes: int | None = max_bytes
+        self.spill_dir: Path | None = Path(spill_dir) if spill_dir else None
+        self.__size_of = size_of
+        self.__memory_bytes = 0
+        self.__clock: float = 0
+
+        if static_data:
+            for node_id, value in static_data.items():
+                self.__insert(node_id, _CacheEntry(value, None, 0, 0))
+
+    @property
+    def memory_bytes(self) -> int:
+        """The number of bytes of all entries currently held in memory."""
+        return self.__memory_bytes
 
     def keys(self) -> set[NodeId]:
-        keys: set[NodeId] = set()
-        keys.update(self.__static.keys(), self.__counted.keys())
+        keys: set[NodeId] = set(self.__entries.keys())
         if self.parent:
             keys.update(self.parent.keys())
         return keys
 
     def has(self, node_id: NodeId) -> bool:
-        if node_id in self.__static or node_id in self.__counted:
+        if node_id in self.__entries:
             return True
         if self.parent:
             return self.parent.has(node_id)
         return False
 
+    def is_spilled(self, node_id: NodeId) -> bool:
+        entry = self.__entries.get(node_id, None)
+        return entry is not None and entry.spill_path is not None
+
     def get(self, node_id: NodeId) -> T | None:
-        static_value = self.__static.get(node_id, None)
-        if static_value is not None:
-            return static_value
-
-        counted = self.__counted.get(node_id, None)
-        if counted is not None:
-            value = counted.value
-            counted.hits_to_live -= 1
-            if counted.hits_to_live <= 0:
-                logger.debug("Hits to live reached 0 for %s", node_id)
-                del self.__counted[node_id]
-                gc.collect()
-            return value
+        entry = self.__entries.get(node_id, None)
+        if entry is not None:
+            value = self.__load(node_id, entry)
+            if value is None:
+                # the spill file could not be read, so the value is lost
+                self.delete(node_id)
+            elif entry.hits_to_live is not None:
+                entry.hits_to_live -= 1
+                if entry.hits_to_live <= 0:
+                    logger.debug("Hits to live reached 0 for %s", node_id)
+                    self.delete(node_id)
+                    return value
+
+            if value is not None:
+                self.__touch(node_id, entry)
+                self.__make_room(node_id)
+                return value
 
         if self.parent is not None:
             return self.parent.get(node_id)
 
         return None
 
-    def set(self, node_id: NodeId, value: T, strategy: CacheStrategy):
+    def set(
+        self,
+        node_id: NodeId,
+        value: T,
+        strategy: CacheStrategy,
+        cost: float = 0,
+        recomputable: bool = True,
+    ):
+        """
+        Caches the given value. `cost` is the time (in seconds) it took to compute
+        the value and is used to decide what to evict when over budget.
+
+        If `recomputable` is false (e.g. the value is the current item of an
+        iterator, or the node has side effects), the value is never dropped to stay
+        within budget.
+        """
         if strategy.no_caching:
             return
-        elif strategy.static:
-            self.__static[node_id] = value
-        else:
-            self.__counted[node_id] = _CacheEntry(value, strategy.hits_to_live)
+
+        self.delete(node_id)
+        hits_to_live = None if strategy.static else strategy.hits_to_live
+        size = self.__size_of(value)
+        self.__insert(
+            node_id, _CacheEntry(value, hits_to_live, size, cost, recomputable)
+        )
+        self.__make_room(node_id)
 
     def delete(self, node_id: NodeId):
-        if node_id in self.__static:
-            del self.__static[node_id]
-        if node_id in self.__counted:
-            del self.__counted[node_id]
+        entry = self.__entries.pop(node_id, None)
+        if entry is None:
+            return
+        if entry.spill_path is not None:
+            _remove_file(entry.spill_path)
+        else:
+            self.__memory_bytes -= entry.size
 
     def delete_many(self, node_ids: Iterable[NodeId]):
         for node_id in node_ids:
             self.delete(node_id)
 
     def clear(self):
-        self.__static.clear()
-        self.__counted.clear()
+        for entry in self.__entries.values():
+            if entry.spill_path is not None:
+                _remove_file(entry.spill_path)
+        self.__entries.clear()
+        self.__memory_bytes = 0
+        self.__clock = 0
 
     def get_hits_to_live(self, node_id: NodeId) -> int | None:
-        counted = self.__counted.get(node_id, None)
-        if counted is not None:
-            return counted.hits_to_live
+        entry = self.__entries.get(node_id, None)
+        if entry is not None:
+            return entry.hits_to_live
         return None
+
+    def __insert(self, node_id: NodeId, entry: _CacheEntry[T]):
+        self.__entries[node_id] = entry
+        self.__memory_bytes += entry.size
+        self.__touch(node_id, entry)
+
+    def __touch(self, node_id: NodeId, entry: _CacheEntry[T]):
+        entry.priority = self.__clock + entry.cost / max(entry.size, 1)
+        self.__entries.move_to_end(node_id)
+
+    def __make_room(self, keep: NodeId):
+        """Evicts entries until the in-memory entries fit the byte budget."""
+        if self.max_bytes is None:
+            return
+
+        kept: set[NodeId] = set()
+        while self.__memory_bytes > self.max_bytes:
+            victim_id: NodeId | None = None
+            victim: _CacheEntry[T] | None = None
+            # entries are ordered from least to most recently used, so ties of the
+            # priority are broken in favor of evicting the least recently used
+            for node_id, entry in self.__entries.items():
+                if node_id == keep or entry.size == 0 or entry.spill_path is not None:
+                    continue
+                if node_id in kept or (
+                    self.spill_dir is None and not entry.recomputable
+                ):
+                    continue
+                if victim is None or entry.priority < victim.priority:
+                    victim_id, victim = node_id, entry
+
+            if victim_id is None or victim is None:
+                # nothing left to evict
+                return
+
+            if self.__evict(victim_id, victim):
+                self.__clock = victim.priority
+            else:
+                kept.add(victim_id)
+
+    def __evict(self, node_id: NodeId, entry: _CacheEntry[T]) -> bool:
+        """Moves the entry out of memory. Returns whether this succeeded."""
+        if self.spill_dir is not None:
+            try:
+                self.spill_dir.mkdir(parents=True, exist_ok=True)
+                fd, path = tempfile.mkstemp(
+                    prefix=f"{node_id}-", suffix=".pickle", dir=self.spill_dir
+                )
+                try:
+                    with os.fdopen(fd, "wb") as f:
+                        pickle.dump(entry.value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                except BaseException:
+                    _remove_file(path)
+                    raise
+            except Exception as e:
+                logger.warning("Unable to spill cached output of %s: %s", node_id, e)
+            else:
+                logger.debug("Spilled %s bytes of %s to %s", entry.size, node_id, path)
+                entry.value = None
+                entry.spill_path = path
+                self.__memory_bytes -= entry.size
+                return True
+
+        if not entry.recomputable:
+            # keep the value, it would be lost otherwise
+            return False
+
+        logger.debug("Evicting %s bytes of %s", entry.size, node_id)
+        self.delete(node_id)
+        return True
+
+    def __load(self, node_id: NodeId, entry: _CacheEntry[T]) -> T | None:
+        if entry.spill_path is None:
+            return entry.value
+
+        path = entry.spill_path
+        try:
+            with open(path, "rb") as f:
+                value: T = pickle.load(f)
+        except Exception as e:
+            logger.warning("Unable to load spilled output of %s: %s", node_id, e)
+            return None
+        finally:
+            _remove_file(path)
+
+        entry.value = value
+        entry.spill_path = None
+        self.__memory_bytes += entry.size
+        return value
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -9,6 +9,7 @@ from typing import Literal, TypedDict
 
 import navi
 from api import BroadcastData, ErrorValue, InputId, IterOutputId, NodeId, OutputId
+from profiler import NodeProfileSummaryData
 
 # General events
 
@@ -110,6 +111,31 @@ class NodeFinishEvent(TypedDict):
     data: NodeFinishData
 
 
+class NodeProfileEvent(TypedDict):
+    event: Literal["node-profile"]
+    data: NodeProfileSummaryData
+
+
+class LineageStartData(TypedDict):
+    lineage: int
+    nodes: list[NodeId]
+
+
+class LineageStartEvent(TypedDict):
+    event: Literal["lineage-start"]
+    data: LineageStartData
+
+
+class LineageFinishData(TypedDict):
+    lineage: int
+    executionTime: float
+
+
+class LineageFinishEvent(TypedDict):
+    event: Literal["lineage-finish"]
+    data: LineageFinishData
+
+
 ExecutionEvent = (
     ExecutionErrorEvent
     | ChainStartEvent
@@ -117,6 +143,9 @@ ExecutionEvent = (
     | NodeProgressUpdateEvent
     | NodeBroadcastEvent
     | NodeFinishEvent
+    | NodeProfileEvent
+    | LineageStartEvent
+    | LineageFinishEvent
 )
 
 
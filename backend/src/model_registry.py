@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Sequence
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, TypeVar
+
+from logger import logger
+
+T = TypeVar("T")
+
+ModelKey = tuple[Hashable, ...]
+
+
+def _hash_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(1024 * 1024)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@dataclass
+class _Entry:
+    key: ModelKey
+    name: str
+    size: int
+    model: Any
+    """The model, or `None` if it is only kept alive by its users."""
+    weak: weakref.ref[Any] | None
+    loaded_at: float = field(default_factory=time.time)
+    last_access: float = field(default_factory=time.time)
+    uses: int = 1
+
+    def get(self) -> Any:
+        if self.model is not None:
+            return self.model
+        if self.weak is not None:
+            return self.weak()
+        return None
+
+
+class ModelRegistry:
+    """
+    A process-wide registry of loaded models.
+
+    Models are keyed by the content of their files and the options they were
+    loaded with (e.g. device and precision), so loading the same model file
+    several times (from multiple nodes, or again on the next run) returns the same
+    model object instead of deserializing another copy.
+
+    The registry keeps recently used models alive until their total size exceeds
+    `max_bytes`. Least recently used models are released first. Released models
+    that are still used elsewhere (e.g. by the output cache of a chain) remain
+    registered, so they are not loaded a second time while they are alive.
+    """
+
+    def __init__(self, max_bytes: int | None = None):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[ModelKey, _Entry] = OrderedDict()
+        # reentrant, because releasing a model might run the weakref callback
+        self._lock = threading.RLock()
+        self._key_locks: dict[ModelKey, threading.Lock] = {}
+        self._hashes: dict[tuple[str, int, int], str] = {}
+
+    def file_key(self, paths: Sequence[Path | str], **options: Hashable) -> ModelKey:
+        """
+        Returns the key of a model loaded from the given files with the given
+        options.
+
+        The key uses the content hash of the files, which is only computed again
+        if the path, size, or modification time of a file changes.
+        """
+        hashes: list[str] = []
+        for path in paths:
+            stat = os.stat(path)
+            file_id = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+            with self._lock:
+                digest = self._hashes.get(file_id)
+            if digest is None:
+                digest = _hash_file(Path(path))
+                with self._lock:
+                    self._hashes[file_id] = digest
+            hashes.append(digest)
+        return (*hashes, *sorted(options.items()))
+
+    def get_or_load(
+        self,
+        key: ModelKey,
+        load: Callable[[], T],
+        size_of: Callable[[T], int],
+        name: str = "",
+    ) -> T:
+        """
+        Returns the registered model with the given key, or loads and registers it.
+
+        Concurrent calls with the same key only load the model once.
+        """
+        model = self.get(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            try:
+                # another thread might have loaded the model in the meantime
+                model = self.get(key)
+                if model is not None:
+                    return model
+
+                model = load()
+                self._add(key, model, size_of(model), name)
+                return model
+            finally:
+                with self._lock:
+                    if self._key_locks.get(key) is key_lock:
+                        del self._key_locks[key]
+
+    def get(self, key: ModelKey) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            model = entry.get()
+            if model is None:
+                del self._entries[key]
+                return None
+
+            entry.uses += 1
+            entry.last_access = time.time()
+            self._entries.move_to_end(key)
+            if entry.model is None:
+                # the model is in use again, so keep it around
+                entry.model = model
+                self._enforce_limit()
+            return model
+
+    def key_of(self, model: object) -> ModelKey | None:
+        """Returns the key of the given model, or `None` if it isn't registered."""
+        with self._lock:
+            for entry in self._entries.values():
+                if entry.get() is model:
+                    return entry.key
+        return None
+
+    def _add(self, key: ModelKey, model: object, size: int, name: str):
+        def forget(dead: weakref.ref[Any]):
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry.weak is dead:
+                    del self._entries[key]
+
+        try:
+            weak = weakref.ref(model, forget)
+        except TypeError:
+            weak = None
+
+        with self._lock:
+            self._entries[key] = _Entry(key, name, size, model, weak)
+            self._enforce_limit()
+        logger.debug("Registered model %s (%d bytes)", name, size)
+
+    def _enforce_limit(self):
+        if self.max_bytes is None:
+            return
+
+        resident = [e for e in self._entries.values() if e.model is not None]
+        total = sum(e.size for e in resident)
+        for entry in resident:
+            if total <= self.max_bytes:
+                break
+            logger.debug("Releasing model %s (%d bytes)", entry.name, entry.size)
+            entry.model = None
+            total -= entry.size
+            if entry.weak is None:
+                del self._entries[entry.key]
+
+    @property
+    def resident_bytes(self) -> int:
+        """The total size of all models kept alive by the registry."""
+        with self._lock:
+            return sum(e.size for e in self._entries.values() if e.model is not None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def to_json(self) -> list[dict[str, object]]:
+        """Returns all registered models, most recently used first."""
+        with self._lock:
+            entries = list(reversed(self._entries.values()))
+        return [
+            {
+                "name": e.name,
+                "size": e.size,
+                "resident": e.model is not None,
+                "uses": e.uses,
+                "loadedAt": e.loaded_at,
+                "lastAccess": e.last_access,
+            }
+            for e in entries
+            if e.get() is not None
+        ]
+
+
+model_registry = ModelRegistry()
@@ -32,6 +32,9 @@ class Color:
     def channels(self) -> int:
         return len(self.value)
 
+    def cache_key_func(self):
+        return self.value
+
     @staticmethod
     def gray(gray: FloatLike) -> Color:
         return Color((_norm(gray),))
@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import struct
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+from PIL import Image
+
+
+@dataclass(frozen=True)
+class ImageMetadata:
+    """
+    Basic information about an image file that can be read from its header
+    without decoding the image.
+    """
+
+    width: int
+    height: int
+    channels: int
+    """
+    The number of channels stored in the file, including alpha. Palette images
+    have the number of channels of their palette.
+    """
+    bit_depth: int
+    """The number of bits per channel, e.g. 8, 16 or 32."""
+    format: str
+    """The lower-case name of the file format, e.g. `png` or `jpeg`."""
+
+
+class _InvalidHeader(Exception):
+    pass
+
+
+def _read_exact(f: BinaryIO, n: int) -> bytes:
+    data = f.read(n)
+    if len(data) != n:
+        raise _InvalidHeader("Unexpected end of file")
+    return data
+
+
+_PNG_CHANNELS = {0: 1, 2: 3, 3: 3, 4: 2, 6: 4}
+
+
+def _probe_png(f: BinaryIO) -> ImageMetadata | None:
+    if f.read(8) != b"\x89PNG\r\n\x1a\n":
+        return None
+    length, chunk = struct.unpack(">I4s", _read_exact(f, 8))
+    if chunk != b"IHDR" or length < 13:
+        raise _InvalidHeader("PNG does not start with IHDR")
+    width, height, bit_depth, color_type = struct.unpack(">IIBB", _read_exact(f, 10))
+    channels = _PNG_CHANNELS.get(color_type)
+    if channels is None:
+        raise _InvalidHeader(f"Unknown PNG color type {color_type}")
+
+    if color_type == 3:
+        # palette images have transparency if they have a tRNS chunk before IDAT
+        f.seek(8 + 8 + length + 4)
+        while True:
+            header = f.read(8)
+            if len(header) != 8:
+                break
+            length, chunk = struct.unpack(">I4s", header)
+            if chunk == b"tRNS":
+                channels = 4
+                break
+            if chunk in (b"IDAT", b"IEND"):
+                break
+            f.seek(length + 4, 1)
+        bit_depth = 8
+
+    return ImageMetadata(width, height, channels, bit_depth, "png")
+
+
+# SOF markers, except DHT (C4), JPG (C8), and DAC (CC)
+_JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7}
+_JPEG_SOF |= {0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _probe_jpeg(f: BinaryIO) -> ImageMetadata | None:
+    if f.read(2) != b"\xff\xd8":
+        return None
+    while True:
+        marker = _read_exact(f, 2)
+        if marker[0] != 0xFF:
+            raise _InvalidHeader("Invalid JPEG marker")
+        kind = marker[1]
+        while kind == 0xFF:
+            # fill bytes
+            kind = _read_exact(f, 1)[0]
+        if kind == 0xD8 or 0xD0 <= kind <= 0xD7:
+            # markers without payload
+            continue
+        (length,) = struct.unpack(">H", _read_exact(f, 2))
+        if kind in _JPEG_SOF:
+            bit_depth, height, width, channels = struct.unpack(
+                ">BHHB", _read_exact(f, 6)
+            )
+            return ImageMetadata(width, height, channels, bit_depth, "jpeg")
+        if kind == 0xDA:
+            raise _InvalidHeader("JPEG has no frame header before its scan")
+        f.seek(length - 2, 1)
+
+
+def _probe_webp(f: BinaryIO) -> ImageMetadata | None:
+    header = f.read(12)
+    if len(header) != 12 or header[:4] != b"RIFF" or header[8:] != b"WEBP":
+        return None
+    chunk = _read_exact(f, 8)[:4]
+    data = _read_exact(f, 10)
+
+    if chunk == b"VP8 ":
+        # 3 byte frame tag, 3 byte start code, then 14 bit width and height
+        width, height = struct.unpack("<HH", data[6:10])
+        return ImageMetadata(width & 0x3FFF, height & 0x3FFF, 3, 8, "webp")
+    if chunk == b"VP8L":
+        (bits,) = struct.unpack("<I", data[1:5])
+        width = (bits & 0x3FFF) + 1
+        height = ((bits >> 14) & 0x3FFF) + 1
+        alpha = (bits >> 28) & 1
+        return ImageMetadata(width, height, 4 if alpha else 3, 8, "webp")
+    if chunk == b"VP8X":
+        alpha = data[0] & 0x10
+        width = int.from_bytes(data[4:7], "little") + 1
+        height = int.from_bytes(data[7:10], "little") + 1
+        return ImageMetadata(width, height, 4 if alpha else 3, 8, "webp")
+    raise _InvalidHeader(f"Unknown WebP chunk {chunk!r}")
+
+
+_EXR_PIXEL_BITS = {0: 32, 1: 16, 2: 32}
+"""The bits of the EXR pixel types UINT, HALF, and FLOAT."""
+
+
+def _probe_exr(f: BinaryIO) -> ImageMetadata | None:
+    if f.read(4) != b"\x76\x2f\x31\x01":
+        return None
+    f.seek(4, 1)
+
+    def read_str() -> bytes:
+        s = b""
+        while True:
+            c = _read_exact(f, 1)
+            if c == b"\0":
+                return s
+            s += c
+
+    channel_bits: list[int] = []
+    data_window: tuple[int, int, int, int] | None = None
+    while True:
+        name = read_str()
+        if not name:
+            break
+        read_str()
+        (size,) = struct.unpack("<i", _read_exact(f, 4))
+        value = _read_exact(f, size)
+        if name == b"channels":
+            offset = 0
+            while value[offset] != 0:
+                offset = value.index(b"\0", offset) + 1
+                (pixel_type,) = struct.unpack("<i", value[offset : offset + 4])
+                channel_bits.append(_EXR_PIXEL_BITS.get(pixel_type, 32))
+                offset += 16
+        elif name == b"dataWindow":
+            data_window = struct.unpack("<iiii", value)
+
+    if data_window is None or not channel_bits:
+        raise _InvalidHeader("EXR header has no data window or channels")
+    x_min, y_min, x_max, y_max = data_window
+    return ImageMetadata(
+        x_max - x_min + 1,
+        y_max - y_min + 1,
+        len(channel_bits),
+        max(channel_bits),
+        "exr",
+    )
+
+
+_PIL_MODES: dict[str, tuple[int, int]] = {
+    "1": (1, 1),
+    "L": (1, 8),
+    "LA": (2, 8),
+    "La": (2, 8),
+    "P": (3, 8),
+    "PA": (4, 8),
+    "RGB": (3, 8),
+    "RGBA": (4, 8),
+    "RGBa": (4, 8),
+    "RGBX": (4, 8),
+    "CMYK": (4, 8),
+    "YCbCr": (3, 8),
+    "LAB": (3, 8),
+    "HSV": (3, 8),
+    "I": (1, 32),
+    "F": (1, 32),
+    "I;16": (1, 16),
+    "I;16L": (1, 16),
+    "I;16B": (1, 16),
+    "I;16N": (1, 16),
+}
+
+
+def _probe_pil(path: Path) -> ImageMetadata | None:
+    # PIL only reads the header until the pixel data is accessed
+    try:
+        im = Image.open(path)
+    except Exception:
+        return None
+    with im:
+        mode = im.mode
+        if mode == "P" and im.palette is not None:
+            mode = im.palette.mode
+            if "transparency" in im.info:
+                mode = "RGBA"
+        channels, bit_depth = _PIL_MODES.get(mode, (len(im.getbands()), 8))
+        return ImageMetadata(
+            im.width, im.height, channels, bit_depth, (im.format or "").lower()
+        )
+
+
+_PROBES: list[Callable[[BinaryIO], ImageMetadata | None]] = [
+    _probe_png,
+    _probe_jpeg,
+    _probe_webp,
+    _probe_exr,
+]
+
+
+def probe_image(path: Path | str) -> ImageMetadata | None:
+    """
+    Returns the metadata of the given image file by only reading its header.
+
+    PNG, JPEG, WebP, and EXR headers are parsed directly. All other formats
+    (e.g. TIFF) are probed with PIL, which also only reads the header. Returns
+    `None` if the file is not a supported image or its header is invalid.
+    """
+    path = Path(path)
+    try:
+        with open(path, "rb") as f:
+            for probe in _PROBES:
+                f.seek(0)
+                try:
+                    metadata = probe(f)
+                except (_InvalidHeader, struct.error, IndexError, ValueError):
+                    return None
+                if metadata is not None:
+                    return metadata
+    except OSError:
+        return None
+
+    return _probe_pil(path)
+
+
+@dataclass(frozen=True)
+class ImageSizeRange:
+    """The range of the widths and heights of a set of images."""
+
+    min_width: int
+    max_width: int
+    min_height: int
+    max_height: int
+
+    @staticmethod
+    def probe(
+        paths: Sequence[Path | str], max_files: int | None = None
+    ) -> ImageSizeRange | None:
+        """
+        Returns the size range of the given image files by only reading their
+        headers.
+
+        Files that can't be probed are ignored, because they can't be loaded as
+        images either. Returns `None` if none of the files can be probed, or if
+        there are more than `max_files` files.
+        """
+        if max_files is not None and len(paths) > max_files:
+            return None
+
+        widths: list[int] = []
+        heights: list[int] = []
+        for path in paths:
+            metadata = probe_image(path)
+            if metadata is not None:
+                widths.append(metadata.width)
+                heights.append(metadata.height)
+
+        if not widths:
+            return None
+        return ImageSizeRange(min(widths), max(widths), min(heights), max(heights))
@@ -30,13 +30,24 @@ def ncnn_auto_split(
     staging_vkallocator,  # noqa: ANN001
     tiler: Tiler,
     progress: Progress | None = None,
+    cpu_allocators: tuple[object, object] | None = None,
 ) -> np.ndarray:
+    """
+    Upscales the image tile by tile using the given net.
+
+    If `cpu_allocators` (a blob and a workspace allocator) are given, then all
+    tiles are upscaled with them, so the memory of previous tiles is reused.
+    """
+
     def upscale(img: np.ndarray, _: object):
         ex = net.create_extractor()
         if use_gpu:
             ex.set_blob_vkallocator(blob_vkallocator)
             ex.set_workspace_vkallocator(blob_vkallocator)
             ex.set_staging_vkallocator(staging_vkallocator)
+        elif cpu_allocators is not None:
+            ex.set_blob_allocator(cpu_allocators[0])
+            ex.set_workspace_allocator(cpu_allocators[1])
         # ex.set_light_mode(True)
         try:
             lr_c = get_h_w_c(img)[2]
@@ -60,8 +71,8 @@ def ncnn_auto_split(
             _, mat_out = ex.extract(output_name)
             result = np.array(mat_out).transpose(1, 2, 0).astype(np.float32)
             del ex, mat_in, mat_out
-            gc.collect()
             if use_gpu:
+                gc.collect()
                 # Clear VRAM
                 blob_vkallocator.clear()
                 staging_vkallocator.clear()
@@ -1,7 +1,12 @@
 from __future__ import annotations
 
+import hashlib
+import os
 import tempfile
-from weakref import WeakKeyDictionary
+import threading
+from collections.abc import Hashable, Iterator
+from contextlib import contextmanager
+from weakref import WeakKeyDictionary, WeakValueDictionary
 
 try:
     from ncnn_vulkan import ncnn
@@ -12,12 +17,41 @@ except ImportError:
 
     use_gpu = False
 
+from logger import logger
 from packages.chaiNNer_ncnn.settings import NcnnSettings
 
-from .model import NcnnModelWrapper
+from .model import NcnnModel, NcnnModelWrapper
 
+SessionKey = tuple[Hashable, ...]
 
-def create_ncnn_net(model: NcnnModelWrapper, settings: NcnnSettings) -> ncnn.Net:
+
+def _load_model_from_memory(net: ncnn.Net, weights: bytes):
+    if hasattr(net, "load_model_mem"):
+        net.load_model_mem(weights)
+    elif hasattr(ncnn, "DataReaderFromMemory"):
+        net.load_model(ncnn.DataReaderFromMemory(weights))
+    else:
+        # older bindings can only load weights from a file
+        with tempfile.TemporaryDirectory() as tmp_model_dir:
+            bin_filename = os.path.join(tmp_model_dir, "ncnn-model.bin")
+            with open(bin_filename, "wb") as f:
+                f.write(weights)
+            net.load_model(bin_filename)
+
+
+def create_ncnn_net(
+    model: NcnnModelWrapper,
+    settings: NcnnSettings,
+    param: str | None = None,
+    weights: bytes | None = None,
+) -> ncnn.Net:
+    """
+    Creates a new net for the given model.
+
+    The param and weights of the model are serialized if they are not given. If
+    weights are given, they must be kept alive as long as the net, because the
+    net might reference them instead of copying them.
+    """
     net = ncnn.Net()
 
     if model.fp == "fp16":
@@ -42,24 +76,134 @@ def create_ncnn_net(model: NcnnModelWrapper, settings: NcnnSettings) -> ncnn.Net
         net.opt.openmp_blocktime = settings.blocktime
 
     # Load model param and bin
-    net.load_param_mem(model.model.write_param())
+    net.load_param_mem(param if param is not None else model.model.write_param())
     if use_gpu:
-        net.load_model_mem(model.model.bin)
+        net.load_model_mem(weights if weights is not None else model.model.bin)
     else:
-        with tempfile.TemporaryDirectory() as tmp_model_dir:
-            bin_filename = tmp_model_dir + "/ncnn-model.bin"
-            model.model.write_bin(bin_filename)
-            net.load_model(bin_filename)
+        _load_model_from_memory(
+            net, weights if weights is not None else model.model.bin
+        )
 
     return net
 
 
-__session_cache: WeakKeyDictionary[NcnnModelWrapper, ncnn.Net] = WeakKeyDictionary()
+class NcnnSession:
+    """
+    A net together with the resources needed to run it.
+
+    CPU allocators are pooled, so the allocators of an upscale are reused by
+    later upscales. The memory of the allocators is released after each upscale,
+    so a net doesn't keep the peak memory of its largest image alive.
+    """
+
+    def __init__(self, net: ncnn.Net, weights: bytes) -> None:
+        self.net: ncnn.Net = net
+        # the net may reference its weights instead of copying them
+        self._weights = weights
+        self._allocators: list[tuple[object, object]] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def cpu_allocators(self) -> Iterator[tuple[object, object] | None]:
+        """
+        Yields a blob and a workspace allocator for a single upscale, or `None` if
+        the bindings don't support allocators.
+
+        All tiles of the upscale share the memory of these allocators.
+        """
+        if use_gpu or not hasattr(ncnn, "PoolAllocator"):
+            yield None
+            return
+
+        with self._lock:
+            allocators = (
+                self._allocators.pop()
+                if self._allocators
+                else (ncnn.PoolAllocator(), ncnn.PoolAllocator())
+            )
+        try:
+            yield allocators
+        finally:
+            for allocator in allocators:
+                allocator.clear()  # type: ignore
+            with self._lock:
+                self._allocators.append(allocators)
+
+
+def _settings_key(settings: NcnnSettings) -> SessionKey:
+    if use_gpu:
+        return (settings.gpu_index,)
+    return (settings.winograd, settings.sgemm, settings.threads, settings.blocktime)
+
+
+__serialized: WeakKeyDictionary[NcnnModel, tuple[str, str]] = WeakKeyDictionary()
+
+
+def _serialize(model: NcnnModel) -> tuple[str, bytes, str]:
+    """Returns the param, weights, and content hash of the given model."""
+    param = model.write_param()
+    weights = model.bin
+    h = hashlib.sha256(param.encode())
+    h.update(weights)
+    return param, weights, h.hexdigest()
+
+
+__sessions: WeakValueDictionary[SessionKey, NcnnSession] = WeakValueDictionary()
+__model_sessions: WeakKeyDictionary[NcnnModelWrapper, NcnnSession] = WeakKeyDictionary()
+__lock = threading.Lock()
+__key_locks: dict[SessionKey, threading.Lock] = {}
+
+
+def get_ncnn_session(model: NcnnModelWrapper, settings: NcnnSettings) -> NcnnSession:
+    """
+    Returns a session for the given model and settings.
+
+    Sessions are keyed by the content of the model and the settings that affect
+    the net, so models with the same content share a session. A session is kept
+    as long as a model that last used it is alive.
+
+    Models are hashed and nets are built without holding the lock of the cache,
+    so building a net doesn't block other models. Concurrent calls with the same
+    key only build the net once.
+    """
+    with __lock:
+        serialized = __serialized.get(model.model)
+    weights = None
+    if serialized is None:
+        param, weights, digest = _serialize(model.model)
+        with __lock:
+            __serialized[model.model] = param, digest
+    else:
+        param, digest = serialized
+
+    key = (digest, *_settings_key(settings))
+    with __lock:
+        session = __sessions.get(key)
+        if session is not None:
+            __model_sessions[model] = session
+            return session
+        key_lock = __key_locks.setdefault(key, threading.Lock())
+
+    with key_lock:
+        try:
+            # another thread might have built the net in the meantime
+            with __lock:
+                session = __sessions.get(key)
+            if session is None:
+                if weights is None:
+                    weights = model.model.bin
+                logger.debug("Creating NCNN net for model %s", digest[:12])
+                net = create_ncnn_net(model, settings, param=param, weights=weights)
+                session = NcnnSession(net, weights)
+            with __lock:
+                __sessions[key] = session
+                __model_sessions[model] = session
+            return session
+        finally:
+            with __lock:
+                if __key_locks.get(key) is key_lock:
+                    del __key_locks[key]
 
 
 def get_ncnn_net(model: NcnnModelWrapper, settings: NcnnSettings) -> ncnn.Net:
-    cached = __session_cache.get(model)
-    if cached is None:
-        cached = create_ncnn_net(model, settings=settings)
-        __session_cache[model] = cached
-    return cached
+    return get_ncnn_session(model, settings).net
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import gc
+import math
+from collections import OrderedDict
 from collections.abc import Callable
 
 import numpy as np
@@ -9,27 +11,11 @@ import onnxruntime as ort
 from api import Progress
 from nodes.impl.onnx.model import SizeReq
 
-from ..upscale.auto_split import Tiler, auto_split
+from ...utils.utils import Region, Size, get_h_w_c
+from ..upscale.auto_split import Split, Tiler, auto_split
+from .session import session_pool
 
-
-def _into_batched_form(img: np.ndarray, change_shape: bool) -> np.ndarray:
-    shape_size = len(img.shape)
-    if shape_size == 3:
-        if change_shape:
-            # (H, W, C) -> (1, H, W, C)
-            return img[np.newaxis, :]
-        else:
-            # (H, W, C) -> (1, C, H, W)
-            return img.transpose((2, 0, 1))[np.newaxis, :]
-    elif shape_size == 2:
-        if change_shape:
-            # (H, W) -> (1, H, W, 1)
-            return img[np.newaxis, :, np.newaxis]
-        else:
-            # (H, W) -> (1, 1, H, W)
-            return img[np.newaxis, np.newaxis, :]
-    else:
-        raise ValueError("Unsupported input tensor shape")
+_OVERLAP = 16
 
 
 def _into_standard_image_form(img: np.ndarray, change_shape: bool) -> np.ndarray:
@@ -55,17 +41,24 @@ def _into_standard_image_form(img: np.ndarray, change_shape: bool) -> np.ndarray
         raise ValueError("Unsupported output tensor shape")
 
 
-def _flip_r_b_channels(img: np.ndarray) -> np.ndarray:
-    shape_size = len(img.shape)
-    if shape_size != 3:
-        return img
-    if img.shape[2] == 3:
-        # (H, W, C) RGB -> BGR
-        return np.flip(img, 2)
-    elif img.shape[2] == 4:
-        # (H, W, C) RGBA -> BGRA
-        return np.dstack((img[:, :, 2], img[:, :, 1], img[:, :, 0], img[:, :, 3]))
-    return img
+def _bgr_order(channels: int) -> list[int]:
+    """
+    Returns the source channel of each destination channel when converting
+    between RGB(A) and BGR(A).
+    """
+    if channels == 3:
+        return [2, 1, 0]
+    if channels == 4:
+        return [2, 1, 0, 3]
+    return list(range(channels))
+
+
+def _is_out_of_memory(e: Exception) -> bool:
+    return "ONNXRuntimeError" in str(e) and (
+        "allocate memory" in str(e)
+        or "out of memory" in str(e)
+        or "cudaMalloc" in str(e)
+    )
 
 
 def _pad(
@@ -96,6 +89,165 @@ def _pad(
         return img, lambda i: i
 
 
+def _first_tile_size(img: np.ndarray, tiler: Tiler, overlap: int) -> Size | None:
+    """
+    Returns the size of the first tile the tiler will use for the given image, or
+    `None` if the whole image fits into a single tile.
+    """
+    h, w, c = get_h_w_c(img)
+    tile_w, tile_h = tiler.starting_tile_size(w, h, c)
+    if not tiler.allow_smaller_tile_size():
+        return tile_w, tile_h
+    if tile_w >= w and tile_h >= h:
+        return None
+
+    def first(size: int, max_size: int) -> int:
+        count = math.ceil(size / max_size)
+        tile = math.ceil(size / count)
+        if count > 1:
+            tile += min(overlap, size - tile)
+        return tile
+
+    return first(w, tile_w), first(h, tile_h)
+
+
+class _TileRunner:
+    """
+    Runs batches of tiles through an inference session using IO binding.
+
+    Input and output buffers are allocated once per input shape and reused for
+    all tiles of that shape. Converting tiles into and out of the model's tensor
+    layout (channel order and transposition) is done while copying them into and
+    out of these buffers, so no intermediate arrays are created.
+    """
+
+    MAX_BUFFERS = 8
+
+    def __init__(
+        self,
+        session: ort.InferenceSession,
+        change_shape: bool,
+        size_req: SizeReq,
+    ) -> None:
+        i = session.get_inputs()[0]
+        self.session = session
+        self.change_shape = change_shape
+        self.size_req = size_req
+        self.input_name: str = i.name
+        self.output_name: str = session.get_outputs()[0].name
+        self.dtype = np.float16 if i.type == "tensor(float16)" else np.float32
+        self.binding = session.io_binding()
+        # input shape -> (input buffer, output buffer)
+        self._buffers: OrderedDict[
+            tuple[int, ...], tuple[np.ndarray, np.ndarray | None]
+        ] = OrderedDict()
+
+    def input_shape(self, n: int, h: int, w: int, c: int) -> tuple[int, ...]:
+        pad_w, pad_h = self.size_req.get_padding(w, h)
+        h, w = h + pad_h, w + pad_w
+        return (n, h, w, c) if self.change_shape else (n, c, h, w)
+
+    def _get_buffers(
+        self, shape: tuple[int, ...]
+    ) -> tuple[np.ndarray, np.ndarray | None]:
+        buffers = self._buffers.get(shape)
+        if buffers is None:
+            buffers = np.empty(shape, dtype=self.dtype), None
+            self._buffers[shape] = buffers
+            while len(self._buffers) > self.MAX_BUFFERS:
+                self._buffers.popitem(last=False)
+        else:
+            self._buffers.move_to_end(shape)
+        return buffers
+
+    def _write_input(self, buffer: np.ndarray, index: int, tile: np.ndarray):
+        pad_w, pad_h = self.size_req.get_padding(tile.shape[1], tile.shape[0])
+        if pad_w or pad_h:
+            tile, _ = _pad(tile, self.size_req)
+        if tile.ndim == 2:
+            tile = tile[:, :, np.newaxis]
+
+        for dst, src in enumerate(_bgr_order(tile.shape[2])):
+            if self.change_shape:
+                buffer[index, :, :, dst] = tile[:, :, src]
+            else:
+                buffer[index, dst] = tile[:, :, src]
+
+    def _read_output(self, output: np.ndarray, index: int, size: Size) -> np.ndarray:
+        if self.change_shape:
+            _, h, w, c = output.shape
+        else:
+            _, c, h, w = output.shape
+
+        result = np.empty((h, w, c), dtype=np.float32)
+        for dst, src in enumerate(_bgr_order(c)):
+            if self.change_shape:
+                result[:, :, dst] = output[index, :, :, src]
+            else:
+                result[:, :, dst] = output[index, src]
+
+        return self._remove_padding(result, size)
+
+    def _read_unbatched_output(self, output: np.ndarray, size: Size) -> np.ndarray:
+        """Reads the output of models whose output has no batch dimension."""
+        result = _into_standard_image_form(output, self.change_shape)
+        if result.ndim == 3:
+            result = result[:, :, _bgr_order(result.shape[2])]
+        return self._remove_padding(result.astype(np.float32), size)
+
+    def _remove_padding(self, result: np.ndarray, size: Size) -> np.ndarray:
+        tile_w, tile_h = size
+        pad_w, pad_h = self.size_req.get_padding(tile_w, tile_h)
+        if pad_w or pad_h:
+            h, w = result.shape[:2]
+            scale_w = w // (tile_w + pad_w)
+            scale_h = h // (tile_h + pad_h)
+            result = result[: tile_h * scale_h, : tile_w * scale_w]
+        return result
+
+    def run(self, tiles: list[np.ndarray]) -> list[np.ndarray]:
+        h, w, c = get_h_w_c(tiles[0])
+        shape = self.input_shape(len(tiles), h, w, c)
+        input_buffer, output_buffer = self._get_buffers(shape)
+        for index, tile in enumerate(tiles):
+            self._write_input(input_buffer, index, tile)
+
+        binding = self.binding
+        binding.bind_cpu_input(self.input_name, input_buffer)
+        if output_buffer is not None:
+            binding.bind_output(
+                self.output_name,
+                "cpu",
+                0,
+                output_buffer.dtype.type,
+                list(output_buffer.shape),
+                output_buffer.ctypes.data,
+            )
+        else:
+            # let ORT allocate the output once to learn its shape
+            binding.bind_output(self.output_name, "cpu")
+
+        self.session.run_with_iobinding(binding)
+
+        if output_buffer is None:
+            output_buffer = binding.copy_outputs_to_cpu()[0]
+            if output_buffer.ndim != 4:
+                binding.clear_binding_outputs()
+                if len(tiles) > 1:
+                    # the output can't be split into tiles, so run them one by one
+                    return [r for tile in tiles for r in self.run([tile])]
+                return [self._read_unbatched_output(output_buffer, (w, h))]
+            if shape in self._buffers:
+                self._buffers[shape] = input_buffer, output_buffer
+
+        return [self._read_output(output_buffer, i, (w, h)) for i in range(len(tiles))]
+
+
+def _has_dynamic_batch_size(session: ort.InferenceSession) -> bool:
+    batch = session.get_inputs()[0].shape[0]
+    return not isinstance(batch, int)
+
+
 def onnx_auto_split(
     img: np.ndarray,
     session: ort.InferenceSession,
@@ -103,39 +255,60 @@ def onnx_auto_split(
     tiler: Tiler,
     size_req: SizeReq | None = None,
     progress: Progress | None = None,
+    warm_up: bool = False,
+    max_batch_pixels: int = 0,
 ) -> np.ndarray:
-    input_name = session.get_inputs()[0].name
-    output_name = session.get_outputs()[0].name
-
-    is_fp16_model = session.get_inputs()[0].type == "tensor(float16)"
+    """
+    Upscales the image tile by tile using the given session.
 
-    def upscale(img: np.ndarray, _: object):
-        try:
-            lr_img = img.astype(np.float16) if is_fp16_model else img
-            lr_img, remove_pad = _pad(lr_img, size_req or SizeReq())
-            lr_img = _flip_r_b_channels(lr_img)
-            lr_img = _into_batched_form(lr_img, change_shape)
+    If `warm_up` is set and the image is split into multiple tiles, the session
+    is run once with an empty tile of the first tile's size before the first
+    real tile. This happens at most once per session and tile size.
 
-            output: np.ndarray = session.run([output_name], {input_name: lr_img})[0]
+    If `max_batch_pixels` is positive and the batch size of the model is dynamic,
+    then tiles of the same size are upscaled in batches of at most that many input
+    pixels.
+    """
+    runner = _TileRunner(session, change_shape, size_req or SizeReq())
 
-            output = _into_standard_image_form(output, change_shape)
-            output = _flip_r_b_channels(output)
-            output = remove_pad(output)
-            return output.astype(np.float32)
+    def run(imgs: list[np.ndarray], _: object) -> list[np.ndarray] | Split:
+        try:
+            return runner.run(imgs)
         except Exception as e:
-            if "ONNXRuntimeError" in str(e) and (
-                "allocate memory" in str(e)
-                or "out of memory" in str(e)
-                or "cudaMalloc" in str(e)
-            ):
-                raise RuntimeError(  # noqa: B904
-                    "A VRAM out-of-memory error has occurred. Please try using a more extreme tiling mode."
-                )
-            else:
+            if not _is_out_of_memory(e):
                 # Re-raise the exception if not an OOM error
                 raise
+            if len(imgs) > 1:
+                # try again with fewer tiles per batch
+                return Split()
+            raise RuntimeError(  # noqa: B904
+                "A VRAM out-of-memory error has occurred. Please try using a more extreme tiling mode."
+            )
+
+    def upscale(img: np.ndarray, region: Region):
+        result = run([img], region)
+        if isinstance(result, Split):
+            return result
+        return result[0]
+
+    if warm_up:
+        tile_size = _first_tile_size(img, tiler, _OVERLAP)
+        if tile_size is not None:
+            tile_w, tile_h = tile_size
+            _, _, c = get_h_w_c(img)
+            session_pool.warm_up(session, runner.input_shape(1, tile_h, tile_w, c))
+
+    use_batches = max_batch_pixels > 0 and _has_dynamic_batch_size(session)
 
     try:
-        return auto_split(img, upscale, tiler, progress=progress)
+        return auto_split(
+            img,
+            upscale,
+            tiler,
+            overlap=_OVERLAP,
+            progress=progress,
+            upscale_batch=run if use_batches else None,
+            max_batch_pixels=max_batch_pixels,
+        )
     finally:
         gc.collect()
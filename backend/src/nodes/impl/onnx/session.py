@@ -1,88 +1,324 @@
 from __future__ import annotations
 
-from typing import Any
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Literal
 from weakref import WeakKeyDictionary
 
+import numpy as np
 import onnxruntime as ort
 
+from logger import logger
+
 from .model import OnnxModel
 from .utils import OnnxParsedTensorShape, parse_onnx_shape
 
 ProviderDesc = str | tuple[str, dict[Any, Any]]
 
+GraphOptimizationLevel = Literal["disabled", "basic", "extended", "all"]
 
-def create_inference_session(
-    model: OnnxModel,
-    gpu_index: int,
-    execution_provider: str,
-    should_tensorrt_fp16: bool = False,
-    tensorrt_cache_path: str | None = None,
-) -> ort.InferenceSession:
-    tensorrt: ProviderDesc = (
-        "TensorrtExecutionProvider",
-        {
-            "device_id": gpu_index,
-            "trt_engine_cache_enable": tensorrt_cache_path is not None,
-            "trt_engine_cache_path": tensorrt_cache_path,
-            "trt_fp16_enable": should_tensorrt_fp16,
-            "trt_dump_subgraphs": tensorrt_cache_path is not None,
-            "trt_timing_cache_enable": tensorrt_cache_path is not None,
-            "trt_timing_cache_path": tensorrt_cache_path,
-        },
-    )
-    cuda: ProviderDesc = (
-        "CUDAExecutionProvider",
-        {
-            "device_id": gpu_index,
-        },
-    )
-    dml: ProviderDesc = (
-        "DmlExecutionProvider",
-        {
-            "device_id": gpu_index,
-        },
-    )
-    cpu: ProviderDesc = "CPUExecutionProvider"
-
-    if execution_provider == "TensorrtExecutionProvider":
-        providers = [tensorrt, cuda, cpu]
-    elif execution_provider == "CUDAExecutionProvider":
-        providers = [cuda, cpu]
-    elif execution_provider == "DmlExecutionProvider":
-        providers = [dml, cpu]
-    else:
-        providers = [execution_provider, cpu]
-
-    session = ort.InferenceSession(
-        model.bytes,
-        providers=providers,
-    )
-    return session
+_GRAPH_OPTIMIZATION_LEVELS: dict[GraphOptimizationLevel, str] = {
+    "disabled": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL",
+}
+
+ExecutionMode = Literal["sequential", "parallel"]
+
+_EXECUTION_MODES: dict[ExecutionMode, str] = {
+    "sequential": "ORT_SEQUENTIAL",
+    "parallel": "ORT_PARALLEL",
+}
+
+# Providers that compile the graph into their own kernels can't save the optimized
+# model, so only these providers use the optimized model cache.
+_OPTIMIZED_MODEL_CACHE_PROVIDERS = {"CPUExecutionProvider", "CUDAExecutionProvider"}
+
+
+@dataclass(frozen=True)
+class SessionConfig:
+    """
+    Everything that determines how an inference session is created.
+
+    Sessions are cached by this config, so two sessions of the same model with
+    different configs can be kept at the same time.
+    """
+
+    gpu_index: int
+    execution_provider: str
+    should_tensorrt_fp16: bool = False
+    tensorrt_cache_path: str | None = None
+
+    intra_op_threads: int = 0
+    """The number of threads used within an operator. 0 lets ORT decide."""
+    inter_op_threads: int = 0
+    """
+    The number of threads used to run operators in parallel. 0 lets ORT decide.
+    Only used in the parallel execution mode.
+    """
+    execution_mode: ExecutionMode = "sequential"
+    graph_optimization: GraphOptimizationLevel = "all"
+    cpu_memory_arena: bool = True
+    memory_pattern: bool = True
+
+    optimized_model_cache_path: str | None = None
+    """
+    The directory in which optimized models are stored. If set, the graph
+    optimizations of a model are only done once.
+    """
+
+    def optimized_model_key(self, model: OnnxModel) -> str | None:
+        """
+        Returns the name of the optimized model in the optimized model cache, or
+        `None` if optimized models are not cached for this config.
+        """
+        if (
+            self.optimized_model_cache_path is None
+            or self.execution_provider not in _OPTIMIZED_MODEL_CACHE_PROVIDERS
+            or self.graph_optimization == "disabled"
+        ):
+            return None
+
+        options = asdict(self)
+        del options["optimized_model_cache_path"]
+        h = hashlib.sha256(model.bytes)
+        h.update(f"{ort.__version__};{sorted(options.items())}".encode())
+        return h.hexdigest()
+
+    def get_providers(self) -> list[ProviderDesc]:
+        tensorrt: ProviderDesc = (
+            "TensorrtExecutionProvider",
+            {
+                "device_id": self.gpu_index,
+                "trt_engine_cache_enable": self.tensorrt_cache_path is not None,
+                "trt_engine_cache_path": self.tensorrt_cache_path,
+                "trt_fp16_enable": self.should_tensorrt_fp16,
+                "trt_dump_subgraphs": self.tensorrt_cache_path is not None,
+                "trt_timing_cache_enable": self.tensorrt_cache_path is not None,
+                "trt_timing_cache_path": self.tensorrt_cache_path,
+            },
+        )
+        cuda: ProviderDesc = (
+            "CUDAExecutionProvider",
+            {
+                "device_id": self.gpu_index,
+            },
+        )
+        dml: ProviderDesc = (
+            "DmlExecutionProvider",
+            {
+                "device_id": self.gpu_index,
+            },
+        )
+        cpu: ProviderDesc = "CPUExecutionProvider"
 
+        if self.execution_provider == "TensorrtExecutionProvider":
+            return [tensorrt, cuda, cpu]
+        elif self.execution_provider == "CUDAExecutionProvider":
+            return [cuda, cpu]
+        elif self.execution_provider == "DmlExecutionProvider":
+            return [dml, cpu]
+        elif self.execution_provider == "CPUExecutionProvider":
+            return [cpu]
+        else:
+            return [self.execution_provider, cpu]
 
-__session_cache: WeakKeyDictionary[OnnxModel, ort.InferenceSession] = (
-    WeakKeyDictionary()
-)
+    def get_session_options(self) -> ort.SessionOptions:
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = self.inter_op_threads
+        options.execution_mode = getattr(
+            ort.ExecutionMode, _EXECUTION_MODES[self.execution_mode]
+        )
+        options.graph_optimization_level = getattr(
+            ort.GraphOptimizationLevel,
+            _GRAPH_OPTIMIZATION_LEVELS[self.graph_optimization],
+        )
+        options.enable_cpu_mem_arena = self.cpu_memory_arena
+        options.enable_mem_pattern = self.memory_pattern
+        return options
 
 
-def get_onnx_session(
+def create_inference_session(
     model: OnnxModel,
     gpu_index: int,
     execution_provider: str,
-    should_tensorrt_fp16: bool,
+    should_tensorrt_fp16: bool = False,
     tensorrt_cache_path: str | None = None,
 ) -> ort.InferenceSession:
-    cached = __session_cache.get(model)
-    if cached is None:
-        cached = create_inference_session(
-            model,
+    return create_session(
+        model,
+        SessionConfig(
             gpu_index,
             execution_provider,
             should_tensorrt_fp16,
             tensorrt_cache_path,
+        ),
+    )
+
+
+def create_session(model: OnnxModel, config: SessionConfig) -> ort.InferenceSession:
+    key = config.optimized_model_key(model)
+    if key is not None:
+        assert config.optimized_model_cache_path is not None
+        path = os.path.join(config.optimized_model_cache_path, f"{key}.onnx")
+        try:
+            return _create_cached_session(model, config, path)
+        except Exception as e:
+            logger.warning("Unable to use optimized model cache %s: %s", path, e)
+
+    return ort.InferenceSession(
+        model.bytes,
+        sess_options=config.get_session_options(),
+        providers=config.get_providers(),
+    )
+
+
+def _create_cached_session(
+    model: OnnxModel, config: SessionConfig, path: str
+) -> ort.InferenceSession:
+    options = config.get_session_options()
+    if os.path.exists(path):
+        logger.debug("Loading optimized ONNX model %s", path)
+        # the stored model is already optimized
+        cached_options = config.get_session_options()
+        cached_options.graph_optimization_level = (
+            ort.GraphOptimizationLevel.ORT_DISABLE_ALL
         )
-        __session_cache[model] = cached
-    return cached
+        try:
+            return ort.InferenceSession(
+                path, sess_options=cached_options, providers=config.get_providers()
+            )
+        except Exception as e:
+            logger.warning("Discarding invalid optimized model %s: %s", path, e)
+            os.remove(path)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp = f"{path}.{os.getpid()}.tmp"
+    options.optimized_model_filepath = temp
+    try:
+        session = ort.InferenceSession(
+            model.bytes, sess_options=options, providers=config.get_providers()
+        )
+        try:
+            os.replace(temp, path)
+            logger.debug("Stored optimized ONNX model %s", path)
+        except OSError as e:
+            # the session is fine, it just won't be cached
+            logger.warning("Unable to store optimized model %s: %s", path, e)
+        return session
+    finally:
+        if os.path.exists(temp):
+            try:
+                os.remove(temp)
+            except OSError as e:
+                logger.warning("Unable to remove %s: %s", temp, e)
+
+
+class SessionPool:
+    """
+    A cache of inference sessions keyed by model and session config.
+
+    Sessions are kept as long as their model is alive. Each model keeps at most
+    `max_per_model` sessions with different configs, least recently used
+    sessions are dropped first.
+    """
+
+    def __init__(self, max_per_model: int = 4):
+        self.max_per_model = max_per_model
+        self._sessions: WeakKeyDictionary[
+            OnnxModel, OrderedDict[SessionConfig, ort.InferenceSession]
+        ] = WeakKeyDictionary()
+        self._warmed_up: WeakKeyDictionary[
+            ort.InferenceSession, set[tuple[int, ...]]
+        ] = WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._key_locks: dict[tuple[int, SessionConfig], threading.Lock] = {}
+
+    def get(self, model: OnnxModel, config: SessionConfig) -> ort.InferenceSession:
+        """
+        Returns the session for the given model and config, or creates it.
+
+        Sessions are created without holding the lock of the pool, so a slow
+        session build (e.g. a TensorRT engine) doesn't block lookups of other
+        sessions. Concurrent calls with the same model and config only create
+        the session once.
+        """
+        session = self._get(model, config)
+        if session is not None:
+            return session
+
+        key = (id(model), config)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            try:
+                # another thread might have created the session in the meantime
+                session = self._get(model, config)
+                if session is not None:
+                    return session
+
+                session = create_session(model, config)
+                with self._lock:
+                    sessions = self._sessions.get(model)
+                    if sessions is None:
+                        sessions = OrderedDict()
+                        self._sessions[model] = sessions
+                    sessions[config] = session
+                    while len(sessions) > self.max_per_model:
+                        sessions.popitem(last=False)
+                return session
+            finally:
+                with self._lock:
+                    if self._key_locks.get(key) is key_lock:
+                        del self._key_locks[key]
+
+    def _get(
+        self, model: OnnxModel, config: SessionConfig
+    ) -> ort.InferenceSession | None:
+        with self._lock:
+            sessions = self._sessions.get(model)
+            if sessions is None:
+                return None
+            session = sessions.get(config)
+            if session is not None:
+                sessions.move_to_end(config)
+            return session
+
+    def warm_up(self, session: ort.InferenceSession, shape: tuple[int, ...]):
+        """
+        Runs the session once with an input of the given shape, unless this was
+        already done before.
+
+        The first run of a session for an input shape is a lot slower than
+        subsequent runs (memory planning, kernel selection, TensorRT engine
+        builds), so this moves that cost before the first real tile.
+        """
+        with self._lock:
+            warmed_up = self._warmed_up.setdefault(session, set())
+            if shape in warmed_up:
+                return
+            warmed_up.add(shape)
+
+        i = session.get_inputs()[0]
+        dtype = np.float16 if i.type == "tensor(float16)" else np.float32
+        logger.debug("Warming up ONNX session with input shape %s", shape)
+        session.run(None, {i.name: np.zeros(shape, dtype=dtype)})
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(s) for s in self._sessions.values())
+
+
+session_pool = SessionPool()
+
+
+def get_onnx_session(model: OnnxModel, config: SessionConfig) -> ort.InferenceSession:
+    return session_pool.get(model, config)
 
 
 def get_input_shape(session: ort.InferenceSession) -> OnnxParsedTensorShape:
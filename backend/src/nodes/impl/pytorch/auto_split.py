@@ -2,6 +2,8 @@ from __future__ import annotations
 
 import gc
 from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
 
 import numpy as np
 import torch
@@ -9,42 +11,21 @@ from spandrel import ImageModelDescriptor
 
 from api import Progress
 
+from ...utils.utils import Region
 from ..upscale.auto_split import Split, Tiler, auto_split
-from .utils import safe_cuda_cache_empty
-
-
-def _into_standard_image_form(t: torch.Tensor) -> torch.Tensor:
-    if len(t.shape) == 2:
-        # (H, W)
-        return t
-    elif len(t.shape) == 3:
-        # (C, H, W) -> (H, W, C)
-        return t.permute(1, 2, 0)
-    elif len(t.shape) == 4:
-        # (1, C, H, W) -> (H, W, C)
-        return t.squeeze(0).permute(1, 2, 0)
-    else:
-        raise ValueError("Unsupported output tensor shape")
-
-
-def _into_batched_form(t: torch.Tensor) -> torch.Tensor:
-    if len(t.shape) == 2:
-        # (H, W) -> (1, 1, H, W)
-        return t.unsqueeze(0).unsqueeze(0)
-    elif len(t.shape) == 3:
-        # (H, W, C) -> (1, C, H, W)
-        return t.permute(2, 0, 1).unsqueeze(0)
-    else:
-        raise ValueError("Unsupported input tensor shape")
+from .utils import safe_cuda_cache_empty, to_device_and_dtype
 
 
 def _rgb_to_bgr(t: torch.Tensor) -> torch.Tensor:
-    if len(t.shape) == 3 and t.shape[2] == 3:
-        # (H, W, C) RGB -> BGR
-        return t.flip(2)
-    elif len(t.shape) == 3 and t.shape[2] == 4:
-        # (H, W, C) RGBA -> BGRA
-        return torch.cat((t[:, :, 2:3], t[:, :, 1:2], t[:, :, 0:1], t[:, :, 3:4]), 2)
+    # (H, W, C) or (N, H, W, C)
+    if len(t.shape) in (3, 4) and t.shape[-1] == 3:
+        # RGB -> BGR
+        return t.flip(-1)
+    elif len(t.shape) in (3, 4) and t.shape[-1] == 4:
+        # RGBA -> BGRA
+        return torch.cat(
+            (t[..., 2:3], t[..., 1:2], t[..., 0:1], t[..., 3:4]), len(t.shape) - 1
+        )
     else:
         return t
 
@@ -84,25 +65,93 @@ def _pad(
     return img, remove_padding
 
 
-def _into_tensor(
-    img: np.ndarray, device: torch.device, dtype: torch.dtype
-) -> torch.Tensor:
-    img = np.ascontiguousarray(img)
-    writeable = img.flags.writeable
-    try:
-        if not writeable and device == torch.device("cpu"):
-            img = np.copy(img)
-        else:
-            # since we are going to copy the image to the GPU, we can skip the copy here
-            try:
-                img.flags.writeable = True
-            except Exception:
-                # Some arrays cannot be made writeable, and we need to copy them
-                img = np.copy(img)
-        input_tensor = torch.from_numpy(img).to(device, dtype)
-        return input_tensor
-    finally:
-        img.flags.writeable = writeable
+@dataclass
+class _PreparedInput:
+    tensor: torch.Tensor
+    """The padded tiles as one (N, C, H, W) tensor on the device."""
+    remove_padding: Callable[[np.ndarray], np.ndarray]
+    ready: torch.cuda.Event | None = None
+    """Recorded once the tensor was copied to the device on a separate stream."""
+
+
+def _prepare_input(
+    imgs: list[np.ndarray],
+    model: ImageModelDescriptor[torch.nn.Module],
+    device: torch.device,
+    dtype: torch.dtype,
+    copy_stream: torch.cuda.Stream | None,
+) -> _PreparedInput:
+    # all tiles have the same size, so they all get the same padding
+    padded = [_pad(img, model) for img in imgs]
+    remove_padding = padded[0][1]
+
+    # (N, H, W, C)
+    batch = np.stack([padded_img for padded_img, _ in padded])
+    if batch.ndim == 3:
+        batch = batch[..., np.newaxis]
+
+    with torch.inference_mode():
+        cpu_tensor = torch.from_numpy(batch)
+        if copy_stream is None:
+            tensor = _rgb_to_bgr(cpu_tensor.to(device, dtype)).permute(0, 3, 1, 2)
+            return _PreparedInput(tensor, remove_padding)
+
+        # copy on a separate stream, so that the copy overlaps with inference
+        with torch.cuda.stream(copy_stream):
+            tensor = cpu_tensor.pin_memory().to(device, dtype, non_blocking=True)
+            tensor = _rgb_to_bgr(tensor).permute(0, 3, 1, 2)
+            ready = torch.cuda.Event()
+            ready.record(copy_stream)
+        return _PreparedInput(tensor, remove_padding, ready)
+
+
+class _InputPrefetcher:
+    """
+    Prepares the input of upscale calls on a background thread, so that the next
+    tiles are padded, converted, and copied to the device while the current tiles
+    are upscaled.
+    """
+
+    MAX_PENDING = 2
+
+    def __init__(self, prepare: Callable[[list[np.ndarray]], _PreparedInput]):
+        self._prepare = prepare
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="tile-prefetch"
+        )
+        self._pending: dict[tuple[Region, ...], Future[_PreparedInput]] = {}
+        self.enabled = True
+
+    def prefetch(self, imgs: list[np.ndarray], regions: list[Region]) -> None:
+        if not self.enabled:
+            return
+        key = tuple(regions)
+        if key in self._pending:
+            return
+        while len(self._pending) >= _InputPrefetcher.MAX_PENDING:
+            # the oldest prefetched input was never used (e.g. because of a split)
+            oldest = next(iter(self._pending))
+            self._pending.pop(oldest).cancel()
+        self._pending[key] = self._executor.submit(self._prepare, imgs)
+
+    def take(self, imgs: list[np.ndarray], regions: list[Region]) -> _PreparedInput:
+        future = self._pending.pop(tuple(regions), None)
+        if future is not None:
+            return future.result()
+        return self._prepare(imgs)
+
+    def discard(self) -> None:
+        for future in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+
+    def close(self) -> None:
+        self.discard()
+        self._executor.shutdown(wait=True)
+
+
+def _is_out_of_memory(e: RuntimeError) -> bool:
+    return "allocate" in str(e) or "CUDA" in str(e)
 
 
 @torch.inference_mode()
@@ -113,57 +162,88 @@ def pytorch_auto_split(
     use_fp16: bool,
     tiler: Tiler,
     progress: Progress | None = None,
+    max_batch_pixels: int = 0,
 ) -> np.ndarray:
+    """
+    Upscales the given image with the given model, splitting it into tiles as
+    necessary.
+
+    If `max_batch_pixels` is positive, then tiles of the same size are upscaled in
+    batches of at most that many input pixels.
+
+    Tiles are processed in a pipeline: the input of the next tiles is prepared and
+    copied to the device while the current tiles are upscaled, and upscaled tiles
+    are blended into the result on a separate thread.
+    """
     dtype = torch.float16 if use_fp16 else torch.float32
-    if model.dtype != dtype or model.device != device:
-        model = model.to(device, dtype)
+    model = to_device_and_dtype(model, device, dtype)
 
-    def upscale(img: np.ndarray, _: object):
+    copy_stream = torch.cuda.Stream(device) if device.type == "cuda" else None
+    prefetcher = _InputPrefetcher(
+        lambda imgs: _prepare_input(imgs, model, device, dtype, copy_stream)
+    )
+
+    def check_progress():
         if progress is not None:
             progress.check_aborted()
             if progress.paused:
                 # clear resources before pausing
+                prefetcher.discard()
                 gc.collect()
                 safe_cuda_cache_empty()
                 progress.suspend()
 
-        input_tensor = None
-        try:
-            # Apply padding to satisfy size requirements
-            padded_img, remove_padding = _pad(img, model)
+    def run(imgs: list[np.ndarray], regions: list[Region]) -> list[np.ndarray] | Split:
+        check_progress()
 
-            # convert to tensor
-            input_tensor = _into_tensor(padded_img, device, dtype)
-            input_tensor = _rgb_to_bgr(input_tensor)
-            input_tensor = _into_batched_form(input_tensor)
+        prepared = None
+        try:
+            prepared = prefetcher.take(imgs, regions)
+            input_tensor = prepared.tensor
+            if prepared.ready is not None:
+                compute_stream = torch.cuda.current_stream(device)
+                compute_stream.wait_event(prepared.ready)
+                input_tensor.record_stream(compute_stream)
 
             # inference
             output_tensor = model(input_tensor)
 
-            # convert back to numpy
-            output_tensor = _into_standard_image_form(output_tensor)
-            output_tensor = _rgb_to_bgr(output_tensor)
-            result = output_tensor.detach().cpu().detach().float().numpy()
+            # convert back to numpy: (N, C, H, W) -> (N, H, W, C)
+            output_tensor = _rgb_to_bgr(output_tensor.permute(0, 2, 3, 1))
+            result = output_tensor.detach().cpu().float().numpy()
 
             # Remove padding from output
-            result = remove_padding(result)
-
-            return result
+            return [prepared.remove_padding(r) for r in result]
         except RuntimeError as e:
             # Check to see if its actually the CUDA out of memory error
-            if "allocate" in str(e) or "CUDA" in str(e):
-                # Collect garbage (clear VRAM)
-                if input_tensor is not None:
-                    try:
-                        input_tensor.detach().cpu()
-                    except Exception:
-                        pass
-                    del input_tensor
-                gc.collect()
-                safe_cuda_cache_empty()
-                return Split()
-            else:
-                # Re-raise the exception if not an OOM error
+            if not _is_out_of_memory(e):
                 raise
 
-    return auto_split(img, upscale, tiler, progress=progress)
+            # Collect garbage (clear VRAM)
+            del prepared
+            # prefetched inputs take up memory we don't have
+            prefetcher.discard()
+            prefetcher.enabled = False
+            gc.collect()
+            safe_cuda_cache_empty()
+            return Split()
+
+    def upscale(img: np.ndarray, region: Region):
+        result = run([img], [region])
+        if isinstance(result, Split):
+            return result
+        return result[0]
+
+    try:
+        return auto_split(
+            img,
+            upscale,
+            tiler,
+            progress=progress,
+            upscale_batch=run if max_batch_pixels > 0 else None,
+            max_batch_pixels=max_batch_pixels,
+            prefetch=prefetcher.prefetch,
+            blend_in_background=True,
+        )
+    finally:
+        prefetcher.close()
@@ -6,6 +6,8 @@ from spandrel.architectures.CRAFT import CRAFT
 from spandrel.architectures.SAFMN import SAFMN
 from spandrel.architectures.SCUNet import SCUNet
 
+from .utils import to_device_and_dtype
+
 
 def is_onnx_supported(model: ModelDescriptor) -> bool:
     return not isinstance(model.model, SCUNet | SAFMN | CRAFT)
@@ -26,19 +28,14 @@ def convert_to_onnx_impl(
     }
     size = 3
     size += model.size_requirements.get_padding(size, size)[0]
+    if use_half and not model.supports_half:
+        raise ValueError(
+            f"Model of arch {model.architecture} does not support half precision."
+        )
+    dtype = torch.float16 if use_half else torch.float32
+    model = to_device_and_dtype(model, device, dtype)
     dummy_input = torch.rand(1, model.input_channels, size, size)
-    dummy_input = dummy_input.to(device)
-
-    if use_half:
-        if not model.supports_half:
-            raise ValueError(
-                f"Model of arch {model.architecture} does not support half precision."
-            )
-        model.half()
-        dummy_input = dummy_input.half()
-    else:
-        model.float()
-        dummy_input = dummy_input.float()
+    dummy_input = dummy_input.to(device, dtype)
 
     m = model.model
 
@@ -1,7 +1,13 @@
 from __future__ import annotations
 
+import copy
+import itertools
+import threading
+from weakref import WeakKeyDictionary
+
 import numpy as np
 import torch
+from spandrel import ModelDescriptor
 from torch import Tensor
 
 from ..image_utils import as_3d
@@ -155,3 +161,54 @@ def safe_cuda_cache_empty():
             torch.cuda.empty_cache()
     except Exception:
         pass
+
+
+def get_model_size(model: ModelDescriptor) -> int:
+    """
+    Returns the number of bytes of the parameters and buffers of the given model.
+    """
+    module = model.model
+    return sum(
+        t.numel() * t.element_size()
+        for t in itertools.chain(module.parameters(), module.buffers())
+    )
+
+
+def _is_same_device(a: torch.device, b: torch.device) -> bool:
+    return a.type == b.type and (
+        a.index is None or b.index is None or a.index == b.index
+    )
+
+
+_converted_models: WeakKeyDictionary[
+    ModelDescriptor, dict[tuple[str, torch.dtype], ModelDescriptor]
+] = WeakKeyDictionary()
+_converted_models_lock = threading.Lock()
+
+
+def to_device_and_dtype(
+    model: ModelDescriptor,
+    device: torch.device,
+    dtype: torch.dtype | None = None,
+) -> ModelDescriptor:
+    """
+    Returns the given model on the given device with the given dtype.
+
+    Loaded models are shared between nodes and runs by the model registry, so
+    they must not be changed in place. If the model isn't on the device with the
+    dtype already, a converted copy is returned. The copy is kept as long as the
+    model is alive, so converting the same model again is free.
+    """
+    if dtype is None:
+        dtype = model.dtype
+    if _is_same_device(model.device, device) and model.dtype == dtype:
+        return model
+
+    key = (str(device), dtype)
+    with _converted_models_lock:
+        converted = _converted_models.setdefault(model, {})
+        copy_ = converted.get(key)
+        if copy_ is None:
+            copy_ = copy.deepcopy(model).to(device, dtype)
+            converted[key] = copy_
+        return copy_
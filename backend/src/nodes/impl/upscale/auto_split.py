@@ -1,16 +1,25 @@
 from __future__ import annotations
 
+import functools
 import math
-from collections.abc import Callable
+from collections import deque
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
 
 import numpy as np
+import psutil
 
 from api import Progress
 from logger import logger
 
-from ...utils.utils import Region, Size, get_h_w_c
+from ...utils.utils import Padding, Region, Size, get_h_w_c
 from .exact_split import exact_split
-from .tile_blending import BlendDirection, TileBlender, TileOverlap, half_sin_blend_fn
+from .tile_blending import (
+    StreamingTileBlender,
+    TileOverlap,
+    empty_result,
+    half_sin_blend_fn,
+)
 from .tiler import Tiler
 
 
@@ -19,6 +28,16 @@ class Split:
 
 
 SplitImageOp = Callable[[np.ndarray, Region], np.ndarray | Split]
+BatchSplitImageOp = Callable[[list[np.ndarray], list[Region]], list[np.ndarray] | Split]
+"""
+Upscales multiple tiles of the same size at once. If the batch is too large, then
+`Split` can be returned to request smaller batches.
+"""
+PrefetchOp = Callable[[list[np.ndarray], list[Region]], None]
+"""
+Called with the tiles of the next upscale call before the current call is made, so
+that the input of the next call can be prepared while the current one runs.
+"""
 
 
 def auto_split(
@@ -27,6 +46,10 @@ def auto_split(
     tiler: Tiler,
     overlap: int = 16,
     progress: Progress | None = None,
+    upscale_batch: BatchSplitImageOp | None = None,
+    max_batch_pixels: int = 0,
+    prefetch: PrefetchOp | None = None,
+    blend_in_background: bool = False,
 ) -> np.ndarray:
     """
     Splits the image into tiles according to the given tiler.
@@ -40,12 +63,32 @@ def auto_split(
 
     If the given tiler allows smaller tile sizes, then it is guaranteed that no padding will be added.
     Otherwise, no padding is only guaranteed if the starting tile size is not larger than the size of the given image.
+
+    ## Batching
+
+    If `upscale_batch` is given, then tiles of the same size within a row of tiles are upscaled together
+    in batches of at most `max_batch_pixels` (input) pixels. This is only supported if the tiler allows smaller tile sizes.
+
+    ## Pipelining
+
+    If the tiler allows smaller tile sizes, then `prefetch` is called with the tiles of the next upscale call before
+    the current call, and `blend_in_background` blends upscaled tiles into the result on a separate thread.
     """
 
     h, w, c = get_h_w_c(img)
-    split = _max_split if tiler.allow_smaller_tile_size() else _exact_split
 
-    return split(
+    if tiler.allow_smaller_tile_size():
+        return _max_split(
+            img,
+            upscale=_TileBatcher(upscale, upscale_batch, max_batch_pixels, prefetch),
+            starting_tile_size=tiler.starting_tile_size(w, h, c),
+            split_tile_size=tiler.split,
+            overlap=overlap,
+            progress=progress,
+            blend_in_background=blend_in_background,
+        )
+
+    return _exact_split(
         img,
         upscale=upscale,
         starting_tile_size=tiler.starting_tile_size(w, h, c),
@@ -55,6 +98,123 @@ def auto_split(
     )
 
 
+class _TileBatcher:
+    """
+    Upscales a row of tiles, batching consecutive tiles of the same size.
+
+    If a batch requests a split, the batch size is halved first. Only when single
+    tiles request a split is the split passed on, so that the tile size is lowered.
+    """
+
+    def __init__(
+        self,
+        upscale: SplitImageOp,
+        upscale_batch: BatchSplitImageOp | None,
+        max_batch_pixels: int,
+        prefetch: PrefetchOp | None = None,
+    ) -> None:
+        self.upscale = upscale
+        self.upscale_batch = upscale_batch
+        self.max_batch_pixels = max_batch_pixels
+        self.max_batch_size: int | None = None
+        self.prefetch = prefetch
+
+    def __call__(self, img: np.ndarray, region: Region) -> np.ndarray | Split:
+        return self.upscale(img, region)
+
+    def _batch_size(self, tile: Region) -> int:
+        if self.upscale_batch is None:
+            return 1
+        size = max(1, self.max_batch_pixels // (tile.width * tile.height))
+        if self.max_batch_size is not None:
+            size = min(size, self.max_batch_size)
+        return size
+
+    def _next_batch(self, tiles: list[Region], start: int) -> list[Region]:
+        batch_size = self._batch_size(tiles[start])
+        batch = [tiles[start]]
+        while (
+            len(batch) < batch_size
+            and start + len(batch) < len(tiles)
+            and tiles[start + len(batch)].size == tiles[start].size
+        ):
+            batch.append(tiles[start + len(batch)])
+        return batch
+
+    def _prefetch(self, img: np.ndarray, batch: list[Region]) -> None:
+        if self.prefetch is not None:
+            self.prefetch([t.read_from(img) for t in batch], batch)
+
+    def upscale_row(
+        self,
+        img: np.ndarray,
+        tiles: list[Region],
+        next_row: list[Region] | None = None,
+    ) -> Iterator[np.ndarray | Split]:
+        i = 0
+        while i < len(tiles):
+            batch = self._next_batch(tiles, i)
+
+            # let the next call prepare while this one runs
+            if i + len(batch) < len(tiles):
+                self._prefetch(img, self._next_batch(tiles, i + len(batch)))
+            elif next_row:
+                self._prefetch(img, self._next_batch(next_row, 0))
+
+            if len(batch) == 1 or self.upscale_batch is None:
+                yield self.upscale(tiles[i].read_from(img), tiles[i])
+                i += 1
+                continue
+
+            results = self.upscale_batch([t.read_from(img) for t in batch], batch)
+            if isinstance(results, Split):
+                self.max_batch_size = len(batch) // 2
+                logger.debug(
+                    "Batch split occurred. New max batch size is %d.",
+                    self.max_batch_size,
+                )
+                continue
+
+            assert len(results) == len(batch)
+            yield from results
+            i += len(batch)
+
+
+class _Blender:
+    """
+    Runs blending operations in order, either directly or on a background thread.
+    """
+
+    MAX_PENDING = 2
+
+    def __init__(self, background: bool) -> None:
+        self._executor: ThreadPoolExecutor | None = None
+        if background:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="tile-blender"
+            )
+        self._pending: deque[Future[None]] = deque()
+
+    def submit(self, fn: Callable[[], None]) -> None:
+        if self._executor is None:
+            fn()
+            return
+
+        # don't let upscaled tiles pile up if blending is slower than upscaling
+        while len(self._pending) >= _Blender.MAX_PENDING:
+            self._pending.popleft().result()
+        self._pending.append(self._executor.submit(fn))
+
+    def wait(self) -> None:
+        """Waits for all submitted operations and raises their errors, if any."""
+        while self._pending:
+            self._pending.popleft().result()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+
 class _SplitEx(Exception):
     pass
 
@@ -103,11 +263,12 @@ def _exact_split(
 
 def _max_split(
     img: np.ndarray,
-    upscale: SplitImageOp,
+    upscale: _TileBatcher,
     starting_tile_size: Size,
     split_tile_size: Callable[[Size], Size],
     overlap: int,
     progress: Progress | None = None,
+    blend_in_background: bool = False,
 ) -> np.ndarray:
     """
     Splits the image into tiles with at most the given tile size.
@@ -144,6 +305,35 @@ def _max_split(
             max_tile_size,
         )
 
+    blender = _Blender(blend_in_background)
+    try:
+        result = _max_split_tiles(
+            img,
+            upscale,
+            max_tile_size,
+            split_tile_size,
+            overlap,
+            progress,
+            blender,
+        )
+    finally:
+        blender.close()
+
+    return result
+
+
+def _max_split_tiles(
+    img: np.ndarray,
+    upscale: _TileBatcher,
+    max_tile_size: Size,
+    split_tile_size: Callable[[Size], Size],
+    overlap: int,
+    progress: Progress | None,
+    blender: _Blender,
+) -> np.ndarray:
+    h, w, _ = get_h_w_c(img)
+    img_region = Region(0, 0, w, h)
+
     # The upscale method is allowed to request splits at any time.
     # When a split occurs, we have to "restart" the loop and
     # this variable allow us to split the already processed tiles.
@@ -151,9 +341,8 @@ def _max_split(
 
     # To allocate the result image, we need to know the upscale factor first,
     # and we only get to know this factor after the first successful upscale.
-    result: TileBlender | None = None
+    result: StreamingTileBlender | None = None
     scale: int = 0
-    out_channels: int = 0
 
     restart = True
     while restart:
@@ -179,31 +368,46 @@ def _max_split(
             tile_size_y,
         )
 
-        prev_row_result: TileBlender | None = None
         tiles_processed = 0
 
+        rows: list[tuple[list[Padding], list[Region]]] = []
         for y in range(tile_count_y):
-            if y < start_y:
-                continue
-
-            row_result: TileBlender | None = None
-            row_overlap: TileOverlap | None = None
-
+            pads: list[Padding] = []
+            padded_tiles: list[Region] = []
             for x in range(tile_count_x):
                 tile = Region(
                     x * tile_size_x, y * tile_size_y, tile_size_x, tile_size_y
                 ).intersect(img_region)
                 pad = img_region.child_padding(tile).min(overlap)
-                padded_tile = tile.add_padding(pad)
+                pads.append(pad)
+                padded_tiles.append(tile.add_padding(pad))
+            rows.append((pads, padded_tiles))
+
+        for y in range(tile_count_y):
+            if y < start_y:
+                continue
 
-                upscale_result = upscale(padded_tile.read_from(img), padded_tile)
+            row_started = False
 
+            pads, padded_tiles = rows[y]
+            next_row = rows[y + 1][1] if y + 1 < tile_count_y else None
+            row_results = upscale.upscale_row(img, padded_tiles, next_row)
+            for pad, padded_tile, upscale_result in zip(
+                pads, padded_tiles, row_results, strict=True
+            ):
                 if isinstance(upscale_result, Split):
                     max_tile_size = split_tile_size(max_tile_size)
 
                     new_tile_count_y = math.ceil(h / max_tile_size[1])
                     new_tile_size_y = math.ceil(h / new_tile_count_y)
-                    start_y = (y * tile_size_x) // new_tile_size_y
+
+                    # restart at the last row of the new tiling that starts
+                    # within the rows that were already blended
+                    blender.wait()
+                    start_y = 0
+                    if result is not None:
+                        start_y = result.offset // scale // new_tile_size_y
+                        result.rewind(start_y * new_tile_size_y * scale)
 
                     logger.debug(
                         "Split occurred. New tile size is %s. Starting at row %d.",
@@ -211,11 +415,6 @@ def _max_split(
                         start_y,
                     )
 
-                    # reset result
-                    if result is not None:
-                        # we already added at least one row, so we have to set the offset back
-                        result.offset = start_y * new_tile_size_y
-
                     restart = True
                     break
 
@@ -226,26 +425,33 @@ def _max_split(
                 assert padded_tile.height * current_scale == up_h
                 assert padded_tile.width * current_scale == up_w
 
-                if row_result is None:
+                if result is None:
                     # allocate the result image
                     scale = current_scale
-                    out_channels = up_c
-                    row_result = TileBlender(
-                        width=w * scale,
-                        height=padded_tile.height * scale,
-                        channels=out_channels,
-                        direction=BlendDirection.X,
+                    result = StreamingTileBlender(
+                        _allocate_result(h * scale, w * scale, up_c),
                         blend_fn=half_sin_blend_fn,
-                        _prev=prev_row_result,
                     )
-                    prev_row_result = row_result
-                    row_overlap = TileOverlap(pad.top * scale, pad.bottom * scale)
 
                 assert current_scale == scale
 
+                if not row_started:
+                    row_started = True
+                    blender.submit(
+                        functools.partial(
+                            result.begin_row,
+                            up_h,
+                            TileOverlap(pad.top * scale, pad.bottom * scale),
+                        )
+                    )
+
                 # add to row
-                row_result.add_tile(
-                    upscale_result, TileOverlap(pad.left * scale, pad.right * scale)
+                blender.submit(
+                    functools.partial(
+                        result.add_tile,
+                        upscale_result,
+                        TileOverlap(pad.left * scale, pad.right * scale),
+                    )
                 )
 
                 # Report progress after each tile
@@ -256,20 +462,26 @@ def _max_split(
             if restart:
                 break
 
-            assert row_result is not None
-            assert row_overlap is not None
-
-            if result is None:
-                result = TileBlender(
-                    width=w * scale,
-                    height=h * scale,
-                    channels=out_channels,
-                    direction=BlendDirection.Y,
-                    blend_fn=half_sin_blend_fn,
-                )
-
-            # add row
-            result.add_tile(row_result.get_result(), row_overlap)
+            assert result is not None
+            blender.submit(result.end_row)
 
+    blender.wait()
     assert result is not None
     return result.get_result()
+
+
+def _allocate_result(height: int, width: int, channels: int) -> np.ndarray:
+    """
+    Allocates the result image. Results that would take up more than half of the
+    available memory are backed by a temporary file instead.
+    """
+    size = height * width * channels * 4
+    memmap = size > psutil.virtual_memory().available // 2
+    if memmap:
+        logger.info(
+            "Upscaled image (%dx%dpx @ %d) is too large for memory. Using a temporary file.",
+            width,
+            height,
+            channels,
+        )
+    return empty_result(height, width, channels, memmap=memmap)
@@ -11,7 +11,12 @@ from logger import logger
 
 from ...utils.utils import Padding, Region, Size, get_h_w_c
 from ..image_utils import BorderType, create_border
-from .tile_blending import BlendDirection, TileBlender, TileOverlap, half_sin_blend_fn
+from .tile_blending import (
+    StreamingTileBlender,
+    TileOverlap,
+    empty_result,
+    half_sin_blend_fn,
+)
 
 
 def _pad_image(img: np.ndarray, min_size: Size):
@@ -146,17 +151,15 @@ def _exact_split_without_padding(
 
     # To allocate the result image, we need to know the upscale factor first,
     # and we only get to know this factor after the first successful upscale.
-    result: TileBlender | None = None
+    result: StreamingTileBlender | None = None
     scale: int = 0
-    out_channels: int = 0
 
     regions = _exact_split_into_regions(w, h, exact_w, exact_h, overlap)
     total_tiles = sum(len(row) for row in regions)
     tiles_processed = 0
 
     for row in regions:
-        row_result: TileBlender | None = None
-        row_overlap: TileOverlap | None = None
+        row_started = False
 
         for tile, pad in row:
             padded_tile = tile.add_padding(pad)
@@ -171,22 +174,21 @@ def _exact_split_without_padding(
             assert exact_h * current_scale == up_h
             assert exact_w * current_scale == up_w
 
-            if row_result is None:
+            if result is None:
                 # allocate the result image
                 scale = current_scale
-                out_channels = up_c
-                row_result = TileBlender(
-                    width=w * scale,
-                    height=exact_h * scale,
-                    channels=out_channels,
-                    direction=BlendDirection.X,
+                result = StreamingTileBlender(
+                    empty_result(h * scale, w * scale, up_c),
                     blend_fn=half_sin_blend_fn,
                 )
-                row_overlap = TileOverlap(pad.top * scale, pad.bottom * scale)
 
             assert current_scale == scale
 
-            row_result.add_tile(
+            if not row_started:
+                row_started = True
+                result.begin_row(up_h, TileOverlap(pad.top * scale, pad.bottom * scale))
+
+            result.add_tile(
                 upscale_result, TileOverlap(pad.left * scale, pad.right * scale)
             )
 
@@ -195,18 +197,8 @@ def _exact_split_without_padding(
             if progress is not None:
                 progress.set_progress(tiles_processed / total_tiles)
 
-        assert row_result is not None
-        assert row_overlap is not None
-        if result is None:
-            result = TileBlender(
-                width=w * scale,
-                height=h * scale,
-                channels=out_channels,
-                direction=BlendDirection.Y,
-                blend_fn=half_sin_blend_fn,
-            )
-
-        result.add_tile(row_result.get_result(), row_overlap)
+        assert result is not None
+        result.end_row()
 
     assert result is not None
 
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
+import functools
 import math
+import tempfile
 from collections.abc import Callable
 from dataclasses import dataclass
 from enum import Enum
@@ -35,16 +37,54 @@ class TileOverlap:
         return self.start + self.end
 
 
-def _fast_mix(a: np.ndarray, b: np.ndarray, blend: np.ndarray) -> np.ndarray:
+def _mix_into(a: np.ndarray, b: np.ndarray, blend: np.ndarray) -> None:
     """
-    Returns `a * (1 - blend) + b * blend`
+    Sets `a` to `a * (1 - blend) + b * blend` in place.
     """
-    # a * (1 - blend) + b * blend
-    # a - a * blend + b * blend
-    r = b * blend
-    r += a
-    r -= a * blend  # type: ignore
-    return r
+    # a * (1 - blend) + b * blend = a + (b - a) * blend
+    d = np.subtract(b, a, dtype=np.float32)
+    d *= blend
+    a += d
+
+
+@functools.lru_cache(maxsize=64)
+def _get_blend(
+    blend_fn: Callable[[np.ndarray], np.ndarray],
+    blend_size: int,
+    direction: BlendDirection,
+) -> np.ndarray:
+    """
+    Returns the blend weights for the given overlap size. The weights are shaped to
+    broadcast along the other axes.
+    """
+    blend = blend_fn(np.arange(blend_size, dtype=np.float32) / (blend_size - 1))
+    if direction == BlendDirection.X:
+        blend = blend.reshape((1, blend_size, 1))
+    else:
+        blend = blend.reshape((blend_size, 1, 1))
+    blend = blend.astype(np.float32, copy=False)
+    blend.setflags(write=False)
+    return blend
+
+
+def empty_result(
+    height: int, width: int, channels: int, memmap: bool = False
+) -> np.ndarray:
+    """
+    Returns a zeroed float32 image.
+
+    If `memmap` is true, the image is backed by an anonymous temporary file instead
+    of memory, so that the OS can page it out. This allows results larger than the
+    available RAM.
+    """
+    shape = (height, width, channels)
+    if not memmap:
+        return np.zeros(shape, dtype=np.float32)
+
+    # the file is deleted once it (and the mapping) is closed
+    with tempfile.TemporaryFile(prefix="chaiNNer-tiles-") as f:
+        mapped = np.memmap(f, dtype=np.float32, mode="w+", shape=shape)
+    return mapped.view(np.ndarray)
 
 
 class TileBlender:
@@ -56,23 +96,28 @@ class TileBlender:
         direction: BlendDirection,
         blend_fn: Callable[[np.ndarray], np.ndarray] = sin_blend_fn,
         _prev: TileBlender | None = None,
+        out: np.ndarray | None = None,
     ) -> None:
+        """
+        If `out` is given, tiles are blended into it in place. It must be a float32
+        image of the given size.
+        """
         self.direction: BlendDirection = direction
         self.blend_fn: Callable[[np.ndarray], np.ndarray] = blend_fn
         self.offset: int = 0
         self.last_end_overlap: int = 0
-        self._last_blend: np.ndarray | None = None
 
-        if (
+        if out is not None:
+            assert out.shape == (height, width, channels)
+            assert out.dtype == np.float32
+            result = out
+        elif (
             _prev is not None
             and _prev.direction == direction
             and _prev.width == width
             and _prev.height == height
             and _prev.channels == channels
         ):
-            if _prev.blend_fn == blend_fn:
-                # reuse blend
-                self._last_blend = _prev._last_blend  # noqa: SLF001
             result = _prev.result
         else:
             result = np.zeros((height, width, channels), dtype=np.float32)
@@ -91,29 +136,7 @@ class TileBlender:
         return self.result.shape[2]
 
     def _get_blend(self, blend_size: int) -> np.ndarray:
-        if self.direction == BlendDirection.X:
-            if self._last_blend is not None and self._last_blend.shape[1] == blend_size:
-                return self._last_blend
-
-            blend = self.blend_fn(
-                np.arange(blend_size, dtype=np.float32) / (blend_size - 1)
-            )
-            blend = blend.reshape((1, blend_size, 1))
-            blend = np.repeat(blend, repeats=self.height, axis=0)
-            blend = np.repeat(blend, repeats=self.channels, axis=2)
-        else:
-            if self._last_blend is not None and self._last_blend.shape[0] == blend_size:
-                return self._last_blend
-
-            blend = self.blend_fn(
-                np.arange(blend_size, dtype=np.float32) / (blend_size - 1)
-            )
-            blend = blend.reshape((blend_size, 1, 1))
-            blend = np.repeat(blend, repeats=self.width, axis=1)
-            blend = np.repeat(blend, repeats=self.channels, axis=2)
-
-        self._last_blend = blend
-        return blend
+        return _get_blend(self.blend_fn, blend_size, self.direction)
 
     def add_tile(self, tile: np.ndarray, overlap: TileOverlap) -> None:
         h, w, c = get_h_w_c(tile)
@@ -156,9 +179,7 @@ class TileBlender:
                 ]
                 right = tile[:, :blend_size, ...]
 
-                self.result[:, self.offset - o.start : self.offset + o.start, ...] = (
-                    _fast_mix(left, right, blend)
-                )
+                _mix_into(left, right, blend)
 
                 self.offset += w - o.total
                 self.last_end_overlap = o.end
@@ -198,9 +219,7 @@ class TileBlender:
                 ]
                 right = tile[: o.start * 2, :, ...]
 
-                self.result[self.offset - o.start : self.offset + o.start, :, ...] = (
-                    _fast_mix(left, right, blend)
-                )
+                _mix_into(left, right, blend)
 
                 self.offset += h - o.total
                 self.last_end_overlap = o.end
@@ -212,3 +231,146 @@ class TileBlender:
             assert self.offset == self.height
 
         return self.result
+
+
+@dataclass
+class _StreamingRow:
+    skip: int
+    band_size: int
+    height: int
+    overlap: TileOverlap
+    band: TileBlender | None
+    body: TileBlender
+
+
+class StreamingTileBlender:
+    """
+    Blends rows of tiles directly into the result image.
+
+    This produces the same image as blending each row of tiles with a `TileBlender`
+    and then blending the rows with another `TileBlender`, but without allocating a
+    full-width buffer for each row. The parts of a row's tiles that do not overlap
+    the previous row are blended in place into the result. Only the band in which
+    the row overlaps the previous row is buffered, and it is blended into the result
+    once the row is complete.
+    """
+
+    def __init__(
+        self,
+        result: np.ndarray,
+        blend_fn: Callable[[np.ndarray], np.ndarray] = sin_blend_fn,
+    ) -> None:
+        assert result.ndim == 3
+        assert result.dtype == np.float32
+        self.result: np.ndarray = result
+        self.blend_fn: Callable[[np.ndarray], np.ndarray] = blend_fn
+        self.offset: int = 0
+        self.last_end_overlap: int = 0
+        self._row: _StreamingRow | None = None
+        self._band: np.ndarray | None = None
+
+    @property
+    def width(self) -> int:
+        return self.result.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self.result.shape[0]
+
+    @property
+    def channels(self) -> int:
+        return self.result.shape[2]
+
+    def begin_row(self, height: int, overlap: TileOverlap) -> None:
+        """
+        Starts a new row of tiles with the given height and vertical overlap.
+
+        Any row that was started but not ended is discarded.
+        """
+        assert self.offset < self.height, "All rows were filled in already"
+        o = overlap
+        skip = 0
+
+        if self.offset == 0:
+            assert o.start == 0
+        elif self.last_end_overlap < o.start:
+            # we can't use all the overlap of the current row, so we have to cut it off
+            skip = o.start - self.last_end_overlap
+            o = TileOverlap(self.last_end_overlap, o.end)
+
+        height -= skip
+        assert height > o.total
+
+        band_size = o.start * 2
+        band: TileBlender | None = None
+        if band_size > 0:
+            band_shape = (band_size, self.width, self.channels)
+            if self._band is None or self._band.shape != band_shape:
+                self._band = np.empty(band_shape, dtype=np.float32)
+            band = TileBlender(
+                width=self.width,
+                height=band_size,
+                channels=self.channels,
+                direction=BlendDirection.X,
+                blend_fn=self.blend_fn,
+                out=self._band,
+            )
+
+        body_start = self.offset + o.start
+        body_end = self.offset + height - o.start
+        body = TileBlender(
+            width=self.width,
+            height=body_end - body_start,
+            channels=self.channels,
+            direction=BlendDirection.X,
+            blend_fn=self.blend_fn,
+            out=self.result[body_start:body_end],
+        )
+
+        self._row = _StreamingRow(skip, band_size, height, o, band, body)
+
+    def add_tile(self, tile: np.ndarray, overlap: TileOverlap) -> None:
+        """
+        Adds the next tile of the current row with the given horizontal overlap.
+        """
+        row = self._row
+        assert row is not None, "No row was started"
+
+        tile = tile[row.skip :]
+        if row.band is not None:
+            row.band.add_tile(tile[: row.band_size], overlap)
+        row.body.add_tile(tile[row.band_size :], overlap)
+
+    def end_row(self) -> None:
+        row = self._row
+        assert row is not None, "No row was started"
+        self._row = None
+
+        row.body.get_result()
+        if row.band is not None:
+            o = row.overlap
+            _mix_into(
+                self.result[self.offset - o.start : self.offset + o.start],
+                row.band.get_result(),
+                _get_blend(self.blend_fn, row.band_size, BlendDirection.Y),
+            )
+
+        self.offset += row.height - row.overlap.total
+        self.last_end_overlap = row.overlap.end
+
+    def rewind(self, offset: int) -> None:
+        """
+        Moves back to the given offset, discarding the current row, if any.
+
+        The rows blended above the current offset are kept, so the next row (e.g.
+        of a different tiling) is blended with the part of them below `offset`.
+        """
+        assert 0 <= offset <= self.offset
+        self._row = None
+        self.last_end_overlap = self.offset - offset
+        self.offset = offset
+
+    def get_result(self) -> np.ndarray:
+        assert self._row is None, "The current row was not ended"
+        assert self.offset == self.height
+        return self.result
@@ -1,14 +1,23 @@
+import queue
 import subprocess
+import threading
+import weakref
+from collections import deque
+from collections.abc import Iterator
 from dataclasses import dataclass
+from enum import Enum
 from io import BufferedIOBase
 from pathlib import Path
+from typing import IO
 
 import ffmpeg
 import numpy as np
 
 from logger import logger
 
+from ..utils.utils import get_h_w_c
 from .ffmpeg import FFMpegEnv
+from .image_utils import to_uint8, to_uint16
 
 
 @dataclass(frozen=True)
@@ -68,43 +77,327 @@ class VideoMetadata:
         )
 
 
+class VideoPixelFormat(Enum):
+    """The pixel formats ffmpeg can decode frames into."""
+
+    BGR24 = "bgr24"
+    BGR48 = "bgr48le"
+    GBRPF32 = "gbrpf32le"
+
+    @property
+    def dtype(self) -> np.dtype:
+        if self == VideoPixelFormat.BGR24:
+            return np.dtype(np.uint8)
+        if self == VideoPixelFormat.BGR48:
+            return np.dtype("<u2")
+        return np.dtype("<f4")
+
+    @property
+    def planar(self) -> bool:
+        return self == VideoPixelFormat.GBRPF32
+
+
 class VideoLoader:
     def __init__(self, path: Path, ffmpeg_env: FFMpegEnv):
         self.path = path
         self.ffmpeg_env = ffmpeg_env
         self.metadata = VideoMetadata.from_file(path, ffmpeg_env)
 
-    def get_audio_stream(self):
-        return ffmpeg.input(self.path).audio
+    def get_audio_stream(self, start_frame: int = 0, end_frame: int | None = None):
+        """Returns the audio stream of the video, trimmed to the given frame range."""
+        params: dict[str, float] = {}
+        if start_frame > 0:
+            params["ss"] = start_frame / self.metadata.fps
+        if end_frame is not None:
+            params["t"] = max(0, end_frame - start_frame) / self.metadata.fps
+        return ffmpeg.input(self.path, **params).audio
+
+    def frame_count(
+        self, start_frame: int = 0, end_frame: int | None = None, stride: int = 1
+    ) -> int:
+        """The number of frames `stream_frames` yields for the given range."""
+        end = self.metadata.frame_count
+        if end_frame is not None:
+            end = min(end, end_frame)
+        return max(0, -(-(end - start_frame) // stride))
+
+    def get_frame_reader(
+        self,
+        pixel_format: VideoPixelFormat,
+        start_frame: int = 0,
+        end_frame: int | None = None,
+        stride: int = 1,
+    ):
+        """Returns the ffmpeg output that writes the given frames to stdout."""
+        input_params: dict[str, float] = {}
+        if start_frame > 0:
+            # seek to half a frame before the start, so rounding errors can't skip it
+            input_params["ss"] = (start_frame - 0.5) / self.metadata.fps
+        output_params: dict[str, int] = {}
+        if end_frame is not None:
+            output_params["vframes"] = max(0, -(-(end_frame - start_frame) // stride))
 
-    def stream_frames(self):
+        video = ffmpeg.input(self.path, **input_params)
+        if stride > 1:
+            video = video.filter("framestep", stride)
+
+        return video.output(
+            "pipe:",
+            format="rawvideo",
+            pix_fmt=pixel_format.value,
+            sws_flags="lanczos+accurate_rnd+full_chroma_int+full_chroma_inp+bitexact",
+            loglevel="error",
+            **output_params,
+        )
+
+    def stream_frames(
+        self,
+        pixel_format: VideoPixelFormat = VideoPixelFormat.BGR24,
+        decode_ahead: int = 4,
+        start_frame: int = 0,
+        end_frame: int | None = None,
+        stride: int = 1,
+    ) -> Iterator[np.ndarray]:
         """
-        Returns an iterator that yields frames as BGR uint8 numpy arrays.
+        Returns an iterator that yields frames as writable BGR numpy arrays of the
+        dtype of the given pixel format.
+
+        Only every `stride`-th frame from `start_frame` (inclusive) to `end_frame`
+        (exclusive) is yielded. The start is seeked to on the input side, so
+        ffmpeg only decodes from the keyframe before it instead of from the start
+        of the video.
+
+        Frames are decoded on a background thread up to `decode_ahead` frames ahead
+        of the consumer. The memory of frames is reused for later frames once all
+        arrays referencing it are gone, so consumers may keep (and modify) frames
+        as long as they like.
         """
 
-        ffmpeg_reader = (
-            ffmpeg.input(self.path)
-            .output(
-                "pipe:",
-                format="rawvideo",
-                pix_fmt="bgr24",
-                sws_flags="lanczos+accurate_rnd+full_chroma_int+full_chroma_inp+bitexact",
-                loglevel="error",
-            )
-            .run_async(pipe_stdout=True, pipe_stderr=False, cmd=self.ffmpeg_env.ffmpeg)
-        )
+        if end_frame is not None and end_frame <= start_frame:
+            return
+
+        ffmpeg_reader = self.get_frame_reader(
+            pixel_format, start_frame, end_frame, stride
+        ).run_async(pipe_stdout=True, pipe_stderr=False, cmd=self.ffmpeg_env.ffmpeg)
         assert isinstance(ffmpeg_reader, subprocess.Popen)
 
         with ffmpeg_reader:
-            assert isinstance(ffmpeg_reader.stdout, BufferedIOBase)
+            stdout = ffmpeg_reader.stdout
+            assert isinstance(stdout, BufferedIOBase)
+
+            pool = _FramePool(self.metadata.width, self.metadata.height, pixel_format)
+
+            if decode_ahead <= 0:
+                while True:
+                    frame = pool.read(stdout)
+                    if frame is None:
+                        break
+                    yield frame
+                return
+
+            frames: queue.Queue[np.ndarray | Exception | None] = queue.Queue(
+                decode_ahead
+            )
+            stop = threading.Event()
+
+            def put(item: np.ndarray | Exception | None) -> bool:
+                while not stop.is_set():
+                    try:
+                        frames.put(item, timeout=0.1)
+                        return True
+                    except queue.Full:
+                        pass
+                return False
+
+            def decode():
+                try:
+                    while True:
+                        frame = pool.read(stdout)
+                        if frame is None or not put(frame):
+                            break
+                except Exception as e:
+                    put(e)
+                finally:
+                    put(None)
+
+            thread = threading.Thread(target=decode, daemon=True, name="video decode")
+            thread.start()
+            done = False
+            try:
+                while True:
+                    item = frames.get()
+                    if item is None:
+                        done = True
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+            finally:
+                stop.set()
+                if not done:
+                    # the consumer stopped early, so ffmpeg has to be stopped too
+                    ffmpeg_reader.kill()
+                thread.join()
+
+
+_GBR_PLANES = (1, 0, 2)
+"""The indexes of the G, B, and R planes of planar frames in BGR order."""
+
+
+class _FramePool:
+    """
+    Reads raw frames from ffmpeg's output into recycled buffers.
 
-            width = self.metadata.width
-            height = self.metadata.height
+    Every frame is read directly into a buffer with `readinto`, so no intermediate
+    bytes objects are created and the returned arrays are writable. A buffer is
+    returned to the pool when the last array referencing it is garbage collected,
+    so the pool only grows to the number of frames alive at the same time.
+    """
 
+    def __init__(self, width: int, height: int, pixel_format: VideoPixelFormat):
+        self.width = width
+        self.height = height
+        self.pixel_format = pixel_format
+        self.frame_bytes = width * height * 3 * pixel_format.dtype.itemsize
+        self._free: deque[bytearray] = deque()
+
+    def read(self, stream: BufferedIOBase) -> np.ndarray | None:
+        """Reads the next frame. Returns `None` at the end of the stream."""
+        try:
+            buffer = self._free.pop()
+        except IndexError:
+            buffer = bytearray(self.frame_bytes)
+
+        with memoryview(buffer) as view:
+            if self.pixel_format.planar:
+                plane_bytes = self.frame_bytes // 3
+                complete = all(
+                    _read_exact(stream, view[i * plane_bytes : (i + 1) * plane_bytes])
+                    for i in _GBR_PLANES
+                )
+            else:
+                complete = _read_exact(stream, view)
+
+        if not complete:
+            self._free.append(buffer)
+            logger.debug("Can't receive frame (stream end?). Exiting ...")
+            return None
+
+        # all arrays derived from `flat` reference it as their base
+        flat = np.frombuffer(buffer, self.pixel_format.dtype)
+        weakref.finalize(flat, self._free.append, buffer)
+
+        if self.pixel_format.planar:
+            return flat.reshape([3, self.height, self.width]).transpose(1, 2, 0)
+        return flat.reshape([self.height, self.width, 3])
+
+
+def _read_exact(stream: BufferedIOBase, view: memoryview) -> bool:
+    """Fills the given view. Returns `False` if the stream ended before that."""
+    read = 0
+    while read < len(view):
+        n = stream.readinto(view[read:])
+        if not n:
+            return False
+        read += n
+    return True
+
+
+def to_pixel_format(img: np.ndarray, pixel_format: VideoPixelFormat) -> np.ndarray:
+    """
+    Converts a normalized BGR float32 image into a new C-contiguous array with the
+    memory layout of the given raw pixel format.
+    """
+    if pixel_format == VideoPixelFormat.BGR24:
+        return to_uint8(img, normalized=True)
+    if pixel_format == VideoPixelFormat.BGR48:
+        return to_uint16(img, normalized=True).astype("<u2", copy=False)
+
+    h, w, _ = get_h_w_c(img)
+    planes = np.empty((3, h, w), dtype="<f4")
+    for plane, channel in enumerate(_GBR_PLANES):
+        planes[plane] = img[:, :, channel]
+    return planes
+
+
+class FrameWriter:
+    """
+    Writes frames into the stdin of an ffmpeg process on a dedicated thread.
+
+    Frames are converted to the pipe's pixel format and written on the writer
+    thread, so encoding overlaps with the work of the caller. At most `queue_size`
+    frames are buffered; once the queue is full, `write` blocks until the encoder
+    catches up. Frames must not be modified after they have been written.
+
+    Errors of the writer thread (e.g. ffmpeg exiting early) are raised by the next
+    call to `write` or `close`.
+    """
+
+    def __init__(
+        self,
+        stdin: IO[bytes],
+        pixel_format: VideoPixelFormat,
+        queue_size: int = 4,
+    ):
+        self.stdin = stdin
+        self.pixel_format = pixel_format
+        self._frames: queue.Queue[np.ndarray | None] = queue.Queue(queue_size)
+        self._error: Exception | None = None
+        self._thread = threading.Thread(
+            target=self._run, daemon=True, name="video writer"
+        )
+        self._thread.start()
+
+    def _run(self):
+        try:
             while True:
-                in_bytes = ffmpeg_reader.stdout.read(width * height * 3)
-                if not in_bytes:
-                    logger.debug("Can't receive frame (stream end?). Exiting ...")
+                img = self._frames.get()
+                if img is None:
                     break
+                frame = to_pixel_format(img, self.pixel_format)
+                # write straight from the array's memory instead of copying it into a bytes object
+                self.stdin.write(memoryview(frame).cast("B"))
+        except Exception as e:
+            self._error = e
+            # unblock the producer, which will see the error on its next write
+            try:
+                while True:
+                    self._frames.get_nowait()
+            except queue.Empty:
+                pass
+        finally:
+            try:
+                self.stdin.close()
+            except Exception as e:
+                self._error = self._error or e
 
-                yield np.frombuffer(in_bytes, np.uint8).reshape([height, width, 3])
+    def _raise_error(self):
+        if self._error is not None:
+            raise RuntimeError(f"Failed to write video frame: {self._error}") from (
+                self._error
+            )
+
+    def write(self, img: np.ndarray):
+        self._raise_error()
+        self._frames.put(img)
+
+    def close(self):
+        """Writes all remaining frames and closes stdin."""
+        if self._thread.is_alive():
+            self._frames.put(None)
+            self._thread.join()
+        self._raise_error()
+
+    def abort(self):
+        """
+        Discards all frames that haven't been written yet and closes stdin. Errors
+        of the writer thread are ignored.
+        """
+        if self._thread.is_alive():
+            try:
+                while True:
+                    self._frames.get_nowait()
+            except queue.Empty:
+                pass
+            self._frames.put(None)
+            self._thread.join()
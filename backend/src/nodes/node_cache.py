@@ -5,6 +5,7 @@ import hashlib
 import os
 import tempfile
 import time
+import weakref
 from collections.abc import Iterable
 from enum import Enum
 from typing import NewType
@@ -19,16 +20,73 @@ CACHE_REGISTRY: list[NodeOutputCache] = []
 
 
 class CachedNumpyArray:
-    def __init__(self, arr: np.ndarray):
-        self.file = tempfile.TemporaryFile()
-        self.file.write(arr.tobytes())
+    """
+    A numpy array stored in a temporary file.
+
+    The file is memory-mapped, so `value` returns a read-only view of it without
+    reading or copying the data. The OS keeps hot pages in memory and is free to
+    page out cold ones.
+    """
 
+    def __init__(self, arr: np.ndarray):
         self.shape = arr.shape
         self.dtype = arr.dtype
 
+        if arr.nbytes == 0:
+            # empty files cannot be memory-mapped
+            self.file = None
+            self._view = np.empty(arr.shape, dtype=arr.dtype)
+        else:
+            self.file = tempfile.TemporaryFile()
+            np.ascontiguousarray(arr).tofile(self.file)
+            self.file.flush()
+            self._view = np.memmap(
+                self.file, dtype=self.dtype, mode="r", shape=self.shape
+            ).view(np.ndarray)
+        self._view.flags.writeable = False
+
     def value(self) -> np.ndarray:
-        self.file.seek(0)
-        return np.frombuffer(self.file.read(), dtype=self.dtype).reshape(self.shape)
+        return self._view
+
+    def close(self):
+        # views handed out before keep the mapping alive
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+_FINGERPRINTS: dict[int, tuple[weakref.ref[np.ndarray], tuple, bytes]] = {}
+
+
+def fingerprint_array(arr: np.ndarray) -> bytes:
+    """
+    Returns a SHA-256 digest of the contents of the given array.
+
+    The digest is remembered for as long as the array object is alive, so passing
+    the same array to several cached nodes only hashes it once. Like everywhere
+    else in the executor, arrays are assumed not to be modified in place after
+    they were passed to a node.
+    """
+    layout = (arr.shape, arr.dtype.str, arr.strides, arr.__array_interface__["data"])
+    cached = _FINGERPRINTS.get(id(arr))
+    if cached is not None:
+        ref, cached_layout, digest = cached
+        if ref() is arr and cached_layout == layout:
+            return digest
+
+    # hash the buffer directly instead of copying it with `tobytes`
+    digest = hashlib.sha256(np.ascontiguousarray(arr).data).digest()
+
+    key = id(arr)
+
+    def forget(dead: weakref.ref[np.ndarray]):
+        # the id might already be reused by another array
+        entry = _FINGERPRINTS.get(key)
+        if entry is not None and entry[0] is dead:
+            del _FINGERPRINTS[key]
+
+    _FINGERPRINTS[key] = weakref.ref(arr, forget), layout, digest
+    return digest
 
 
 CacheKey = NewType("CacheKey", tuple)
@@ -55,7 +113,7 @@ class NodeOutputCache:
             elif isinstance(arg, np.ndarray):
                 key.append(tuple(arg.shape))
                 key.append(arg.dtype.str)
-                key.append(hashlib.sha256(arg.tobytes()).digest())
+                key.append(fingerprint_array(arg))
             elif hasattr(arg, "cache_key_func"):
                 key.append(arg.__class__.__name__)
                 key.append(arg.cache_key_func())  # type: ignore
@@ -144,12 +202,17 @@ class NodeOutputCache:
 
     def put(self, args: Iterable[object], output: object):
         key = self._args_to_key(args)
+        if key in self._data:
+            self.drop(key)
         self._data[key] = self._write_arrays_to_disk(self._output_to_list(output))
         self._bytes[key] = self._estimate_bytes(self._output_to_list(output))
         self._access_time[key] = time.time()
         self._enforce_limits()
 
     def drop(self, key: CacheKey):
+        for item in self._data[key]:
+            if isinstance(item, CachedNumpyArray):
+                item.close()
         del self._data[key]
         del self._bytes[key]
         del self._access_time[key]
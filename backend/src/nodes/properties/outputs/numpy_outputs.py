@@ -1,12 +1,14 @@
 from __future__ import annotations
 
 import base64
+import weakref
 
 import cv2
 import numpy as np
 
 import navi
 from api import BaseOutput, BroadcastData, InputId, OutputKind
+from preview_store import preview_store, preview_url
 
 from ...impl.image_utils import normalize, to_uint8
 from ...impl.resize import ResizeFilter, resize
@@ -128,6 +130,34 @@ class ImageOutput(NumPyOutput):
         return value
 
 
+def preview_resize(
+    img: np.ndarray, target_size: int = 512, grace: float = 1.2
+) -> np.ndarray:
+    """
+    Downscales the image to the given preview size, unless it is already at most
+    `grace` times larger than that.
+    """
+    h, w, _ = get_h_w_c(img)
+
+    max_size = target_size * grace
+    if w > max_size or h > max_size:
+        f = max(w / target_size, h / target_size)
+        t = (max(1, round_half_up(w / f)), max(1, round_half_up(h / f)))
+        img = resize(img, t, ResizeFilter.BOX)
+    return img
+
+
+def _encode_preview(img: np.ndarray, lossless: bool) -> tuple[bytes, str]:
+    _, _, c = get_h_w_c(img)
+    image_format = "png" if c > 3 or lossless else "jpg"
+    _, encoded_img = cv2.imencode(f".{image_format}", to_uint8(img, normalized=True))  # type: ignore
+    return encoded_img.tobytes(), image_format
+
+
+def _content_type(image_format: str) -> str:
+    return "image/png" if image_format == "png" else "image/jpeg"
+
+
 def preview_encode(
     img: np.ndarray,
     target_size: int = 512,
@@ -138,23 +168,77 @@ def preview_encode(
     resize the image, so the preview loads faster and doesn't lag the UI
     512 was chosen as the default target because a 512x512 RGBA 8bit PNG is at most 1MB in size
     """
-    h, w, c = get_h_w_c(img)
+    img = preview_resize(img, target_size, grace)
+    encoded, image_format = _encode_preview(img, lossless)
+    base64_img = base64.b64encode(encoded).decode("utf8")
 
-    max_size = target_size * grace
-    if w > max_size or h > max_size:
-        f = max(w / target_size, h / target_size)
-        t = (max(1, round_half_up(w / f)), max(1, round_half_up(h / f)))
-        img = resize(img, t, ResizeFilter.BOX)
+    return f"data:image/{image_format};base64,{base64_img}", img
 
-    image_format = "png" if c > 3 or lossless else "jpg"
 
-    _, encoded_img = cv2.imencode(f".{image_format}", to_uint8(img, normalized=True))  # type: ignore
-    base64_img = base64.b64encode(encoded_img).decode("utf8")  # type: ignore
+def _add_lazy_preview(img: np.ndarray, lossless: bool) -> str:
+    """
+    Adds a preview of the given (already resized) image to the preview store. The
+    preview is only encoded once it is requested. Returns its id.
+    """
+    img = to_uint8(img, normalized=True)
+
+    def encode() -> tuple[bytes, str]:
+        encoded, image_format = _encode_preview(img, lossless)
+        return encoded, _content_type(image_format)
+
+    return preview_store.add(img.nbytes, encode)
+
+
+def _add_encoded_preview(img: np.ndarray, lossless: bool) -> str:
+    """
+    Encodes a preview of the given (already resized) image and adds it to the
+    preview store. Returns its id.
+    """
+    encoded, image_format = _encode_preview(img, lossless)
+    return preview_store.add_encoded((encoded, _content_type(image_format)))
+
+
+_broadcast_memo: dict[
+    int, tuple[weakref.ref[np.ndarray], BroadcastData, list[str]]
+] = {}
+"""
+The broadcast data of recently broadcast images, keyed by object identity.
+
+Outputs are read-only, so the same array (e.g. the output of a pass-through
+node) always has the same previews.
+"""
 
-    return f"data:image/{image_format};base64,{base64_img}", img
+
+def _recall_broadcast(img: np.ndarray) -> BroadcastData | None:
+    entry = _broadcast_memo.get(id(img))
+    if entry is None or entry[0]() is not img:
+        return None
+    _, data, preview_ids = entry
+    if not all(p in preview_store for p in preview_ids):
+        # some previews have been evicted
+        return None
+    return data
+
+
+def _remember_broadcast(img: np.ndarray, data: BroadcastData, preview_ids: list[str]):
+    key = id(img)
+
+    def forget(dead: weakref.ref[np.ndarray]):
+        # the id might already be reused by another object
+        entry = _broadcast_memo.get(key)
+        if entry is not None and entry[0] is dead:
+            del _broadcast_memo[key]
+
+    _broadcast_memo[key] = weakref.ref(img, forget), data, preview_ids
 
 
 class LargeImageOutput(ImageOutput):
+    EAGER_PREVIEW_SIZE = 512
+    """
+    Previews up to this size are encoded right away. Larger previews are encoded
+    on demand when the client requests them.
+    """
+
     def __init__(
         self,
         label: str = "Image",
@@ -172,6 +256,10 @@ class LargeImageOutput(ImageOutput):
         )
 
     def get_broadcast_data(self, value: np.ndarray):
+        remembered = _recall_broadcast(value)
+        if remembered is not None:
+            return remembered
+
         img = value
         h, w, c = get_h_w_c(img)
         image_size = max(h, w)
@@ -191,26 +279,33 @@ class LargeImageOutput(ImageOutput):
                 break
 
         previews = []
+        preview_ids: list[str] = []
 
         # Encode for multiple scales. Use the preceding scale to save time encoding the smaller sizes.
         last_encoded = img
         for size in preview_sizes[start_index:]:
             largest_preview = size == preview_sizes[start_index]
-            url, last_encoded = preview_encode(
-                last_encoded,
-                target_size=size,
-                grace=preview_size_grace,
-                lossless=largest_preview,
-            )
+            last_encoded = preview_resize(last_encoded, size, preview_size_grace)
+            if size > LargeImageOutput.EAGER_PREVIEW_SIZE:
+                preview_id = _add_lazy_preview(last_encoded, lossless=largest_preview)
+            else:
+                preview_id = _add_encoded_preview(
+                    last_encoded, lossless=largest_preview
+                )
+            preview_ids.append(preview_id)
             le_h, le_w, _ = get_h_w_c(last_encoded)
-            previews.append({"width": le_w, "height": le_h, "url": url})
+            previews.append(
+                {"width": le_w, "height": le_h, "url": preview_url(preview_id)}
+            )
 
-        return {
+        data = {
             "previews": previews,
             "height": h,
             "width": w,
             "channels": c,
         }
+        _remember_broadcast(value, data, preview_ids)
+        return data
 
 
 def VideoOutput():
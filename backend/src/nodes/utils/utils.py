@@ -4,6 +4,7 @@ from __future__ import annotations
 import math
 import os
 import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dataclasses import dataclass
 from pathlib import Path
 
@@ -116,6 +117,54 @@ def list_all_files_sorted(
     return just_files
 
 
+def scan_files_sorted(
+    directory: Path,
+    recursive: bool,
+    ext_filter: list[str] | None = None,
+    workers: int = 16,
+) -> list[Path]:
+    """
+    Returns all files in the given directory (and its subdirectories if
+    `recursive`) with one of the given extensions, sorted by their full path.
+
+    Subdirectories are scanned concurrently. Listing a directory is dominated by
+    I/O latency on network drives, so this is a lot faster than a sequential walk
+    for large directory trees.
+    """
+    suffixes = None if ext_filter is None else tuple(e.lower() for e in ext_filter)
+
+    def scan(path: str) -> tuple[list[str], list[str]]:
+        files: list[str] = []
+        dirs: list[str] = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if recursive and entry.is_dir(follow_symlinks=False):
+                            dirs.append(entry.path)
+                        elif entry.is_file() and (
+                            suffixes is None or entry.name.lower().endswith(suffixes)
+                        ):
+                            files.append(entry.path)
+                    except OSError as e:
+                        walk_error_handler(e)
+        except OSError as e:
+            walk_error_handler(e)
+        return files, dirs
+
+    all_files: list[str] = []
+    with ThreadPoolExecutor(workers, thread_name_prefix="scan") as pool:
+        pending = {pool.submit(scan, str(directory))}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, dirs = future.result()
+                all_files.extend(files)
+                pending.update(pool.submit(scan, d) for d in dirs)
+
+    return [Path(f) for f in sorted(all_files, key=alphanumeric_sort)]
+
+
 @dataclass(frozen=True)
 class Padding:
     top: int
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+import os
 from pathlib import Path
 
+from model_registry import model_registry
 from nodes.groups import ncnn_file_inputs_group
 from nodes.impl.ncnn.model import NcnnModel, NcnnModelWrapper
 from nodes.impl.ncnn.optimizer import NcnnOptimizer
@@ -39,9 +41,19 @@ from .. import io_group
 def load_model_node(
     param_path: Path, bin_path: Path
 ) -> tuple[NcnnModelWrapper, Path, str]:
-    model = NcnnModel.load_from_file(str(param_path), str(bin_path))
-    NcnnOptimizer(model).optimize()
+    def load() -> NcnnModelWrapper:
+        model = NcnnModel.load_from_file(str(param_path), str(bin_path))
+        NcnnOptimizer(model).optimize()
+        return NcnnModelWrapper(model)
+
+    # loading the same files again returns the same model
+    model = model_registry.get_or_load(
+        model_registry.file_key([param_path, bin_path], format="ncnn"),
+        load,
+        size_of=lambda _: os.path.getsize(bin_path),
+        name=os.path.basename(param_path),
+    )
 
     model_dir, model_name, _ = split_file_path(param_path)
 
-    return NcnnModelWrapper(model), model_dir, model_name
+    return model, model_dir, model_name
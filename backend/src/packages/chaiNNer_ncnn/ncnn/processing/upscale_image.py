@@ -19,7 +19,7 @@ from logger import logger
 from nodes.groups import Condition, if_enum_group, if_group
 from nodes.impl.ncnn.auto_split import ncnn_auto_split
 from nodes.impl.ncnn.model import NcnnModelWrapper
-from nodes.impl.ncnn.session import get_ncnn_net
+from nodes.impl.ncnn.session import get_ncnn_session
 from nodes.impl.upscale.auto_split_tiles import (
     CUSTOM,
     TILE_SIZE_256,
@@ -78,7 +78,8 @@ def upscale_impl(
     tile_size: TileSize,
     progress: Progress | None = None,
 ):
-    net = get_ncnn_net(model, settings=settings)
+    session = get_ncnn_session(model, settings=settings)
+    net = session.net
     # Try/except block to catch errors
     try:
 
@@ -130,16 +131,18 @@ def upscale_impl(
                     progress=progress,
                 )
         else:
-            return ncnn_auto_split(
-                img,
-                net,
-                input_name=input_name,
-                output_name=output_name,
-                blob_vkallocator=None,
-                staging_vkallocator=None,
-                tiler=parse_tile_size_input(tile_size, estimate),
-                progress=progress,
-            )
+            with session.cpu_allocators() as cpu_allocators:
+                return ncnn_auto_split(
+                    img,
+                    net,
+                    input_name=input_name,
+                    output_name=output_name,
+                    blob_vkallocator=None,
+                    staging_vkallocator=None,
+                    tiler=parse_tile_size_input(tile_size, estimate),
+                    progress=progress,
+                    cpu_allocators=cpu_allocators,
+                )
     except (RuntimeError, ValueError):
         raise
     except Exception as e:
@@ -6,6 +6,7 @@ from pathlib import Path
 import onnx
 
 from logger import logger
+from model_registry import model_registry
 from nodes.impl.onnx.load import load_onnx_model
 from nodes.impl.onnx.model import OnnxModel
 from nodes.properties.inputs import OnnxFileInput
@@ -40,8 +41,17 @@ def load_model_node(path: Path) -> tuple[OnnxModel, Path, str]:
 
     assert os.path.isfile(path), f"Path {path} is not a file"
 
-    logger.debug("Reading onnx model from path: %s", path)
-    model = onnx.load_model(str(path))
+    def load() -> OnnxModel:
+        logger.debug("Reading onnx model from path: %s", path)
+        return load_onnx_model(onnx.load_model(str(path)))
+
+    # loading the same file again returns the same model
+    model = model_registry.get_or_load(
+        model_registry.file_key([path], format="onnx"),
+        load,
+        size_of=lambda m: len(m.bytes),
+        name=os.path.basename(path),
+    )
 
     dirname, basename, _ = split_file_path(path)
-    return load_onnx_model(model), dirname, basename
+    return model, dirname, basename
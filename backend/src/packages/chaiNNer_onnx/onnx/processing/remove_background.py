@@ -65,13 +65,7 @@ def remove_background_node(
     kernel_size: int,
 ) -> tuple[np.ndarray, np.ndarray]:
     settings = get_settings(context)
-    session = get_onnx_session(
-        model,
-        settings.gpu_index,
-        settings.execution_provider,
-        settings.tensorrt_fp16_mode,
-        settings.tensorrt_cache_path,
-    )
+    session = get_onnx_session(model, settings.get_session_config())
 
     # Remove alpha channel
     if img.shape[2] == 4:
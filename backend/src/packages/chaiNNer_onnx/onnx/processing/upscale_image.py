@@ -30,6 +30,8 @@ from nodes.utils.utils import get_h_w_c
 from ...settings import get_settings
 from .. import processing_group
 
+MAX_BATCH_PIXELS = 512 * 512
+
 
 def upscale(
     img: np.ndarray,
@@ -39,6 +41,7 @@ def upscale(
     exact_size: tuple[int, int] | None,
     size_req: SizeReq | None,
     progress: Progress | None = None,
+    max_batch_pixels: int = 0,
 ) -> np.ndarray:
     logger.debug("Upscaling image")
 
@@ -58,6 +61,8 @@ def upscale(
         tiler=tiler,
         size_req=size_req,
         progress=progress,
+        warm_up=True,
+        max_batch_pixels=max_batch_pixels,
     )
 
 
@@ -125,13 +130,7 @@ def upscale_image_node(
     separate_alpha: bool,
 ) -> np.ndarray:
     settings = get_settings(context)
-    session = get_onnx_session(
-        model,
-        settings.gpu_index,
-        settings.execution_provider,
-        settings.tensorrt_fp16_mode,
-        settings.tensorrt_cache_path,
-    )
+    session = get_onnx_session(model, settings.get_session_config())
 
     input_shape, in_nc, req_width, req_height = get_input_shape(session)
     _, out_nc, _, _ = get_output_shape(session)
@@ -146,6 +145,13 @@ def upscale_image_node(
     h, w, c = get_h_w_c(img)
     logger.debug("Image is %dx%dx%d", h, w, c)
 
+    # Small tiles are upscaled in batches to make better use of the hardware.
+    # TensorRT builds an engine for every input shape, so batches would only
+    # cause more engine builds.
+    max_batch_pixels = 0
+    if settings.execution_provider != "TensorrtExecutionProvider":
+        max_batch_pixels = MAX_BATCH_PIXELS
+
     use_size_req = (
         exact_size is None
         and model.info.scale_width is not None
@@ -164,6 +170,7 @@ def upscale_image_node(
             exact_size,
             model.info.size_req if use_size_req else None,
             progress=p,
+            max_batch_pixels=max_batch_pixels,
         ),
         separate_alpha,
         progress=context,
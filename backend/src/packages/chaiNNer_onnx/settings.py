@@ -6,9 +6,20 @@ from typing import cast
 
 import onnxruntime as ort
 
-from api import CacheSetting, DropdownSetting, NodeContext, ToggleSetting
+from api import (
+    CacheSetting,
+    DropdownSetting,
+    NodeContext,
+    NumberSetting,
+    ToggleSetting,
+)
 from gpu import nvidia
 from logger import logger
+from nodes.impl.onnx.session import (
+    ExecutionMode,
+    GraphOptimizationLevel,
+    SessionConfig,
+)
 from system import is_arm_mac
 
 from . import package
@@ -83,12 +94,92 @@ if not is_arm_mac:
     )
 
 
+cpu_count = os.cpu_count() or 1
+
+package.add_setting(
+    NumberSetting(
+        label="Thread Count",
+        key="intra_op_threads",
+        description="Number of threads ONNX uses to run a single operation. 0 uses one thread per physical CPU core. Lower this if you run several chains at the same time.",
+        default=0,
+        min=0,
+        max=cpu_count,
+    )
+)
+
+package.add_setting(
+    DropdownSetting(
+        label="Execution Mode",
+        key="execution_mode",
+        description="Whether independent operations of a model are run one after another or in parallel. Parallel execution only helps models with many branches.",
+        options=[
+            {"label": "Sequential", "value": "sequential"},
+            {"label": "Parallel", "value": "parallel"},
+        ],
+        default="sequential",
+    )
+)
+
+package.add_setting(
+    NumberSetting(
+        label="Parallel Thread Count",
+        key="inter_op_threads",
+        description="Number of threads used to run independent operations in parallel. 0 lets ONNX decide. Only affects the parallel execution mode.",
+        default=0,
+        min=0,
+        max=cpu_count,
+    )
+)
+
+package.add_setting(
+    DropdownSetting(
+        label="Graph Optimization Level",
+        key="graph_optimization",
+        description="How much ONNX optimizes models before running them. Higher levels are faster, but take longer to load a model.",
+        options=[
+            {"label": "Disabled", "value": "disabled"},
+            {"label": "Basic", "value": "basic"},
+            {"label": "Extended", "value": "extended"},
+            {"label": "All", "value": "all"},
+        ],
+        default="all",
+    )
+)
+
+package.add_setting(
+    CacheSetting(
+        label="Cache Optimized Models",
+        key="onnx_optimized_model_cache",
+        description="Whether to store optimized models, so models are only optimized the first time they are loaded. Only used with the CPU and CUDA execution providers.",
+        directory="onnx_optimized_model_cache",
+    )
+)
+
+
 @dataclass(frozen=True)
 class OnnxSettings:
     gpu_index: int
     execution_provider: str
     tensorrt_cache_path: str | None
     tensorrt_fp16_mode: bool
+    intra_op_threads: int
+    inter_op_threads: int
+    execution_mode: ExecutionMode
+    graph_optimization: GraphOptimizationLevel
+    optimized_model_cache_path: str | None
+
+    def get_session_config(self) -> SessionConfig:
+        return SessionConfig(
+            gpu_index=self.gpu_index,
+            execution_provider=self.execution_provider,
+            should_tensorrt_fp16=self.tensorrt_fp16_mode,
+            tensorrt_cache_path=self.tensorrt_cache_path,
+            intra_op_threads=self.intra_op_threads,
+            inter_op_threads=self.inter_op_threads,
+            execution_mode=self.execution_mode,
+            graph_optimization=self.graph_optimization,
+            optimized_model_cache_path=self.optimized_model_cache_path,
+        )
 
 
 def get_settings(context: NodeContext) -> OnnxSettings:
@@ -99,9 +190,23 @@ def get_settings(context: NodeContext) -> OnnxSettings:
     if tensorrt_cache_path and not os.path.exists(tensorrt_cache_path):
         os.makedirs(tensorrt_cache_path)
 
+    execution_mode = settings.get_str("execution_mode", "sequential")
+    if execution_mode not in ("sequential", "parallel"):
+        execution_mode = "sequential"
+    graph_optimization = settings.get_str("graph_optimization", "all")
+    if graph_optimization not in ("disabled", "basic", "extended", "all"):
+        graph_optimization = "all"
+
     return OnnxSettings(
         gpu_index=settings.get_int("gpu_index", 0, parse_str=True),
         execution_provider=settings.get_str("execution_provider", default_provider),
         tensorrt_cache_path=tensorrt_cache_path,
         tensorrt_fp16_mode=settings.get_bool("tensorrt_fp16_mode", False),
+        intra_op_threads=settings.get_int("intra_op_threads", 0),
+        inter_op_threads=settings.get_int("inter_op_threads", 0),
+        execution_mode=cast(ExecutionMode, execution_mode),
+        graph_optimization=cast(GraphOptimizationLevel, graph_optimization),
+        optimized_model_cache_path=settings.get_cache_location(
+            "onnx_optimized_model_cache"
+        ),
     )
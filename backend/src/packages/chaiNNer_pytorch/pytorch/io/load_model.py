@@ -8,6 +8,8 @@ from spandrel_extra_arches import EXTRA_REGISTRY
 
 from api import NodeContext
 from logger import logger
+from model_registry import model_registry
+from nodes.impl.pytorch.utils import get_model_size
 from nodes.properties.inputs import PthFileInput
 from nodes.properties.outputs import DirectoryOutput, FileNameOutput, ModelOutput
 from nodes.utils.utils import split_file_path
@@ -74,25 +76,35 @@ def load_model_node(
     exec_options = get_settings(context)
     pytorch_device = exec_options.device
 
-    try:
-        logger.debug("Reading state dict from path: %s", path)
-
-        model_descriptor = ModelLoader(pytorch_device).load_from_file(path)
-
-        for _, v in model_descriptor.model.named_parameters():
-            v.requires_grad = False
-        model_descriptor.model.eval()
-        model_descriptor = model_descriptor.to(pytorch_device)
-        should_use_fp16 = exec_options.use_fp16 and model_descriptor.supports_half
-        if should_use_fp16:
-            model_descriptor.model.half()
-        else:
-            model_descriptor.model.float()
-    except Exception as e:
-        raise ValueError(
-            f"Model {os.path.basename(path)} is unsupported by chaiNNer. Please try"
-            " another."
-        ) from e
+    def load() -> ModelDescriptor:
+        try:
+            logger.debug("Reading state dict from path: %s", path)
+
+            model_descriptor = ModelLoader(pytorch_device).load_from_file(path)
+
+            for _, v in model_descriptor.model.named_parameters():
+                v.requires_grad = False
+            model_descriptor.model.eval()
+            model_descriptor = model_descriptor.to(pytorch_device)
+            should_use_fp16 = exec_options.use_fp16 and model_descriptor.supports_half
+            if should_use_fp16:
+                model_descriptor.model.half()
+            else:
+                model_descriptor.model.float()
+            return model_descriptor
+        except Exception as e:
+            raise ValueError(
+                f"Model {os.path.basename(path)} is unsupported by chaiNNer. Please try"
+                " another."
+            ) from e
+
+    # loading the same file with the same settings again returns the same model
+    key = model_registry.file_key(
+        [path], format="pytorch", device=str(pytorch_device), fp16=exec_options.use_fp16
+    )
+    model_descriptor = model_registry.get_or_load(
+        key, load, size_of=get_model_size, name=os.path.basename(path)
+    )
 
     dirname, basename, _ = split_file_path(path)
     return model_descriptor, dirname, basename
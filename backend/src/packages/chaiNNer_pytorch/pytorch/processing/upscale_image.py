@@ -57,7 +57,8 @@ def upscale(
             # disable tiling if the model already does it internally
             tile_size = NO_TILING
 
-        def estimate():
+        def estimate_budget_tile_size() -> int | None:
+            """The largest tile size that fits into the memory budget."""
             model_bytes = MODEL_BYTES_CACHE.get(model)
             if model_bytes is None:
                 model_bytes = sum(p.numel() * 4 for p in model.model.parameters())
@@ -75,29 +76,38 @@ def upscale(
                 # Estimate using 80% of the value to be more conservative
                 budget = int(total * 0.8)
 
-                return MaxTileSize(
-                    estimate_tile_size(
-                        budget,
-                        model_bytes,
-                        img,
-                        2 if use_fp16 else 4,
-                    )
+                return estimate_tile_size(
+                    budget,
+                    model_bytes,
+                    img,
+                    2 if use_fp16 else 4,
                 )
             elif device.type == "cpu":
                 free = psutil.virtual_memory().available
                 if options.budget_limit > 0:
                     free = min(options.budget_limit * 1024**3, free)
                 budget = int(free * 0.8)
-                return MaxTileSize(
-                    estimate_tile_size(
-                        budget,
-                        model_bytes,
-                        img,
-                        4,
-                    )
+                return estimate_tile_size(
+                    budget,
+                    model_bytes,
+                    img,
+                    4,
                 )
+            return None
+
+        budget_tile_size = estimate_budget_tile_size()
+
+        def estimate():
+            if budget_tile_size is not None:
+                return MaxTileSize(budget_tile_size)
             return MaxTileSize()
 
+        # Tiles smaller than the budget allows (e.g. a manually selected tile size)
+        # are upscaled in batches to make better use of the hardware.
+        max_batch_pixels = 0
+        if budget_tile_size is not None and tile_size != NO_TILING:
+            max_batch_pixels = budget_tile_size**2
+
         img_out = pytorch_auto_split(
             img,
             model=model,
@@ -105,6 +115,7 @@ def upscale(
             use_fp16=use_fp16,
             tiler=parse_tile_size_input(tile_size, estimate),
             progress=progress,
+            max_batch_pixels=max_batch_pixels,
         )
         logger.debug("Done upscaling")
 
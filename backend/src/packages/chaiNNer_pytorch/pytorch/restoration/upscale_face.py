@@ -11,7 +11,12 @@ from api import KeyInfo, NodeContext
 from logger import logger
 from nodes.groups import Condition, if_group
 from nodes.impl.image_utils import to_uint8
-from nodes.impl.pytorch.utils import np2tensor, safe_cuda_cache_empty, tensor2np
+from nodes.impl.pytorch.utils import (
+    np2tensor,
+    safe_cuda_cache_empty,
+    tensor2np,
+    to_device_and_dtype,
+)
 from nodes.properties.inputs import FaceModelInput, ImageInput, NumberInput, SliderInput
 from nodes.properties.outputs import ImageOutput
 from nodes.utils.utils import get_h_w_c
@@ -51,10 +56,9 @@ def upscale(
     face_helper.align_warp_face()
 
     should_use_fp16 = exec_options.use_fp16 and face_model.supports_half
-    if should_use_fp16:
-        face_model.model.half()
-    else:
-        face_model.model.float()
+    face_model = to_device_and_dtype(
+        face_model, device, torch.float16 if should_use_fp16 else torch.float32
+    )
 
     # face restoration
     for cropped_face in face_helper.cropped_faces:
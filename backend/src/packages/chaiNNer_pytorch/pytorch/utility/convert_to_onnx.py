@@ -13,6 +13,7 @@ from nodes.impl.pytorch.convert_to_onnx_impl import (
     convert_to_onnx_impl,
     is_onnx_supported,
 )
+from nodes.impl.pytorch.utils import to_device_and_dtype
 from nodes.properties.inputs import BoolInput, EnumInput, OnnxFpDropdown, SrModelInput
 from nodes.properties.outputs import OnnxModelOutput, TextOutput
 
@@ -104,7 +105,7 @@ def convert_to_onnx_node(
                 f"This {model.architecture.name} model does not support FP16. Please convert as FP32."
             )
 
-    model.eval().to(device)
+    model = to_device_and_dtype(model, device, torch.float16 if fp16 else torch.float32)
 
     onnx_model_bytes = convert_to_onnx_impl(
         model,
@@ -13,7 +13,7 @@ from spandrel import (
 
 from api.node_context import NodeContext
 from logger import logger
-from nodes.impl.pytorch.utils import np2tensor, tensor2np
+from nodes.impl.pytorch.utils import np2tensor, tensor2np, to_device_and_dtype
 from nodes.properties.inputs import ModelInput, SliderInput
 from nodes.properties.outputs import ModelOutput, NumberOutput
 from packages.chaiNNer_pytorch.settings import get_settings
@@ -117,8 +117,8 @@ def interpolate_models_node(
         return model_b, 0, 100
 
     if model_a.device != model_b.device:
-        model_a.to(pytorch_device)
-        model_b.to(pytorch_device)
+        model_a = to_device_and_dtype(model_a, pytorch_device)
+        model_b = to_device_and_dtype(model_b, pytorch_device)
 
     state_a = model_a.model.state_dict()
     state_b = model_b.model.state_dict()
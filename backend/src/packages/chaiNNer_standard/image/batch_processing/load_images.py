@@ -6,9 +6,11 @@ from pathlib import Path
 import numpy as np
 from wcmatch import glob
 
-from api import Generator, IteratorOutputInfo
+import navi
+from api import Generator, IteratorOutputInfo, OutputId
 from nodes.groups import Condition, if_group
 from nodes.impl.image_formats import get_available_image_formats
+from nodes.impl.image_metadata import ImageSizeRange
 from nodes.properties.inputs import BoolInput, DirectoryInput, NumberInput, TextInput
 from nodes.properties.outputs import (
     DirectoryOutput,
@@ -16,7 +18,7 @@ from nodes.properties.outputs import (
     NumberOutput,
     TextOutput,
 )
-from nodes.utils.utils import alphanumeric_sort
+from nodes.utils.utils import alphanumeric_sort, scan_files_sorted
 
 from .. import batch_processing_group
 from ..io.load_image import load_image_node
@@ -57,6 +59,25 @@ def list_glob(directory: Path, globexpr: str, ext_filter: list[str]) -> list[Pat
     ]
 
 
+def _size_type(min_value: int, max_value: int) -> navi.ExpressionJson:
+    if min_value == max_value:
+        return min_value
+    return navi.int_interval(min_value, max_value)
+
+
+MAX_PROBED_FILES = 100
+"""The maximum number of files whose headers are read to get their sizes."""
+
+
+def get_item_types(sizes: ImageSizeRange):
+    return {
+        OutputId(0): navi.Image(
+            width=_size_type(sizes.min_width, sizes.max_width),
+            height=_size_type(sizes.min_height, sizes.max_height),
+        ),
+    }
+
+
 @batch_processing_group.register(
     schema_id="chainner:image:load_images",
     name="Load Images",
@@ -88,6 +109,11 @@ def list_glob(directory: Path, globexpr: str, ext_filter: list[str]) -> list[Pat
             "Instead of collecting errors and throwing them at the end of processing, stop iteration and throw an error as soon as one occurs.",
             hint=True,
         ),
+        NumberInput("Parallel Loads", default=4, min=0, max=64)
+        .with_docs(
+            "The number of images that are read and decoded in parallel ahead of the current image. This mostly helps with large images and slow (e.g. network) drives. Set to 0 to load images one at a time."
+        )
+        .with_id(7),
     ],
     outputs=[
         ImageOutput(),
@@ -99,7 +125,7 @@ def list_glob(directory: Path, globexpr: str, ext_filter: list[str]) -> list[Pat
     iterator_outputs=IteratorOutputInfo(
         outputs=[0, 2, 3, 4],
         length_type="if Input4 { min(uint, Input5) } else { uint }",
-    ),
+    ).with_item_types(ImageSizeRange, get_item_types),  # type: ignore
     kind="generator",
     side_effects=True,
 )
@@ -111,6 +137,7 @@ def load_images_node(
     use_limit: bool,
     limit: int,
     fail_fast: bool,
+    parallel_loads: int,
 ) -> tuple[Generator[tuple[np.ndarray, str, str, int]], Path]:
     def load_image(path: Path, index: int):
         img, img_dir, basename = load_image_node(path)
@@ -120,17 +147,26 @@ def load_images_node(
 
     supported_filetypes = get_available_image_formats()
 
-    if not use_glob:
-        glob_str = "**/*" if is_recursive else "*"
-
-    just_image_files = list_glob(directory, glob_str, supported_filetypes)
+    if use_glob:
+        just_image_files = list_glob(directory, glob_str, supported_filetypes)
+    else:
+        just_image_files = scan_files_sorted(
+            directory, is_recursive, supported_filetypes
+        )
     if not len(just_image_files):
         raise FileNotFoundError(f"{directory} has no valid images.")
 
     if use_limit:
         just_image_files = just_image_files[:limit]
 
+    # only the headers are read, so the image type is known before decoding. This
+    # is skipped for large directories, so the first image isn't delayed by a
+    # pass over all files.
+    sizes = ImageSizeRange.probe(just_image_files, max_files=MAX_PROBED_FILES)
+
     return (
-        Generator.from_list(just_image_files, load_image).with_fail_fast(fail_fast),
+        Generator.from_list(just_image_files, load_image, workers=parallel_loads)
+        .with_fail_fast(fail_fast)
+        .with_metadata(sizes),
         directory,
     )
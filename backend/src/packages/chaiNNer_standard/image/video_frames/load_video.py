@@ -9,8 +9,13 @@ import navi
 from api import Generator, IteratorOutputInfo, NodeContext, OutputId
 from nodes.groups import Condition, if_group
 from nodes.impl.ffmpeg import FFMpegEnv
-from nodes.impl.video import VideoLoader, VideoMetadata
-from nodes.properties.inputs import BoolInput, NumberInput, VideoFileInput
+from nodes.impl.video import VideoLoader, VideoMetadata, VideoPixelFormat
+from nodes.properties.inputs import (
+    BoolInput,
+    EnumInput,
+    NumberInput,
+    VideoFileInput,
+)
 from nodes.properties.outputs import (
     AudioStreamOutput,
     DirectoryOutput,
@@ -51,13 +56,50 @@ def get_item_types(metadata: VideoMetadata):
             )
             .with_id(2)
         ),
+        BoolInput("Use range", default=False).with_id(4),
+        if_group(Condition.bool(4, True))(
+            NumberInput("Start Frame", default=0, min=0)
+            .with_docs(
+                "The index of the first frame to iterate over. FFMPEG seeks to this frame directly, so frames before it are not decoded."
+                " This can be used to resume an interrupted run or to split a long video across several runs."
+            )
+            .with_id(5),
+            NumberInput("End Frame", min=0)
+            .make_optional()
+            .with_docs(
+                "The index of the frame to stop at (exclusive). If empty, frames are iterated until the end of the video."
+            )
+            .with_id(6),
+            NumberInput("Frame Step", default=1, min=1)
+            .with_docs(
+                "Only every n-th frame starting at the start frame is used.",
+                "The audio stream is only trimmed to the range, not strided. With a frame step greater than 1, it will be longer than a video of the remaining frames at the original FPS.",
+            )
+            .with_id(7),
+        ),
+        EnumInput(
+            VideoPixelFormat,
+            label="Bit Depth",
+            default=VideoPixelFormat.BGR24,
+            option_labels={
+                VideoPixelFormat.BGR24: "8-bit",
+                VideoPixelFormat.BGR48: "16-bit",
+                VideoPixelFormat.GBRPF32: "32-bit float",
+            },
+        )
+        .with_docs(
+            "The precision frames are decoded with. Use 16-bit or 32-bit float for high-bit-depth (e.g. 10-bit HDR) videos to avoid losing precision."
+        )
+        .with_id(3),
     ],
     outputs=[
         ImageOutput("Frame", channels=3),
         NumberOutput(
             "Index",
-            output_type="min(uint, max(0, IterOutput0.length - 1))",
-        ).with_docs("A counter that starts at 0 and increments by 1 for each frame."),
+            output_type="if Input4 { uint } else { min(uint, max(0, IterOutput0.length - 1)) }",
+        ).with_docs(
+            "The index of the frame in the video. Without a range, this is a counter that starts at 0 and increments by 1 for each frame."
+        ),
         DirectoryOutput("Video Directory", of_input=0),
         FileNameOutput("Name", of_input=0),
         NumberOutput("FPS", output_type="0.."),
@@ -75,19 +117,33 @@ def load_video_node(
     path: Path,
     use_limit: bool,
     limit: int,
+    use_range: bool,
+    start_frame: int,
+    end_frame: int | None,
+    frame_step: int,
+    pixel_format: VideoPixelFormat,
 ) -> tuple[Generator[tuple[np.ndarray, int]], Path, str, float, Any]:
     video_dir, video_name, _ = split_file_path(path)
 
     loader = VideoLoader(path, FFMpegEnv.get_integrated(node_context.storage_dir))
-    frame_count = loader.metadata.frame_count
+    if not use_range:
+        start_frame, end_frame, frame_step = 0, None, 1
+
+    frame_count = loader.frame_count(start_frame, end_frame, frame_step)
     if use_limit:
         frame_count = min(frame_count, limit)
 
-    audio_stream = loader.get_audio_stream()
+    audio_stream = loader.get_audio_stream(start_frame, end_frame)
 
     def iterator():
-        for index, frame in enumerate(loader.stream_frames()):
-            yield frame, index
+        frames = loader.stream_frames(
+            pixel_format,
+            start_frame=start_frame,
+            end_frame=end_frame,
+            stride=frame_step,
+        )
+        for index, frame in enumerate(frames):
+            yield frame, start_frame + index * frame_step
 
             if use_limit and index + 1 >= limit:
                 break
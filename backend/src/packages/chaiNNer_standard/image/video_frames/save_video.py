@@ -14,7 +14,7 @@ from api import Collector, IteratorInputInfo, KeyInfo, NodeContext
 from logger import logger
 from nodes.groups import Condition, if_enum_group, if_group
 from nodes.impl.ffmpeg import FFMpegEnv
-from nodes.impl.image_utils import to_uint8
+from nodes.impl.video import FrameWriter, VideoPixelFormat
 from nodes.properties.inputs import (
     DirectoryInput,
     EnumInput,
@@ -165,7 +165,9 @@ class Writer:
     output_params: dict[str, str | float]
     global_params: list[str]
     ffmpeg_env: FFMpegEnv
+    pixel_format: VideoPixelFormat = VideoPixelFormat.BGR24
     out: Popen | None = None
+    frame_writer: FrameWriter | None = None
 
     def start(self, width: int, height: int):
         # Create the writer and run process
@@ -181,7 +183,7 @@ class Writer:
                     ffmpeg.input(
                         "pipe:",
                         format="rawvideo",
-                        pix_fmt="bgr24",
+                        pix_fmt=self.pixel_format.value,
                         s=f"{width}x{height}",
                         r=self.fps,
                         loglevel="error",
@@ -193,6 +195,8 @@ class Writer:
                         pipe_stdin=True, pipe_stdout=False, cmd=self.ffmpeg_env.ffmpeg
                     )
                 )
+                assert self.out.stdin is not None
+                self.frame_writer = FrameWriter(self.out.stdin, self.pixel_format)
 
             except Exception as e:
                 logger.warning("Failed to open video writer", exc_info=e)
@@ -203,17 +207,30 @@ class Writer:
             h, w, _ = get_h_w_c(img)
             self.start(w, h)
 
-        out_frame = to_uint8(img, normalized=True)
-        if self.out is not None and self.out.stdin is not None:
-            self.out.stdin.write(out_frame.tobytes())
+        if self.frame_writer is not None:
+            self.frame_writer.write(img)
         else:
             raise RuntimeError("Failed to open video writer")
 
+    def abort(self):
+        """Stops ffmpeg without finishing the video. Does nothing after `close`."""
+        if self.out is None or self.out.returncode is not None:
+            return
+        # killing ffmpeg first makes pending writes fail instead of block
+        self.out.kill()
+        try:
+            if self.frame_writer is not None:
+                self.frame_writer.abort()
+        finally:
+            self.out.wait()
+
     def close(self):
         if self.out is not None:
-            if self.out.stdin is not None:
-                self.out.stdin.close()
-            self.out.wait()
+            try:
+                if self.frame_writer is not None:
+                    self.frame_writer.close()
+            finally:
+                self.out.wait()
 
         if self.audio is not None:
             video_path = self.save_path
@@ -368,6 +385,21 @@ class Writer:
                 )
                 .with_id(9),
             ),
+            EnumInput(
+                VideoPixelFormat,
+                label="Bit Depth",
+                label_style="inline",
+                default=VideoPixelFormat.BGR24,
+                option_labels={
+                    VideoPixelFormat.BGR24: "8-bit",
+                    VideoPixelFormat.BGR48: "16-bit",
+                    VideoPixelFormat.GBRPF32: "32-bit float",
+                },
+            )
+            .with_docs(
+                "The precision frames are passed to FFMPEG with. Use 16-bit or 32-bit float together with a high-bit-depth output pixel format (e.g. `-pix_fmt yuv420p10le` in the additional parameters) to avoid quantizing frames to 8 bits before encoding."
+            )
+            .with_id(19),
             TextInput(
                 "Additional parameters",
                 multiline=True,
@@ -436,6 +468,7 @@ def save_video_node(
     encoder: VideoEncoder,
     video_preset: VideoPreset,
     crf: int,
+    pixel_format: VideoPixelFormat,
     additional_parameters: str | None,
     simple_video_format: SimpleVideoFormat,
     quality: int,
@@ -447,6 +480,7 @@ def save_video_node(
         container, encoder, video_preset, crf = get_simple_format(
             simple_video_format, quality
         )
+        pixel_format = VideoPixelFormat.BGR24
 
     save_path = (save_dir / f"{video_name}.{container.ext}").resolve()
     save_path.parent.mkdir(parents=True, exist_ok=True)
@@ -505,8 +539,12 @@ def save_video_node(
         output_params=output_params,
         global_params=global_params,
         ffmpeg_env=FFMpegEnv.get_integrated(node_context.storage_dir),
+        pixel_format=pixel_format,
     )
 
+    # close ffmpeg if the iteration is aborted or fails
+    node_context.add_cleanup(writer.abort, after="chain")
+
     def on_iterate(img: np.ndarray):
         writer.write_frame(img)
 
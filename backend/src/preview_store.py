@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import secrets
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+EncodedPreview = tuple[bytes, str]
+"""The encoded image and its content type, e.g. `image/png`."""
+
+
+@dataclass
+class _Entry:
+    encode: Callable[[], EncodedPreview] | None
+    size: int
+    encoded: EncodedPreview | None = None
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class PreviewStore:
+    """
+    A short-lived store for the image previews of node broadcasts.
+
+    Broadcasts only reference previews by URL, so the (potentially
+    multi-megabyte) images don't have to be sent through the SSE stream. Large
+    previews (e.g. 2048px PNGs) are expensive to encode and most of them are never
+    looked at, so they can be added lazily and are only encoded once a client
+    requests them. Entries are evicted in least recently added order once their
+    total size exceeds `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, preview_id: str) -> bool:
+        return preview_id in self._entries
+
+    def add(self, size: int, encode: Callable[[], EncodedPreview]) -> str:
+        """
+        Adds a preview that is encoded by the given function on first access.
+        `size` is the number of bytes kept alive by the function. Returns the id
+        of the preview.
+        """
+        return self._add_entry(_Entry(encode, size))
+
+    def add_encoded(self, encoded: EncodedPreview) -> str:
+        """Adds an already encoded preview. Returns the id of the preview."""
+        entry = _Entry(None, len(encoded[0]), encoded)
+        return self._add_entry(entry)
+
+    def _add_entry(self, entry: _Entry) -> str:
+        preview_id = secrets.token_urlsafe(12)
+        with self._lock:
+            self._entries[preview_id] = entry
+            self._size += entry.size
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted.size
+        return preview_id
+
+    def get(self, preview_id: str) -> EncodedPreview | None:
+        with self._lock:
+            entry = self._entries.get(preview_id)
+        if entry is None:
+            return None
+
+        with entry.lock:
+            if entry.encoded is None:
+                assert entry.encode is not None
+                entry.encoded = entry.encode()
+                entry.encode = None
+                with self._lock:
+                    if self._entries.get(preview_id) is entry:
+                        self._size += len(entry.encoded[0]) - entry.size
+                        entry.size = len(entry.encoded[0])
+            return entry.encoded
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+preview_store = PreviewStore(max_bytes=256 * 1024 * 1024)
+
+
+def preview_url(preview_id: str) -> str:
+    return f"/preview/{preview_id}"
+
+
+def preview_etag(preview_id: str) -> str:
+    # the content of a preview never changes, so its id is a strong validator
+    return f'"{preview_id}"'
@@ -42,8 +42,11 @@ from process_common import (
     NodeOutput,
     Output,
     RegularOutput,
+    get_output_size,
 )
+from profiler import ExecutionProfiler, NodeProfile
 from progress_controller import Aborted, ProgressController, ProgressToken
+from result_cache import ResultCache
 from util import combine_sets, timed_supplier
 
 
@@ -182,16 +185,24 @@ def enforce_generator_output(raw_output: object, node: NodeData) -> GeneratorOut
 
 
 def run_node(
-    node: NodeData, context: NodeContext, inputs: list[object], node_id: NodeId
+    node: NodeData,
+    context: NodeContext,
+    inputs: list[object],
+    node_id: NodeId,
+    result_cache: ResultCache | None = None,
+    options: ExecutionOptions | None = None,
+    profile: NodeProfile | None = None,
 ) -> NodeOutput | CollectorOutput:
     if node.kind == "collector":
         ignored_inputs = node.single_iterable_input.inputs
     else:
         ignored_inputs = []
 
+    enforce_start = time.perf_counter()
     enforced_inputs = enforce_inputs(inputs, node, node_id, ignored_inputs)
+    run_start = time.perf_counter()
 
-    try:
+    def run() -> NodeOutput | CollectorOutput:
         if node.node_context:
             raw_output = node.run(context, *enforced_inputs)
         else:
@@ -205,6 +216,11 @@ def run_node(
 
         assert node.kind == "regularNode"
         return enforce_output(raw_output, node)
+
+    try:
+        if result_cache is not None and options is not None:
+            return result_cache.run(node, options, enforced_inputs, run)
+        return run()
     except Aborted:
         raise
     except NodeExecutionError:
@@ -213,6 +229,10 @@ def run_node(
         # collect information to provide good error messages
         input_dict = collect_input_information(node, enforced_inputs)
         raise NodeExecutionError(node_id, node, str(e), input_dict) from e
+    finally:
+        if profile is not None:
+            profile.add("enforce", run_start - enforce_start)
+            profile.add("run", time.perf_counter() - run_start)
 
 
 def run_collector_iterate(
@@ -427,13 +447,25 @@ class Executor:
         pool: ThreadPoolExecutor,
         storage_dir: Path,
         parent_cache: OutputCache[NodeOutput] | None = None,
+        cache_max_bytes: int | None = None,
+        cache_spill_dir: Path | None = None,
+        result_cache: ResultCache | None = None,
+        profile: bool = True,
+        profile_events: bool = False,
+        broadcast_pool: ThreadPoolExecutor | None = None,
+        has_subscribers: Callable[[], bool] | None = None,
     ):
         self.id: ExecutionId = id
         self.chain = chain
         self.inputs: InputMap = InputMap.from_chain(chain)
         self.send_broadcast_data: bool = send_broadcast_data
         self.options: ExecutionOptions = options
-        self.node_cache: OutputCache[NodeOutput] = OutputCache(parent=parent_cache)
+        self.node_cache: OutputCache[NodeOutput] = OutputCache(
+            parent=parent_cache,
+            max_bytes=cache_max_bytes,
+            spill_dir=cache_spill_dir,
+            size_of=get_output_size,
+        )
         self.__broadcast_tasks: list[asyncio.Task[None]] = []
         self.__context_cache: dict[str, _ExecutorNodeContext] = {}
 
@@ -442,8 +474,19 @@ class Executor:
         self.loop: asyncio.AbstractEventLoop = loop
         self.queue: EventConsumer = queue
         self.pool: ThreadPoolExecutor = pool
+        # broadcasts (e.g. preview encoding) run on their own pool so they don't
+        # compete with nodes for worker threads
+        self.broadcast_pool: ThreadPoolExecutor = broadcast_pool or pool
+        # whether any client listens for broadcasts
+        self.has_subscribers: Callable[[], bool] = has_subscribers or (lambda: True)
+        self.__broadcast_generations: dict[NodeId, int] = {}
 
         self.cache_strategy: dict[NodeId, CacheStrategy] = get_cache_strategies(chain)
+        self.result_cache: ResultCache | None = result_cache
+
+        self.profiler = ExecutionProfiler(id, enabled=profile)
+        # whether to send a node-profile event when a node finishes
+        self.profile_events = profile_events
 
         self._storage_dir = storage_dir
 
@@ -618,7 +661,9 @@ class Executor:
         logger.debug("node: %s", node)
         logger.debug("Running node %s", node.id)
 
+        gather_start = time.perf_counter()
         inputs = await self.__gather_inputs(node)
+        self.profiler.add_upstream_wait(node.id, time.perf_counter() - gather_start)
         context = self.__get_node_context(node)
 
         def get_lazy_evaluation_time():
@@ -630,12 +675,25 @@ class Executor:
 
         lazy_time_before = get_lazy_evaluation_time()
 
+        profile = self.profiler.start(node.id, node.schema_id)
         output, execution_time = await self.loop.run_in_executor(
             self.pool,
             timed_supplier(
-                functools.partial(run_node, node.data, context, inputs, node.id)
+                profile.queued(
+                    functools.partial(
+                        run_node,
+                        node.data,
+                        context,
+                        inputs,
+                        node.id,
+                        self.result_cache,
+                        self.options,
+                        profile,
+                    )
+                )
             ),
         )
+        profile.set_output_bytes(get_output_size(output))
         await self.progress.suspend()
 
         for fn in context.node_cleanup_fns:
@@ -650,19 +708,26 @@ class Executor:
         execution_time -= lazy_time_after - lazy_time_before
 
         if isinstance(output, RegularOutput):
-            await self.__send_node_broadcast(node, output.output)
+            await self.__send_node_broadcast(node, output.output, profile=profile)
             self.__send_node_finish(node, execution_time)
         elif isinstance(output, GeneratorOutput):
             await self.__send_node_broadcast(
                 node,
                 output.partial_output,
                 generators=[output.generator],
+                profile=profile,
             )
             # TODO: execution time
 
         # Cache the output of the node
         if perform_cache and not isinstance(output, CollectorOutput):
-            self.node_cache.set(node.id, output, self.cache_strategy[node.id])
+            self.node_cache.set(
+                node.id,
+                output,
+                self.cache_strategy[node.id],
+                execution_time,
+                recomputable=not node.has_side_effects(),
+            )
 
         await self.progress.suspend()
 
@@ -797,22 +862,31 @@ class Executor:
                     generator_output = await self.process_generator_node(node)
                     generator_supplier = generator_suppliers[node.id]
 
-                    values = next(generator_supplier)
+                    profile = self.profiler.start(node.id, node.schema_id)
+                    with profile.measure("run"):
+                        values = next(generator_supplier)
 
                     # Check if the generator yielded an exception
                     if isinstance(values, Exception):
                         raise values
 
                     # write current values to cache
-                    iter_output = RegularOutput(
-                        self.__generator_fill_partial_output(
-                            node, generator_output.partial_output, values
+                    with profile.measure("enforce"):
+                        iter_output = RegularOutput(
+                            self.__generator_fill_partial_output(
+                                node, generator_output.partial_output, values
+                            )
                         )
+                    profile.set_output_bytes(get_output_size(iter_output))
+                    # the item can't be computed again without restarting the iterator
+                    self.node_cache.set(
+                        node.id, iter_output, StaticCaching, recomputable=False
                     )
-                    self.node_cache.set(node.id, iter_output, StaticCaching)
 
                     # broadcast
-                    await self.__send_node_broadcast(node, iter_output.output)
+                    await self.__send_node_broadcast(
+                        node, iter_output.output, profile=profile
+                    )
 
                 # run each of the output nodes
                 for output_node in output_nodes:
@@ -825,7 +899,10 @@ class Executor:
                         collector_node
                     )
                     await self.progress.suspend()
-                    with timer.run():
+                    profile = self.profiler.start(
+                        collector_node.id, collector_node.schema_id
+                    )
+                    with timer.run(), profile.measure("run"):
                         run_collector_iterate(collector_node, iterate_inputs, collector)
 
                 self.node_cache.delete_many(all_iterated_nodes)
@@ -884,10 +961,12 @@ class Executor:
             # TODO: execution time
             self.__send_node_finish(collector_node, timer.duration)
 
+            # collecting again would mean running the whole iteration again
             self.node_cache.set(
                 collector_node.id,
                 collector_output,
                 self.cache_strategy[collector_node.id],
+                recomputable=False,
             )
 
         if len(deferred_errors) > 0:
@@ -945,17 +1024,6 @@ class Executor:
             await self.progress.suspend()
             await self.process_regular_node(output_node)
 
-        # clear cache after the chain is done
-        self.node_cache.clear()
-
-        # Run cleanup functions
-        for context in self.__context_cache.values():
-            for fn in context.chain_cleanup_fns:
-                try:
-                    fn()
-                except Exception as e:
-                    logger.error("Error running cleanup function: %s", e)
-
         # await all broadcasts
         tasks = self.__broadcast_tasks
         self.__broadcast_tasks = []
@@ -967,7 +1035,21 @@ class Executor:
         try:
             await self.__process_nodes()
         finally:
-            gc.collect()
+            # cleanup functions also run if the chain failed or was aborted
+            self.__run_chain_cleanups()
+            # drop the outputs of this run (and any spilled files)
+            self.node_cache.clear()
+            self.profiler.finish()
+
+    def __run_chain_cleanups(self):
+        for context in self.__context_cache.values():
+            for fn in context.chain_cleanup_fns:
+                try:
+                    fn()
+                except Exception as e:
+                    logger.error("Error running cleanup function: %s", e)
+            context.chain_cleanup_fns.clear()
+        gc.collect()
 
     def resume(self):
         logger.debug("Resuming executor %s", self.id)
@@ -1073,12 +1155,31 @@ class Executor:
         node: Node,
         output: Output,
         generators: Iterable[Generator] | None = None,
+        profile: NodeProfile | None = None,
     ):
+        """
+        Sends the broadcast data of the given output. The time it takes to compute
+        it is added to the given profile of the run that produced the output.
+        """
+        # Broadcasts of iterated nodes are only needed for the latest item, so
+        # outdated ones are skipped. Broadcasts with sequence types are always sent.
+        generation = self.__broadcast_generations.get(node.id, 0) + 1
+        self.__broadcast_generations[node.id] = generation
+
+        def superseded() -> bool:
+            return (
+                generators is None
+                and self.__broadcast_generations[node.id] != generation
+            )
+
         def compute_broadcast_data():
-            if self.progress.aborted:
+            if self.progress.aborted or superseded():
                 # abort the broadcast if the chain was aborted
                 return None
+            start = time.perf_counter()
             foo = compute_broadcast(output, node.data.outputs)
+            if profile is not None:
+                profile.add("broadcast", time.perf_counter() - start)
             if generators is None:
                 return (*foo, {}, {})
             return (
@@ -1088,8 +1189,10 @@ class Executor:
 
         async def send_broadcast():
             # TODO: Add the time it takes to compute the broadcast data to the execution time
-            result = await self.loop.run_in_executor(self.pool, compute_broadcast_data)
-            if result is None or self.progress.aborted:
+            result = await self.loop.run_in_executor(
+                self.broadcast_pool, compute_broadcast_data
+            )
+            if result is None or self.progress.aborted or superseded():
                 return
 
             data, types, sequence_types, item_types = result
@@ -1107,7 +1210,11 @@ class Executor:
             self.queue.put({"event": "node-broadcast", "data": evant_data})
 
         # Only broadcast the output if the node has outputs
-        if self.send_broadcast_data and len(node.data.outputs) > 0:
+        if (
+            self.send_broadcast_data
+            and len(node.data.outputs) > 0
+            and self.has_subscribers()
+        ):
             # broadcasts are done is parallel, so don't wait
             self.__broadcast_tasks.append(self.loop.create_task(send_broadcast()))
 
@@ -1125,3 +1232,7 @@ class Executor:
                 },
             }
         )
+        if self.profile_events:
+            summary = self.profiler.summary(node.id)
+            if summary is not None:
+                self.queue.put({"event": "node-profile", "data": summary})
@@ -3,6 +3,7 @@ from typing import NewType
 
 from api.iter import Collector, Generator, Transformer
 from api.node_data import IteratorOutputInfo
+from chain.cache import get_value_size
 
 Output = list[object]
 
@@ -33,4 +34,17 @@ class TransformerOutput:
 
 NodeOutput = RegularOutput | GeneratorOutput | CollectorOutput | TransformerOutput
 
+
+def get_output_size(output: NodeOutput) -> int:
+    """
+    Returns the number of bytes of the arrays in the given node output.
+
+    Only regular outputs are counted. The outputs of iterator nodes hold state that
+    cannot be recomputed, so they must never be evicted from the cache.
+    """
+    if isinstance(output, RegularOutput):
+        return get_value_size(output.output)
+    return 0
+
+
 ExecutionId = NewType("ExecutionId", str)
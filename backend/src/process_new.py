@@ -2,9 +2,12 @@ from __future__ import annotations
 
 import asyncio
 import gc
+import threading
 import time
+from collections import deque
 from collections.abc import AsyncIterator, Callable, Iterable, Iterator
 from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Literal
 
@@ -28,7 +31,12 @@ from api import (
     Transformer,
     registry,
 )
-from chain.cache import CacheStrategy, OutputCache, get_cache_strategies
+from chain.cache import (
+    CacheStrategy,
+    OutputCache,
+    get_cache_strategies,
+    get_value_size,
+)
 from chain.chain import (
     Chain,
     CollectorNode,
@@ -47,8 +55,11 @@ from process_common import (
     Output,
     RegularOutput,
     TransformerOutput,
+    get_output_size,
 )
+from profiler import ExecutionProfiler, NodeProfile
 from progress_controller import Aborted, ProgressController, ProgressToken
+from result_cache import ResultCache
 from util import timed_supplier
 
 
@@ -417,6 +428,124 @@ class _IterationTimer:
         self._last_paused = paused
 
 
+# ======================================================================
+# generator prefetching
+# ======================================================================
+class _PrefetchEnd:
+    """Marks the end of a prefetched iterator, optionally with the error that ended it."""
+
+    def __init__(self, error: Exception | None = None) -> None:
+        self.error = error
+
+
+class _GeneratorPrefetcher:
+    """
+    Pulls items from a generator's iterator on a background thread.
+
+    At most `size` items are buffered ahead of the consumer, so decoding the
+    next item (e.g. the next image or video frame) overlaps with the downstream
+    work on the current one. Items are handed out in the order the iterator
+    produced them.
+
+    The background thread:
+    - stops pulling while the execution is paused,
+    - stops pulling and closes the iterator when the execution is aborted or
+      the prefetcher is closed,
+    - stops pulling after a yielded exception if the generator is fail-fast,
+      since the consumer will raise it anyway.
+    """
+
+    def __init__(
+        self,
+        iterator: Iterator[object],
+        size: int,
+        fail_fast: bool,
+        progress: ProgressToken,
+        loop: asyncio.AbstractEventLoop,
+    ) -> None:
+        assert size > 0
+        self._iterator = iterator
+        self._fail_fast = fail_fast
+        self._progress = progress
+        self._loop = loop
+        self._slots = threading.Semaphore(size)
+        self._items: asyncio.Queue[tuple[object, float] | _PrefetchEnd] = (
+            asyncio.Queue()
+        )
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, daemon=True, name="generator prefetch"
+        )
+        self._thread.start()
+
+    def _acquire_slot(self) -> bool:
+        """Wait for a free buffer slot. Returns False if prefetching should stop."""
+        while not self._stop.is_set():
+            if self._progress.aborted:
+                return False
+            if self._progress.paused:
+                time.sleep(0.1)
+                continue
+            if self._slots.acquire(timeout=0.1):
+                return True
+        return False
+
+    def _emit(self, item: tuple[object, float] | _PrefetchEnd) -> None:
+        try:
+            self._loop.call_soon_threadsafe(self._items.put_nowait, item)
+        except RuntimeError:
+            # the event loop is already closed, nobody is listening anymore
+            pass
+
+    def _run(self) -> None:
+        end = _PrefetchEnd()
+        exhausted = False
+        try:
+            while self._acquire_slot():
+                start = time.monotonic()
+                try:
+                    item = next(self._iterator)
+                except StopIteration:
+                    exhausted = True
+                    break
+                self._emit((item, time.monotonic() - start))
+                if self._fail_fast and isinstance(item, Exception):
+                    break
+        except Exception as e:
+            exhausted = True
+            end = _PrefetchEnd(e)
+        finally:
+            if not exhausted:
+                close = getattr(self._iterator, "close", None)
+                if close is not None:
+                    try:
+                        close()
+                    except Exception:
+                        logger.exception("Error closing prefetched generator")
+            self._emit(end)
+
+    async def next(self) -> tuple[object, float] | None:
+        """
+        Return the next item and the time it took to produce it.
+
+        Returns None once the iterator is exhausted. Errors raised by the
+        iterator itself are re-raised here.
+        """
+        item = await self._items.get()
+        if isinstance(item, _PrefetchEnd):
+            # keep the end marker so that later calls also see the end
+            self._items.put_nowait(item)
+            if item.error is not None:
+                raise item.error
+            return None
+        self._slots.release()
+        return item
+
+    def close(self) -> None:
+        """Stop prefetching. The background thread exits after its current item."""
+        self._stop.set()
+
+
 # ======================================================================
 # NodeContext
 # ======================================================================
@@ -539,6 +668,13 @@ class RuntimeNode(AsyncIterator[Output]):
             self.executor.send_node_finish(self.node, self._accumulated_exec_time)
             self._finished = True
 
+    def record_iteration(self, exec_time: float) -> None:
+        """Record one iteration that the executor ran on behalf of this node."""
+        self._ensure_started()
+        self._accumulated_exec_time += exec_time
+        self._iter_timer.add()
+        self._send_progress()
+
     async def __anext__(self) -> Output:
         raise NotImplementedError
 
@@ -588,8 +724,11 @@ class StaticRuntimeNode(RuntimeNode):
                 # Compute fresh result
                 inputs = await self.executor.runtime_inputs_for_async(self.node)
                 ctx = self.executor.get_node_context(self.node)
+                profile = self.executor.profiler.start(
+                    self.node.id, self.node.schema_id
+                )
                 raw, exec_time = await self.executor.run_node_async(
-                    self.node, ctx, inputs
+                    self.node, ctx, inputs, profile
                 )
                 self._accumulated_exec_time += exec_time
                 if not isinstance(raw, RegularOutput):
@@ -598,12 +737,20 @@ class StaticRuntimeNode(RuntimeNode):
                         f"expected RegularOutput but received "
                         f"{type(raw).__name__}."
                     )
-                self.executor.send_node_broadcast(self.node, raw.output)
+                self.executor.send_node_broadcast(
+                    self.node, raw.output, profile=profile
+                )
                 self._current_value = raw.output
 
                 # Store in cache if caching is enabled
                 if strategy is not None and not strategy.no_caching:
-                    self.executor.node_cache.set(self.node.id, raw, strategy)
+                    self.executor.node_cache.set(
+                        self.node.id,
+                        raw,
+                        strategy,
+                        exec_time,
+                        recomputable=not self.node.has_side_effects(),
+                    )
 
             # mark that we have run once on finalized collectors
             if self.executor.all_inputs_from_final_collectors(self.node):
@@ -639,11 +786,22 @@ class GeneratorRuntimeNode(RuntimeNode):
         self._current_served = 0
         self._current_value: Output | None = None
         self._gen_iter: Iterator | None = None
+        self._prefetcher: _GeneratorPrefetcher | None = None
+        self._fail_fast = True
         self._partial: Output | None = None
         self._items_produced = 0
 
     # ---------- helpers ----------
 
+    def close_prefetcher(self) -> None:
+        if self._prefetcher is not None:
+            self._prefetcher.close()
+            self._prefetcher = None
+
+    def _finish(self) -> None:
+        self.close_prefetcher()
+        super()._finish()
+
     def _has_truly_iterative_parent(self) -> bool:
         """
         Return True iff at least one upstream can actually produce
@@ -714,10 +872,45 @@ class GeneratorRuntimeNode(RuntimeNode):
         self._partial = out.partial_output
         # Create iterator from the generator's supplier function
         self._gen_iter = out.generator.supplier().__iter__()
+        self._fail_fast = out.generator.fail_fast
+        if self.executor.generator_prefetch > 0:
+            self._prefetcher = _GeneratorPrefetcher(
+                self._gen_iter,
+                self.executor.generator_prefetch,
+                self._fail_fast,
+                self.executor.progress,
+                self.executor.loop,
+            )
         self._expected_len = out.generator.expected_length
         self._items_produced = 0
         return True
 
+    async def _next_value(self) -> tuple[object, bool, float]:
+        """
+        Get the next raw value from the current inner iterator and the time it
+        took to produce it.
+
+        Returns (value, True, time) on success and (None, False, 0) if the inner
+        iterator is exhausted.
+        """
+        assert self._gen_iter is not None
+        if self._prefetcher is not None:
+            prefetched = await self._prefetcher.next()
+            if prefetched is None:
+                return None, False, 0
+            values, produce_time = prefetched
+            self._accumulated_exec_time += produce_time
+            return values, True, produce_time
+
+        try:
+            iter_start = time.monotonic()
+            values = next(self._gen_iter)
+            produce_time = time.monotonic() - iter_start
+            self._accumulated_exec_time += produce_time
+        except StopIteration:
+            return None, False, 0
+        return values, True, produce_time
+
     # ---------- main logic ----------
 
     async def _advance(self) -> Output:
@@ -741,13 +934,10 @@ class GeneratorRuntimeNode(RuntimeNode):
                     self._finish()
                     raise StopAsyncIteration
 
-            assert self._gen_iter is not None
-            try:
-                iter_start = time.monotonic()
-                values = next(self._gen_iter)
-                self._accumulated_exec_time += time.monotonic() - iter_start
-            except StopIteration:
+            values, ok, produce_time = await self._next_value()
+            if not ok:
                 # Inner iterator exhausted - need to decide whether to restart
+                self.close_prefetcher()
                 self._gen_iter = None
                 self._partial = None
                 # Don't reset _items_produced before _finish() -
@@ -758,18 +948,37 @@ class GeneratorRuntimeNode(RuntimeNode):
                 # Only re-init if we have a truly iterative parent that can feed us more
                 if not self._has_truly_iterative_parent():
                     self._finish()
-                    raise StopAsyncIteration from None
+                    raise StopAsyncIteration
 
                 # Loop around to try building a new inner iterator
                 continue
 
+            # The generator yields exceptions for items that failed
+            assert self._items_produced is not None
+            if isinstance(values, Exception):
+                if self._fail_fast:
+                    raise NodeExecutionError(
+                        self.node.id, self.node.data, str(values), {}
+                    ) from values
+                logger.warning(
+                    "Skipping failed item of generator %s (%s): %s",
+                    self.node.data.name,
+                    self.node.id,
+                    values,
+                )
+                self.executor.deferred_errors.append(values)
+                self._items_produced += 1
+                continue
+
             # Successfully got a value from current inner iterator
             break
 
         # Increment items produced counter when we successfully get an item
-        assert self._items_produced is not None
         self._items_produced += 1
 
+        profile = self.executor.profiler.start(self.node.id, self.node.schema_id)
+        profile.add("run", produce_time)
+
         assert self._partial is not None
         iterable_output = self.node.data.single_iterable_output
         if len(iterable_output.outputs) == 1:
@@ -779,13 +988,42 @@ class GeneratorRuntimeNode(RuntimeNode):
             seq_vals = list(values)
 
         full_out = self._partial.copy()
-        for idx, o in enumerate(self.node.data.outputs):
-            if o.id in iterable_output.outputs:
-                full_out[idx] = o.enforce(seq_vals.pop(0))
+        with profile.measure("enforce"):
+            for idx, o in enumerate(self.node.data.outputs):
+                if o.id in iterable_output.outputs:
+                    full_out[idx] = o.enforce(seq_vals.pop(0))
+        profile.set_output_bytes(get_value_size(full_out))
 
-        self.executor.send_node_broadcast(self.node, full_out)
+        self.executor.send_node_broadcast(self.node, full_out, profile=profile)
         return full_out
 
+    async def partial_output(self) -> Output | None:
+        """
+        Get the outputs of the generator before its first item is pulled.
+
+        Only the non-iterable outputs have values. Returns None if the generator
+        can't be created because its upstream is exhausted.
+        """
+        self._ensure_started()
+        if self._gen_iter is None and not await self._init_new_inner():
+            return None
+        return self._partial
+
+    async def next_item(self) -> Output:
+        """
+        Get the next item, ignoring fanout.
+
+        This is used when the executor hands each item to all consumers itself.
+        """
+        self._ensure_started()
+        if self._finished:
+            raise StopAsyncIteration
+
+        out = await self._advance()
+        self._iter_timer.add()
+        self._send_progress()
+        return out
+
     async def __anext__(self) -> Output:
         self._ensure_started()
         if self._finished:
@@ -837,6 +1075,55 @@ class CollectorRuntimeNode(RuntimeNode):
         # broadcast once
         self.executor.send_node_broadcast(self.node, value)
 
+    async def begin(self, inputs: list[object]) -> None:
+        """
+        Create the collector from the given inputs.
+
+        Values for iterable inputs are ignored. This is used when the executor
+        feeds items to the collector itself (see `collect` and `complete`).
+        """
+        self._ensure_started()
+        ctx = self.executor.get_node_context(self.node)
+        raw, exec_time = await self.executor.run_node_async(self.node, ctx, inputs)
+        self._accumulated_exec_time += exec_time
+        if not isinstance(raw, CollectorOutput):
+            raise RuntimeError(
+                f"Collector node {self.node.id} was expected to return CollectorOutput but got {type(raw).__name__}."
+            )
+        self._collector = raw.collector
+
+    def _iterate(self, iter_arg: object) -> None:
+        """Pass one item to the collector."""
+        assert self._collector is not None
+        profile = self.executor.profiler.start(self.node.id, self.node.schema_id)
+        iterate_start = time.monotonic()
+        with profile.measure("run"):
+            self._collector.on_iterate(iter_arg)
+        self._accumulated_exec_time += time.monotonic() - iterate_start
+
+    def collect(self, values: list[object]) -> None:
+        """Pass the values of the iterable inputs for one item to the collector."""
+        assert self._collector is not None
+        iterable_ids = set(self.node.data.single_iterable_input.inputs)
+        iterable_inputs = [i for i in self.node.data.inputs if i.id in iterable_ids]
+        enforced = [
+            inp.enforce_(value)
+            for inp, value in zip(iterable_inputs, values, strict=True)
+        ]
+        iter_arg = enforced[0] if len(enforced) == 1 else tuple(enforced)
+        self._iterate(iter_arg)
+        self._iter_timer.add()
+        self._send_progress()
+
+    def complete(self) -> None:
+        """Finalize the collector after all items were passed to `collect`."""
+        assert self._collector is not None
+        complete_start = time.monotonic()
+        final = self._collector.on_complete()
+        self._accumulated_exec_time += time.monotonic() - complete_start
+        self._set_final(enforce_output(final, self.node.data).output)
+        self._finish()
+
     async def __anext__(self) -> Output:
         self._ensure_started()
 
@@ -915,9 +1202,7 @@ class CollectorRuntimeNode(RuntimeNode):
                 if len(enforced_inputs) == 1
                 else tuple(enforced_inputs)
             )
-            iterate_start = time.monotonic()
-            self._collector.on_iterate(iter_arg)
-            self._accumulated_exec_time += time.monotonic() - iterate_start
+            self._iterate(iter_arg)
 
             # complete right away for non-iterative
             complete_start = time.monotonic()
@@ -1021,9 +1306,7 @@ class CollectorRuntimeNode(RuntimeNode):
             if len(iter_enforced_inputs) == 1
             else tuple(iter_enforced_inputs)
         )
-        iterate_start = time.monotonic()
-        self._collector.on_iterate(iter_arg)
-        self._accumulated_exec_time += time.monotonic() - iterate_start
+        self._iterate(iter_arg)
 
         self._iter_timer.add()
         self._send_progress()
@@ -1369,11 +1652,14 @@ class SideEffectLeafRuntimeNode(RuntimeNode):
 
         # run node
         ctx = self.executor.get_node_context(self.node)
-        out, exec_time = await self.executor.run_node_async(self.node, ctx, inputs)
+        profile = self.executor.profiler.start(self.node.id, self.node.schema_id)
+        out, exec_time = await self.executor.run_node_async(
+            self.node, ctx, inputs, profile
+        )
         self._accumulated_exec_time += exec_time
 
         if isinstance(out, RegularOutput):
-            self.executor.send_node_broadcast(self.node, out.output)
+            self.executor.send_node_broadcast(self.node, out.output, profile=profile)
 
         self._iter_timer.add()
         self._send_progress()
@@ -1389,6 +1675,29 @@ class SideEffectLeafRuntimeNode(RuntimeNode):
         return out.output if isinstance(out, RegularOutput) else []
 
 
+# ======================================================================
+# parallel iteration
+# ======================================================================
+@dataclass(frozen=True)
+class _ParallelIterationPlan:
+    """
+    A lineage whose items can be processed independently of each other.
+
+    - `generator` is the only generator of the lineage.
+    - `nodes` are the function nodes run once per item, in dependency order.
+      None of them keep state across items.
+    - `collectors` receive the items in generator order.
+    - `static_sources` are the nodes outside the per-item subgraph whose
+      outputs are used by it, mapped to the number of edges into the per-item
+      subgraph and collectors. They are computed once.
+    """
+
+    generator: GeneratorNode
+    nodes: list[FunctionNode]
+    collectors: list[CollectorNode]
+    static_sources: dict[NodeId, int]
+
+
 # ======================================================================
 # Executor
 # ======================================================================
@@ -1404,6 +1713,16 @@ class Executor:
         pool: ThreadPoolExecutor,
         storage_dir: Path,
         parent_cache: OutputCache[NodeOutput] | None = None,
+        max_parallel_lineages: int = 1,
+        generator_prefetch: int = 0,
+        parallel_iterations: int = 1,
+        cache_max_bytes: int | None = None,
+        cache_spill_dir: Path | None = None,
+        result_cache: ResultCache | None = None,
+        profile: bool = True,
+        profile_events: bool = False,
+        broadcast_pool: ThreadPoolExecutor | None = None,
+        has_subscribers: Callable[[], bool] | None = None,
     ):
         self.id = id
         self.chain = chain
@@ -1413,11 +1732,34 @@ class Executor:
         self.queue = queue
         self.pool = pool
         self.progress = ProgressController()
-        self.node_cache: OutputCache[NodeOutput] = OutputCache(parent=parent_cache)
+        self.node_cache: OutputCache[NodeOutput] = OutputCache(
+            parent=parent_cache,
+            max_bytes=cache_max_bytes,
+            spill_dir=cache_spill_dir,
+            size_of=get_output_size,
+        )
         self.cache_strategy: dict[NodeId, CacheStrategy] = get_cache_strategies(chain)
+        self.result_cache: ResultCache | None = result_cache
         self._storage_dir = storage_dir
-        self.__context_cache: dict[str, _ExecutorNodeContext] = {}
+        # how many independent lineages may run at the same time (1 = sequential)
+        self.max_parallel_lineages = max(1, max_parallel_lineages)
+        # how many items generators pull ahead on a background thread (0 = off)
+        self.generator_prefetch = max(0, generator_prefetch)
+        # how many items of a stateless per-item subgraph may be in flight (1 = off)
+        self.parallel_iterations = max(1, parallel_iterations)
+        # errors of generator items that were skipped because of fail_fast=False
+        self.deferred_errors: list[Exception] = []
+        self.profiler = ExecutionProfiler(id, enabled=profile)
+        # whether to send a node-profile event when a node finishes
+        self.profile_events = profile_events
+        self.__context_cache: dict[NodeId, _ExecutorNodeContext] = {}
         self.__broadcast_tasks: list[asyncio.Task[None]] = []
+        # broadcasts (e.g. preview encoding) run on their own pool so they don't
+        # compete with nodes for worker threads
+        self.broadcast_pool = broadcast_pool or pool
+        # whether any client listens for broadcasts
+        self.has_subscribers = has_subscribers or (lambda: True)
+        self.__broadcast_generations: dict[NodeId, int] = {}
 
         (
             self.raw_downstream_counts,
@@ -1600,6 +1942,7 @@ class Executor:
                     values.append(out[src_index])
                     continue
 
+                wait_start = time.perf_counter()
                 try:
                     out = await upstream_rt.__anext__()
                 except StopAsyncIteration:
@@ -1607,6 +1950,10 @@ class Executor:
                 except TransformerNotReady:
                     # Transformer is still accumulating - propagate up
                     raise
+                finally:
+                    self.profiler.add_upstream_wait(
+                        node.id, time.perf_counter() - wait_start
+                    )
 
                 if src_index >= len(out):
                     raise StopAsyncIteration
@@ -1628,9 +1975,17 @@ class Executor:
     # async node run
     # ------------------------------------------------------------------
     async def run_node_async(
-        self, node: Node, context: _ExecutorNodeContext, inputs: list[object]
+        self,
+        node: Node,
+        context: _ExecutorNodeContext,
+        inputs: list[object],
+        profile: NodeProfile | None = None,
     ) -> tuple[NodeOutput | CollectorOutput | TransformerOutput, float]:
-        """Run a node asynchronously in the thread pool. Returns (output, execution_time)."""
+        """
+        Run a node asynchronously in the thread pool. Returns (output, execution_time).
+
+        The run is recorded in the given profile, or in a new one if none is given.
+        """
         if node.data.kind == "collector":
             ignored = node.data.single_iterable_input.inputs
         elif node.data.kind == "transformer":
@@ -1642,35 +1997,53 @@ class Executor:
         else:
             ignored = []
 
-        enforced_inputs = enforce_inputs(inputs, node.data, node.id, ignored)
+        if profile is None:
+            profile = self.profiler.start(node.id, node.schema_id)
+        with profile.measure("enforce"):
+            enforced_inputs = enforce_inputs(inputs, node.data, node.id, ignored)
+
+        def compute() -> NodeOutput | CollectorOutput | TransformerOutput:
+            if node.data.node_context:
+                raw = node.data.run(context, *enforced_inputs)
+            else:
+                raw = node.data.run(*enforced_inputs)
+
+            if node.data.kind == "collector":
+                if not isinstance(raw, Collector):
+                    raise RuntimeError(
+                        f"Collector node {node.id} returned {type(raw).__name__} instead of Collector."
+                    )
+                return CollectorOutput(raw)
+            if node.data.kind == "generator":
+                return enforce_generator_output(raw, node.data)
+            if node.data.kind == "transformer":
+                return enforce_transformer_output(raw, node.data)
+            return enforce_output(raw, node.data)
 
         def execute_node() -> NodeOutput | CollectorOutput | TransformerOutput:
             try:
-                if node.data.node_context:
-                    raw = node.data.run(context, *enforced_inputs)
-                else:
-                    raw = node.data.run(*enforced_inputs)
-
-                if node.data.kind == "collector":
-                    if not isinstance(raw, Collector):
-                        raise RuntimeError(
-                            f"Collector node {node.id} returned {type(raw).__name__} instead of Collector."
+                with profile.measure("run"):
+                    if self.result_cache is not None:
+                        return self.result_cache.run(
+                            node.data, self.options, enforced_inputs, compute
                         )
-                    return CollectorOutput(raw)
-                if node.data.kind == "generator":
-                    return enforce_generator_output(raw, node.data)
-                if node.data.kind == "transformer":
-                    return enforce_transformer_output(raw, node.data)
-                return enforce_output(raw, node.data)
+                    return compute()
             except Exception as e:
                 info = collect_input_information(node.data, enforced_inputs)
                 logger.exception("Error running node %s (%s)", node.data.name, node.id)
                 raise NodeExecutionError(node.id, node.data, str(e), info) from e
 
-        return await self.loop.run_in_executor(self.pool, timed_supplier(execute_node))
+        output, execution_time = await self.loop.run_in_executor(
+            self.pool, timed_supplier(profile.queued(execute_node))
+        )
+        profile.set_output_bytes(get_output_size(output))
+        return output, execution_time
 
     def get_node_context(self, node: Node) -> _ExecutorNodeContext:
-        ctx = self.__context_cache.get(node.schema_id)
+        # Contexts are per node (not per schema), because nodes of the same schema
+        # may run concurrently in different lineages and each context is bound to
+        # the node it reports progress for.
+        ctx = self.__context_cache.get(node.id)
         if ctx is None:
             pkg = registry.get_package(node.schema_id)
             settings = self.options.get_package_settings(pkg.id)
@@ -1680,7 +2053,7 @@ class Executor:
                 self._storage_dir,
                 send_progress=self._send_custom_progress,
             )
-            self.__context_cache[node.schema_id] = ctx
+            self.__context_cache[node.id] = ctx
         ctx.bind_node(node.id)
         return ctx
 
@@ -1693,8 +2066,23 @@ class Executor:
         try:
             await self._run_collectors_bottom_up()
         finally:
+            for rt in self.runtimes.values():
+                if isinstance(rt, GeneratorRuntimeNode):
+                    rt.close_prefetcher()
+            # cleanup functions also run if the chain failed or was aborted
+            self._run_chain_cleanups()
+            # drop the outputs of this run (and any spilled files)
+            self.node_cache.clear()
+            self.profiler.finish()
             gc.collect()
 
+        if self.deferred_errors:
+            error_string = "- " + "\n- ".join(str(e) for e in self.deferred_errors)
+            # chain the first error to keep its type and traceback
+            raise Exception(
+                f"Errors occurred during iteration:\n{error_string}"
+            ) from self.deferred_errors[0]
+
     def _identify_lineages(self) -> list[set[NodeId]]:
         """
         Group nodes into connected components (lineages) based on edges.
@@ -1800,14 +2188,327 @@ class Executor:
                 # No root made progress this round - lineage is done
                 break
 
+    async def _run_lineage(self, index: int, lineage_nodes: set[NodeId]) -> None:
+        """
+        Run a single lineage to completion and report its start and finish.
+        """
+        self.send_lineage_start(index, lineage_nodes)
+        start = time.monotonic()
+        plan = self._plan_parallel_iteration(lineage_nodes)
+        if plan is not None:
+            await self._run_parallel_iteration(plan)
+        else:
+            await self._run_lineage_to_completion(lineage_nodes)
+        self.send_lineage_finish(index, time.monotonic() - start)
+
+    def _plan_parallel_iteration(
+        self, lineage_nodes: set[NodeId]
+    ) -> _ParallelIterationPlan | None:
+        """
+        Check whether the items of a lineage can be processed in parallel.
+
+        This is the case for lineages with a single generator whose items flow
+        through function nodes without side effects into side-effect leaves
+        (e.g. Save Image) and collectors without downstream nodes. Everything
+        else in the lineage must be computed once, before iterating.
+
+        Returns None if the lineage doesn't have this shape, or if parallel
+        iteration is disabled.
+        """
+        if self.parallel_iterations <= 1:
+            return None
+
+        nodes = [self.chain.nodes[nid] for nid in lineage_nodes]
+        generators = [n for n in nodes if isinstance(n, GeneratorNode)]
+        if len(generators) != 1 or any(isinstance(n, TransformerNode) for n in nodes):
+            return None
+        generator = generators[0]
+        iterable_outputs = generator.data.single_iterable_output.outputs
+
+        # the per-item subgraph: everything that follows the iterable outputs
+        per_item: set[NodeId] = set()
+        collectors: dict[NodeId, CollectorNode] = {}
+        stack = [
+            e.target.id
+            for e in self.chain.edges_from(generator.id)
+            if e.source.output_id in iterable_outputs
+        ]
+        while stack:
+            nid = stack.pop()
+            node = self.chain.nodes[nid]
+            if nid in per_item or nid in collectors:
+                continue
+            if isinstance(node, CollectorNode):
+                collectors[nid] = node
+                continue
+            per_item.add(nid)
+            stack.extend(e.target.id for e in self.chain.edges_from(nid))
+
+        # nodes computed once must not depend on the generator
+        after_generator: set[NodeId] = set()
+        stack = [generator.id]
+        while stack:
+            nid = stack.pop()
+            if nid in after_generator:
+                continue
+            after_generator.add(nid)
+            stack.extend(e.target.id for e in self.chain.edges_from(nid))
+
+        per_item_nodes: list[FunctionNode] = []
+        for nid in per_item:
+            node = self.chain.nodes[nid]
+            if not isinstance(node, FunctionNode):
+                return None
+            # side effects are only fine at the end of the per-item subgraph
+            if node.has_side_effects() and self.raw_downstream_counts[nid] > 0:
+                return None
+            per_item_nodes.append(node)
+
+        for nid, collector in collectors.items():
+            if self.raw_downstream_counts[nid] > 0:
+                return None
+            iterable_ids = set(collector.data.single_iterable_input.inputs)
+            for e in self.chain.edges_to(nid):
+                from_item = e.source.id in per_item or (
+                    e.source.id == generator.id
+                    and e.source.output_id in iterable_outputs
+                )
+                if from_item != (e.target.input_id in iterable_ids):
+                    return None
+
+        for nid in lineage_nodes:
+            if nid in per_item or nid in collectors or nid == generator.id:
+                continue
+            node = self.chain.nodes[nid]
+            if (
+                not isinstance(node, FunctionNode)
+                or node.has_side_effects()
+                or nid in after_generator
+                or self.raw_downstream_counts[nid] == 0
+            ):
+                return None
+
+        static_sources: dict[NodeId, int] = {}
+        for nid in [*per_item, *collectors]:
+            for e in self.chain.edges_to(nid):
+                if e.source.id not in per_item and e.source.id != generator.id:
+                    static_sources[e.source.id] = static_sources.get(e.source.id, 0) + 1
+
+        # order the per-item nodes so that every node runs after its inputs
+        ordered: list[FunctionNode] = []
+        done: set[NodeId] = set()
+
+        def visit(node: FunctionNode) -> None:
+            if node.id in done:
+                return
+            done.add(node.id)
+            for e in self.chain.edges_to(node.id):
+                source = self.chain.nodes[e.source.id]
+                if e.source.id in per_item and isinstance(source, FunctionNode):
+                    visit(source)
+            ordered.append(node)
+
+        for node in per_item_nodes:
+            visit(node)
+
+        return _ParallelIterationPlan(
+            generator=generator,
+            nodes=ordered,
+            collectors=list(collectors.values()),
+            static_sources=static_sources,
+        )
+
+    def _resolve_inputs(
+        self,
+        node: Node,
+        values: dict[NodeId, Output],
+        only_ids: set[InputId] | None = None,
+    ) -> list[object]:
+        """Get the inputs of a node from already computed node outputs."""
+        inputs: list[object] = []
+        for node_input in node.data.inputs:
+            if only_ids is not None and node_input.id not in only_ids:
+                continue
+
+            edge = self.chain.edge_to(node.id, node_input.id)
+            if edge is not None:
+                src_node = self.chain.nodes[edge.source.id]
+                src_index = next(
+                    i
+                    for i, o in enumerate(src_node.data.outputs)
+                    if o.id == edge.source.output_id
+                )
+                inputs.append(values[edge.source.id][src_index])
+            else:
+                v = self.chain.inputs.get(node.id, node_input.id)
+                if v is None and not node_input.optional:
+                    raise ValueError(
+                        f"Required input '{node_input.label}' (id {node_input.id}) on node {node.id} has no edge and no provided value."
+                    )
+                inputs.append(v)
+        return inputs
+
+    async def _run_item(
+        self, plan: _ParallelIterationPlan, values: dict[NodeId, Output]
+    ) -> dict[NodeId, Output]:
+        """Run the per-item nodes of a plan for one item."""
+        for node in plan.nodes:
+            inputs = self._resolve_inputs(node, values)
+            ctx = self.get_node_context(node)
+            # items run concurrently, so the profile of this item is passed along
+            profile = self.profiler.start(node.id, node.schema_id)
+            out, exec_time = await self.run_node_async(node, ctx, inputs, profile)
+            self.runtimes[node.id].record_iteration(exec_time)
+            if isinstance(out, RegularOutput):
+                self.send_node_broadcast(node, out.output, profile=profile)
+                values[node.id] = out.output
+        return values
+
+    async def _run_parallel_iteration(self, plan: _ParallelIterationPlan) -> None:
+        """
+        Run a lineage with up to `parallel_iterations` items in flight.
+
+        Items are pulled from the generator one after another, and the per-item
+        nodes of each item run as a separate task. Results are handed to the
+        collectors in generator order, so collectors see the same sequence as
+        with sequential execution.
+        """
+        generator_rt = self.runtimes[plan.generator.id]
+        assert isinstance(generator_rt, GeneratorRuntimeNode)
+
+        # compute everything outside the per-item subgraph once
+        static_values: dict[NodeId, Output] = {}
+        for nid in plan.static_sources:
+            static_values[nid] = await self.runtimes[nid].__anext__()
+
+        # collectors may use the non-iterable outputs of the generator
+        partial = await generator_rt.partial_output()
+        if partial is None:
+            generator_rt._finish()  # noqa: SLF001
+            return
+        begin_values = {**static_values, plan.generator.id: partial}
+
+        collector_rts: list[CollectorRuntimeNode] = []
+        for collector in plan.collectors:
+            rt = self.runtimes[collector.id]
+            assert isinstance(rt, CollectorRuntimeNode)
+            # the collector is created before any item, so iterable inputs are None
+            iterable_ids = set(collector.data.single_iterable_input.inputs)
+            non_iter_ids = {
+                i.id for i in collector.data.inputs if i.id not in iterable_ids
+            }
+            non_iter_vals = iter(
+                self._resolve_inputs(collector, begin_values, non_iter_ids)
+            )
+            await rt.begin(
+                [
+                    None if i.id in iterable_ids else next(non_iter_vals)
+                    for i in collector.data.inputs
+                ]
+            )
+            collector_rts.append(rt)
+
+        def hand_to_collectors(values: dict[NodeId, Output]) -> None:
+            for rt in collector_rts:
+                iterable_ids = set(rt.node.data.single_iterable_input.inputs)
+                rt.collect(self._resolve_inputs(rt.node, values, iterable_ids))
+
+        in_flight: deque[asyncio.Task[dict[NodeId, Output]]] = deque()
+        try:
+            while True:
+                if self.progress.aborted:
+                    break
+                try:
+                    await self.progress.suspend()
+                except Aborted:
+                    break
+
+                try:
+                    item = await generator_rt.next_item()
+                except StopAsyncIteration:
+                    break
+
+                values = dict(static_values)
+                values[plan.generator.id] = item
+                in_flight.append(self.loop.create_task(self._run_item(plan, values)))
+
+                while len(in_flight) >= self.parallel_iterations:
+                    hand_to_collectors(await in_flight.popleft())
+
+            while in_flight and not self.progress.aborted:
+                hand_to_collectors(await in_flight.popleft())
+        finally:
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
+
+        if self.progress.aborted:
+            return
+
+        for node in plan.nodes:
+            self.runtimes[node.id]._finish()  # noqa: SLF001
+        for rt in collector_rts:
+            rt.complete()
+
+        # all consumers of the static sources are done, so serve their remaining
+        # edges to let them drop their values
+        for nid, uses in plan.static_sources.items():
+            rt = self.runtimes[nid]
+            for _ in range(uses - 1):
+                try:
+                    await rt.__anext__()
+                except StopAsyncIteration:
+                    break
+            rt._finish()  # noqa: SLF001
+
+    async def _run_lineages_concurrently(self, lineages: list[set[NodeId]]) -> None:
+        """
+        Run independent lineages at the same time.
+
+        At most `max_parallel_lineages` lineages run at once. Since lineages share
+        no nodes, the only thing they share is the thread pool, so a GPU-bound
+        lineage and a CPU/disk-bound lineage can overlap.
+
+        If one lineage fails, all other lineages are cancelled and the error is
+        re-raised.
+        """
+        semaphore = asyncio.Semaphore(self.max_parallel_lineages)
+        failed = False
+
+        async def run_limited(index: int, lineage_nodes: set[NodeId]) -> None:
+            nonlocal failed
+            async with semaphore:
+                if self.progress.aborted or failed:
+                    return
+                try:
+                    await self._run_lineage(index, lineage_nodes)
+                except BaseException:
+                    # set before the slot is released, so no waiting lineage starts
+                    failed = True
+                    raise
+
+        tasks = [
+            self.loop.create_task(run_limited(index, lineage_nodes))
+            for index, lineage_nodes in enumerate(lineages)
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            # wait for cancelled lineages to unwind before finalizing the chain
+            await asyncio.gather(*tasks, return_exceptions=True)
+
     async def _run_collectors_bottom_up(self) -> None:
         """
-        Run each unconnected lineage to completion sequentially.
+        Run each unconnected lineage to completion.
 
         This is the main execution loop. It identifies all connected
-        components (lineages) in the chain and runs each one to completion
-        before moving to the next. This ensures that lineages don't depend
-        on each other and can complete independently.
+        components (lineages) in the chain. Lineages don't depend on each
+        other and can complete independently, so they are either run one
+        after another (the default) or concurrently if `max_parallel_lineages`
+        is greater than 1.
 
         Each lineage runs its roots in a round-robin fashion until
         exhausted. Roots include:
@@ -1818,21 +2519,37 @@ class Executor:
         # Identify all connected components (lineages)
         lineages = self._identify_lineages()
 
-        # Run each lineage to completion sequentially
-        for lineage_nodes in lineages:
-            # Check for abort state between lineages
-            if self.progress.aborted:
-                break
+        if self.max_parallel_lineages > 1 and len(lineages) > 1:
+            await self._run_lineages_concurrently(lineages)
+        else:
+            # Run each lineage to completion sequentially
+            for index, lineage_nodes in enumerate(lineages):
+                # Check for abort state between lineages
+                if self.progress.aborted:
+                    break
 
-            # Run this lineage to completion
-            await self._run_lineage_to_completion(lineage_nodes)
+                # Run this lineage to completion
+                await self._run_lineage(index, lineage_nodes)
 
-            # Check for abort state after lineage completion
-            if self.progress.aborted:
-                break
+                # Check for abort state after lineage completion
+                if self.progress.aborted:
+                    break
 
         await self._finalize_chain()
 
+    def _run_chain_cleanups(self) -> None:
+        # (nodes of the same schema may register the same function, run it once)
+        cleanup_fns: dict[Callable[[], None], None] = {}
+        for ctx in self.__context_cache.values():
+            for fn in ctx.chain_cleanup_fns:
+                cleanup_fns[fn] = None
+            ctx.chain_cleanup_fns.clear()
+        for fn in cleanup_fns:
+            try:
+                fn()
+            except Exception as e:
+                logger.error("Error running cleanup function: %s", e)
+
     async def _finalize_chain(self) -> None:
         # 1) force-finish every runtime that was started but not finished
         for rt in self.runtimes.values():
@@ -1840,12 +2557,7 @@ class Executor:
                 rt._finish()  # noqa: SLF001
 
         # 2) run chain-level cleanups
-        for ctx in self.__context_cache.values():
-            for fn in ctx.chain_cleanup_fns:
-                try:
-                    fn()
-                except Exception as e:
-                    logger.error("Error running cleanup function: %s", e)
+        self._run_chain_cleanups()
 
         # 3) wait for all outstanding broadcasts
         tasks = self.__broadcast_tasks
@@ -1860,6 +2572,22 @@ class Executor:
         nodes: list[str] = [str(nid) for nid in self.chain.nodes.keys()]
         self.queue.put({"event": "chain-start", "data": {"nodes": nodes}})
 
+    def send_lineage_start(self, index: int, lineage_nodes: set[NodeId]) -> None:
+        self.queue.put(
+            {
+                "event": "lineage-start",
+                "data": {"lineage": index, "nodes": list(lineage_nodes)},
+            }
+        )
+
+    def send_lineage_finish(self, index: int, execution_time: float) -> None:
+        self.queue.put(
+            {
+                "event": "lineage-finish",
+                "data": {"lineage": index, "executionTime": execution_time},
+            }
+        )
+
     def send_node_start(self, node: Node) -> None:
         self.queue.put({"event": "node-start", "data": {"nodeId": node.id}})
 
@@ -1922,14 +2650,26 @@ class Executor:
         node: Node,
         output: Output,
         generators: Iterable[Generator] | None = None,
+        profile: NodeProfile | None = None,
     ) -> None:
+        """
+        Sends the broadcast data of the given output. The time it takes to compute
+        it is added to the given profile of the run that produced the output.
+        """
         if not self.send_broadcast_data or not node.data.outputs:
             return
+        if not self.has_subscribers():
+            return
+
+        superseded = self.__track_broadcast(node.id, generators)
 
         def compute_bcast():
-            if self.progress.aborted:
+            if self.progress.aborted or superseded():
                 return None
+            start = time.perf_counter()
             data, types = compute_broadcast(output, node.data.outputs)
+            if profile is not None:
+                profile.add("broadcast", time.perf_counter() - start)
             if generators is None:
                 return (data, types, {}, {})
             seq_types, item_types = compute_sequence_broadcast(
@@ -1940,8 +2680,8 @@ class Executor:
             return (data, types, seq_types, item_types)
 
         async def send():
-            result = await self.loop.run_in_executor(self.pool, compute_bcast)
-            if result is None or self.progress.aborted:
+            result = await self.loop.run_in_executor(self.broadcast_pool, compute_bcast)
+            if result is None or self.progress.aborted or superseded():
                 return
             data, types, seq_types, _ = result
             ev: NodeBroadcastData = {
@@ -1954,6 +2694,21 @@ class Executor:
 
         self.__broadcast_tasks.append(self.loop.create_task(send()))
 
+    def __track_broadcast(
+        self, node_id: NodeId, generators: Iterable[Generator] | None
+    ) -> Callable[[], bool]:
+        """
+        Returns a function that tells whether a newer broadcast of the given node
+        has been started since. Broadcasts of iterated nodes are only needed for
+        the latest item, so outdated ones are skipped. Broadcasts with sequence
+        types are never skipped.
+        """
+        generation = self.__broadcast_generations.get(node_id, 0) + 1
+        self.__broadcast_generations[node_id] = generation
+        if generators is not None:
+            return lambda: False
+        return lambda: self.__broadcast_generations[node_id] != generation
+
     def send_node_finish(self, node: Node, execution_time: float) -> None:
         self.queue.put(
             {
@@ -1961,6 +2716,10 @@ class Executor:
                 "data": {"nodeId": node.id, "executionTime": execution_time},
             }
         )
+        if self.profile_events:
+            summary = self.profiler.summary(node.id)
+            if summary is not None:
+                self.queue.put({"event": "node-profile", "data": summary})
 
     def all_inputs_from_final_collectors(self, node: Node) -> bool:
         for node_input in node.data.inputs:
@@ -1996,7 +2755,10 @@ class Executor:
             # Get inputs and run node to get GeneratorOutput
             inputs = await self.runtime_inputs_for_async(node)
             node_ctx = self.get_node_context(node)
-            gen_output, exec_time = await self.run_node_async(node, node_ctx, inputs)
+            profile = self.profiler.start(node.id, node.schema_id)
+            gen_output, exec_time = await self.run_node_async(
+                node, node_ctx, inputs, profile
+            )
             if not isinstance(gen_output, GeneratorOutput):
                 raise RuntimeError(f"Generator node {node.id} expected GeneratorOutput")
 
@@ -2006,6 +2768,7 @@ class Executor:
                 node,
                 gen_output.partial_output,
                 generators=[gen_output.generator],
+                profile=profile,
             )
 
             # Send node-finish event with actual execution time (not including input fetching)
@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Literal, TypedDict, TypeVar
+
+from api import NodeId
+from process_common import ExecutionId
+
+T = TypeVar("T")
+
+Phase = Literal["upstream_wait", "enforce", "queue_wait", "run", "broadcast"]
+
+
+class NodeProfileData(TypedDict):
+    nodeId: NodeId
+    schemaId: str
+    iteration: int
+    upstreamWait: float
+    enforce: float
+    queueWait: float
+    run: float
+    broadcast: float
+    outputBytes: int
+
+
+class NodeProfileSummaryData(TypedDict):
+    nodeId: NodeId
+    schemaId: str
+    iterations: int
+    upstreamWait: float
+    enforce: float
+    queueWait: float
+    run: float
+    minRun: float
+    maxRun: float
+    broadcast: float
+    peakOutputBytes: int
+
+
+class ExecutionProfileData(TypedDict):
+    executionId: ExecutionId
+    duration: float
+    nodes: list[NodeProfileSummaryData]
+    iterations: list[NodeProfileData]
+    droppedIterations: int
+
+
+class NodeStats:
+    """
+    The timings of all runs of a node, added up as they are recorded.
+
+    All times are in seconds.
+    """
+
+    def __init__(self, node_id: NodeId, schema_id: str) -> None:
+        self.node_id: NodeId = node_id
+        self.schema_id: str = schema_id
+        self.iterations: int = 0
+        self.upstream_wait: float = 0
+        self.enforce: float = 0
+        self.queue_wait: float = 0
+        self.run: float = 0
+        self.broadcast: float = 0
+        self.min_run: float | None = None
+        """The shortest run time of a single run."""
+        self.max_run: float = 0
+        """The longest run time of a single run."""
+        self.peak_output_bytes: int = 0
+        self._lock = threading.Lock()
+
+    def add(self, phase: Phase, duration: float, profile_total: float) -> None:
+        """
+        Adds the given duration of a phase. `profile_total` is the time of that
+        phase of the profile the duration was added to, so far.
+        """
+        with self._lock:
+            setattr(self, phase, getattr(self, phase) + duration)
+            if phase == "run":
+                # the run phase is recorded once per run
+                if self.min_run is None or profile_total < self.min_run:
+                    self.min_run = profile_total
+                self.max_run = max(self.max_run, profile_total)
+
+    def add_output_bytes(self, output_bytes: int) -> None:
+        with self._lock:
+            self.peak_output_bytes = max(self.peak_output_bytes, output_bytes)
+
+    def to_json(self) -> NodeProfileSummaryData:
+        with self._lock:
+            return {
+                "nodeId": self.node_id,
+                "schemaId": self.schema_id,
+                "iterations": self.iterations,
+                "upstreamWait": self.upstream_wait,
+                "enforce": self.enforce,
+                "queueWait": self.queue_wait,
+                "run": self.run,
+                "minRun": self.min_run or 0,
+                "maxRun": self.max_run,
+                "broadcast": self.broadcast,
+                "peakOutputBytes": self.peak_output_bytes,
+            }
+
+
+@dataclass
+class NodeProfile:
+    """
+    Timings of one run of a node. For iterated nodes, every iteration (and every
+    item of a generator) gets its own profile.
+
+    All times are in seconds.
+    """
+
+    node_id: NodeId
+    schema_id: str
+    iteration: int
+    upstream_wait: float = 0
+    """Time spent waiting for the values of upstream nodes."""
+    enforce: float = 0
+    """Time spent enforcing (converting and validating) input values."""
+    queue_wait: float = 0
+    """Time between submitting the node to the thread pool and it starting."""
+    run: float = 0
+    """Time spent running the node itself."""
+    broadcast: float = 0
+    """Time spent computing broadcast data (e.g. image previews) of the outputs."""
+    output_bytes: int = 0
+    """The number of bytes of arrays (e.g. images) in the outputs."""
+    stats: NodeStats | None = field(default=None, repr=False, compare=False)
+    """The stats of the node, which are updated along with this profile."""
+
+    def add(self, phase: Phase, duration: float) -> None:
+        total = getattr(self, phase) + duration
+        setattr(self, phase, total)
+        if self.stats is not None:
+            self.stats.add(phase, duration, total)
+
+    def set_output_bytes(self, output_bytes: int) -> None:
+        self.output_bytes = output_bytes
+        if self.stats is not None:
+            self.stats.add_output_bytes(output_bytes)
+
+    @contextmanager
+    def measure(self, phase: Phase) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield None
+        finally:
+            self.add(phase, time.perf_counter() - start)
+
+    def queued(self, supplier: Callable[[], T]) -> Callable[[], T]:
+        """
+        Wraps the given supplier, which is about to be submitted to a thread pool, to
+        record how long it waits in the pool's queue.
+        """
+        submitted = time.perf_counter()
+
+        def wrapper() -> T:
+            self.add("queue_wait", time.perf_counter() - submitted)
+            return supplier()
+
+        return wrapper
+
+    def to_json(self) -> NodeProfileData:
+        return {
+            "nodeId": self.node_id,
+            "schemaId": self.schema_id,
+            "iteration": self.iteration,
+            "upstreamWait": self.upstream_wait,
+            "enforce": self.enforce,
+            "queueWait": self.queue_wait,
+            "run": self.run,
+            "broadcast": self.broadcast,
+            "outputBytes": self.output_bytes,
+        }
+
+
+class ExecutionProfiler:
+    """
+    Collects the timings of all node runs of an execution.
+
+    The timings of each node are added up in its `NodeStats`. Only the
+    `NodeProfile`s of the last `max_iterations` runs are kept, so long iterations
+    don't keep a profile for every item.
+
+    Time spent waiting for upstream nodes is measured before the run of a node is
+    started, so it is recorded with `add_upstream_wait` and attributed to the next
+    profile of that node.
+
+    If the profiler is disabled, then `start` returns profiles that are not
+    recorded.
+    """
+
+    MAX_ITERATIONS = 1000
+
+    def __init__(
+        self,
+        execution_id: ExecutionId,
+        enabled: bool = True,
+        max_iterations: int = MAX_ITERATIONS,
+    ) -> None:
+        self.execution_id: ExecutionId = execution_id
+        self.enabled: bool = enabled
+        self.profiles: deque[NodeProfile] = deque(maxlen=max_iterations)
+        self.dropped_iterations: int = 0
+        self._start = time.perf_counter()
+        self._end: float | None = None
+        self._lock = threading.Lock()
+        self._stats: dict[NodeId, NodeStats] = {}
+        self._upstream_wait: dict[NodeId, float] = {}
+
+    def start(self, node_id: NodeId, schema_id: str) -> NodeProfile:
+        """Starts the profile of the next run of the given node."""
+        if not self.enabled:
+            return NodeProfile(node_id, schema_id, 0)
+
+        with self._lock:
+            stats = self._stats.get(node_id)
+            if stats is None:
+                stats = NodeStats(node_id, schema_id)
+                self._stats[node_id] = stats
+            iteration = stats.iterations
+            stats.iterations += 1
+
+            profile = NodeProfile(node_id, schema_id, iteration, stats=stats)
+            if len(self.profiles) == self.profiles.maxlen:
+                self.dropped_iterations += 1
+            self.profiles.append(profile)
+            upstream_wait = self._upstream_wait.pop(node_id, 0)
+
+        if upstream_wait:
+            profile.add("upstream_wait", upstream_wait)
+        return profile
+
+    def add_upstream_wait(self, node_id: NodeId, duration: float) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._upstream_wait[node_id] = (
+                self._upstream_wait.get(node_id, 0) + duration
+            )
+
+    def finish(self) -> None:
+        self._end = time.perf_counter()
+
+    def summary(self, node_id: NodeId) -> NodeProfileSummaryData | None:
+        with self._lock:
+            stats = self._stats.get(node_id)
+        return stats.to_json() if stats is not None else None
+
+    def to_json(self) -> ExecutionProfileData:
+        with self._lock:
+            stats = list(self._stats.values())
+            profiles = list(self.profiles)
+            dropped = self.dropped_iterations
+
+        end = self._end if self._end is not None else time.perf_counter()
+        return {
+            "executionId": self.execution_id,
+            "duration": end - self._start,
+            "nodes": [s.to_json() for s in stats],
+            "iterations": [p.to_json() for p in profiles],
+            "droppedIterations": dropped,
+        }
@@ -0,0 +1,354 @@
+from __future__ import annotations
+
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import weakref
+from collections.abc import Callable
+from enum import Enum
+from pathlib import Path
+
+from api import ExecutionOptions, NodeData, registry
+from logger import logger
+from model_registry import model_registry
+from process_common import NodeOutput, Output, RegularOutput
+
+_DERIVED: dict[int, tuple[weakref.ref[object], bytes]] = {}
+"""
+Fingerprints of node outputs, keyed by object identity.
+
+The output of a node is fully determined by the fingerprint of the node's inputs,
+so downstream nodes can use a fingerprint derived from the key of the producing
+node instead of hashing the content of the output. This also makes objects that
+cannot be hashed otherwise (e.g. models) usable as inputs of cached nodes.
+"""
+
+
+def _remember(value: object, fingerprint: bytes):
+    key = id(value)
+
+    def forget(dead: weakref.ref[object]):
+        # the id might already be reused by another object
+        entry = _DERIVED.get(key)
+        if entry is not None and entry[0] is dead:
+            del _DERIVED[key]
+
+    try:
+        _DERIVED[key] = weakref.ref(value, forget), fingerprint
+    except TypeError:
+        # e.g. ints and strings, which are hashed by value anyway
+        pass
+
+
+def _recall(value: object) -> bytes | None:
+    entry = _DERIVED.get(id(value))
+    if entry is not None and entry[0]() is value:
+        return entry[1]
+    return None
+
+
+def _hash_value(h: hashlib._Hash, value: object) -> bool:
+    """
+    Adds the given input value to the hash. Returns `False` if the value cannot be
+    fingerprinted.
+    """
+    derived = _recall(value)
+    if derived is not None:
+        h.update(b"d")
+        h.update(derived)
+        return True
+
+    if value is None or isinstance(value, bool | int | float):
+        h.update(f"{type(value).__name__}:{value!r};".encode())
+    elif isinstance(value, str | Path):
+        h.update(f"{type(value).__name__}:{str(value)!r};".encode())
+        # inputs that point to files are only equal if the files are unchanged
+        try:
+            stat = os.stat(value)
+            h.update(f"stat:{stat.st_size}:{stat.st_mtime_ns};".encode())
+        except (OSError, ValueError):
+            pass
+    elif isinstance(value, bytes):
+        h.update(b"bytes:")
+        h.update(hashlib.sha256(value).digest())
+    elif isinstance(value, Enum):
+        h.update(f"enum:{type(value).__qualname__}:{value.value!r};".encode())
+    elif hasattr(value, "__array_interface__"):
+        # numpy arrays and scalars. numpy is imported lazily, because the server
+        # has to start even if it isn't installed yet.
+        import numpy as np
+
+        from nodes.node_cache import fingerprint_array
+
+        h.update(b"ndarray:")
+        h.update(fingerprint_array(np.asarray(value)))
+    elif isinstance(value, list | tuple):
+        h.update(f"{type(value).__name__}:{len(value)}[".encode())
+        for item in value:
+            if not _hash_value(h, item):
+                return False
+        h.update(b"]")
+    elif hasattr(value, "cache_key_func"):
+        h.update(f"{type(value).__qualname__}:".encode())
+        return _hash_value(h, value.cache_key_func())  # type: ignore
+    else:
+        # models loaded by nodes with side effects (e.g. Load Model) are keyed by
+        # the content of their files
+        model_key = model_registry.key_of(value)
+        if model_key is None:
+            return False
+        h.update(f"model:{model_key!r};".encode())
+    return True
+
+
+_NODE_VERSIONS: dict[str, bytes] = {}
+_SHARED_CODE_VERSION: bytes | None = None
+
+
+def _shared_code_version() -> bytes:
+    """
+    A fingerprint of the shared code nodes call (the `nodes` package, including
+    `nodes/impl`), so updating it invalidates all stored results.
+    """
+    global _SHARED_CODE_VERSION
+    if _SHARED_CODE_VERSION is None:
+        import nodes
+
+        h = hashlib.sha256()
+        root = Path(nodes.__file__).parent
+        for path in sorted(root.rglob("*.py")):
+            h.update(f"{path.relative_to(root).as_posix()}:".encode())
+            h.update(path.read_bytes())
+        _SHARED_CODE_VERSION = h.digest()
+    return _SHARED_CODE_VERSION
+
+
+def _node_version(node: NodeData) -> bytes:
+    """
+    A fingerprint of the implementation of a node: the source file of its run
+    function, the shared code of all nodes, and the versions of the dependencies
+    of its package.
+    """
+    version = _NODE_VERSIONS.get(node.schema_id)
+    if version is None:
+        h = hashlib.sha256(_shared_code_version())
+        try:
+            source = inspect.getsourcefile(inspect.unwrap(node.run))
+            if source is not None:
+                h.update(Path(source).read_bytes())
+        except (OSError, TypeError):
+            pass
+        package = registry.get_package(node.schema_id)
+        for dep in package.dependencies:
+            h.update(f"{dep.pypi_name}=={dep.version};".encode())
+        version = h.digest()
+        _NODE_VERSIONS[node.schema_id] = version
+    return version
+
+
+class ResultCache:
+    """
+    A persistent on-disk cache for the outputs of regular nodes.
+
+    Entries are content-addressed: the key of a node is derived from its schema id,
+    its implementation, its package settings, and fingerprints of its input values.
+    Inputs produced by other nodes are fingerprinted by the key of the producing
+    node, so a re-run of an unchanged chain prefix can skip straight to the first
+    changed node. Nodes must be deterministic; nodes with side effects are never
+    cached.
+
+    Only outputs that took at least `min_execution_time` seconds to compute are
+    stored. The total size of all entries is kept below `max_bytes` by evicting the
+    least recently used ones.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        max_bytes: int,
+        min_execution_time: float = 0.1,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.min_execution_time = min_execution_time
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.__lock = threading.Lock()
+        self.__db = sqlite3.connect(
+            self.directory / "index.sqlite", check_same_thread=False
+        )
+        with self.__db:
+            self.__db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, package TEXT NOT NULL, "
+                "size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            self.__db.execute(
+                "CREATE INDEX IF NOT EXISTS entries_last_access "
+                "ON entries (last_access)"
+            )
+
+    def close(self):
+        with self.__lock:
+            self.__db.close()
+
+    @property
+    def size(self) -> int:
+        """The total number of bytes of all entries."""
+        with self.__lock:
+            (total,) = self.__db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        return total
+
+    def __len__(self) -> int:
+        with self.__lock:
+            (count,) = self.__db.execute("SELECT COUNT(*) FROM entries").fetchone()
+        return count
+
+    def node_key(
+        self, node: NodeData, settings: object, inputs: list[object]
+    ) -> str | None:
+        """
+        Returns the key of the given node for the given inputs, or `None` if some
+        input cannot be fingerprinted.
+        """
+        h = hashlib.sha256()
+        h.update(f"{node.schema_id};".encode())
+        h.update(_node_version(node))
+        h.update(json.dumps(settings, sort_keys=True).encode())
+        for value in inputs:
+            if not _hash_value(h, value):
+                return None
+        return h.hexdigest()
+
+    def get(self, key: str) -> Output | None:
+        path = self.__path(key)
+        with self.__lock:
+            row = self.__db.execute(
+                "SELECT 1 FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            with self.__db:
+                self.__db.execute(
+                    "UPDATE entries SET last_access = ? WHERE key = ?",
+                    (time.time(), key),
+                )
+
+        try:
+            with open(path, "rb") as f:
+                output: Output = pickle.load(f)
+        except Exception as e:
+            logger.warning("Unable to read result cache entry %s: %s", key, e)
+            self.__delete(key)
+            return None
+
+        self.remember(key, output)
+        return output
+
+    def put(self, key: str, package_id: str, output: Output):
+        path = self.__path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        try:
+            with open(temp, "wb") as f:
+                pickle.dump(output, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp, path)
+        except Exception as e:
+            # e.g. models, which cannot be pickled
+            logger.debug("Unable to store result cache entry %s: %s", key, e)
+            temp.unlink(missing_ok=True)
+            return
+
+        size = path.stat().st_size
+        with self.__lock, self.__db:
+            self.__db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                (key, package_id, size, time.time()),
+            )
+        self.__enforce_limit()
+
+    def remember(self, key: str, output: Output):
+        """Remembers the fingerprints of the given output values of a node."""
+        digest = bytes.fromhex(key)
+        for index, value in enumerate(output):
+            _remember(value, hashlib.sha256(digest + index.to_bytes(4, "big")).digest())
+
+    def invalidate_package(self, package_id: str) -> int:
+        """Removes all entries of the given package. Returns the number removed."""
+        with self.__lock:
+            keys = [
+                key
+                for (key,) in self.__db.execute(
+                    "SELECT key FROM entries WHERE package = ?", (package_id,)
+                )
+            ]
+        for key in keys:
+            self.__delete(key)
+        return len(keys)
+
+    def clear(self):
+        with self.__lock:
+            keys = [key for (key,) in self.__db.execute("SELECT key FROM entries")]
+        for key in keys:
+            self.__delete(key)
+
+    def run(
+        self,
+        node: NodeData,
+        options: ExecutionOptions,
+        inputs: list[object],
+        run: Callable[[], NodeOutput],
+    ) -> NodeOutput:
+        """
+        Runs the given node through the cache. `inputs` must be the enforced inputs
+        of the node and `run` must compute its output from them.
+        """
+        if node.kind != "regularNode" or node.side_effects:
+            return run()
+
+        package_id = registry.get_package(node.schema_id).id
+        settings = options.get_package_settings_json(package_id)
+        key = self.node_key(node, settings, inputs)
+        if key is None:
+            return run()
+
+        cached = self.get(key)
+        if cached is not None:
+            logger.debug("Result cache hit for %s", node.schema_id)
+            return RegularOutput(cached)
+
+        start = time.perf_counter()
+        output = run()
+        execution_time = time.perf_counter() - start
+
+        if isinstance(output, RegularOutput):
+            self.remember(key, output.output)
+            if execution_time >= self.min_execution_time:
+                self.put(key, package_id, output.output)
+        return output
+
+    def __path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.pickle"
+
+    def __delete(self, key: str):
+        with self.__lock, self.__db:
+            self.__db.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self.__path(key).unlink(missing_ok=True)
+
+    def __enforce_limit(self):
+        while self.size > self.max_bytes:
+            with self.__lock:
+                row = self.__db.execute(
+                    "SELECT key FROM entries ORDER BY last_access LIMIT 1"
+                ).fetchone()
+            if row is None:
+                return
+            logger.debug("Evicting result cache entry %s", row[0])
+            self.__delete(row[0])
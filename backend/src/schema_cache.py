@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import platform
+import sys
+import sysconfig
+from collections.abc import Iterable
+from pathlib import Path
+
+from logger import logger
+
+SCHEMA_CACHE_VERSION = 1
+
+
+def schema_key(package_dirs: Iterable[str | Path]) -> str:
+    """
+    Returns a key that changes whenever the node schemas of the given packages
+    might change.
+
+    The key covers the path, size, and modification time of all Python files of
+    the packages, the Python version, and the site-packages directories (which
+    change when dependencies are installed or removed, and with them the set of
+    nodes that can be imported).
+    """
+    h = hashlib.sha256()
+    h.update(f"v{SCHEMA_CACHE_VERSION};{sys.version};{platform.platform()};".encode())
+
+    for directory in sorted({str(d) for d in package_dirs}):
+        files: list[tuple[str, int, int]] = []
+        for root, _, names in os.walk(directory):
+            for name in names:
+                if name.endswith(".py"):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    files.append((path, stat.st_size, stat.st_mtime_ns))
+        files.sort()
+        for path, size, mtime in files:
+            h.update(f"{path}:{size}:{mtime};".encode())
+
+    paths = sysconfig.get_paths()
+    for site_dir in sorted({paths["purelib"], paths["platlib"]}):
+        try:
+            h.update(f"site:{site_dir}:{os.stat(site_dir).st_mtime_ns};".encode())
+        except OSError:
+            pass
+
+    return h.hexdigest()
+
+
+class SchemaCache:
+    """
+    Stores the node schemas (the response of `/nodes`) on disk.
+
+    Importing all node modules pulls in heavy dependencies like PyTorch and ONNX
+    Runtime and takes several seconds. With this cache, the server can answer
+    `/nodes` right after start and import the node modules in the background.
+    """
+
+    def __init__(self, path: Path, key: str):
+        self.path = path
+        self.key = key
+
+    def load(self) -> dict | None:
+        """Returns the cached schemas, or `None` if they are missing or outdated."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("Unable to read schema cache %s: %s", self.path, e)
+            return None
+
+        if not isinstance(data, dict) or data.get("key") != self.key:
+            return None
+        return data.get("schemas")
+
+    def save(self, schemas: dict):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp = self.path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            with open(temp, "w", encoding="utf-8") as f:
+                json.dump({"key": self.key, "schemas": schemas}, f)
+            os.replace(temp, self.path)
+        except Exception as e:
+            logger.warning("Unable to write schema cache %s: %s", self.path, e)
+            temp.unlink(missing_ok=True)
@@ -8,16 +8,18 @@ import sys
 import tempfile
 import traceback
 import uuid
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor
 from functools import cached_property
 from json import dumps as stringify
 from pathlib import Path
 from typing import Final, TypedDict
+from urllib.parse import unquote
 
 from sanic import Sanic
 from sanic.log import access_logger
 from sanic.request import Request
-from sanic.response import json
+from sanic.response import empty, json, raw
 from sanic_cors import CORS
 
 import api
@@ -37,6 +39,8 @@ from events import (
 # Logger will be initialized when AppContext is created
 # For now, use a fallback logger
 from logger import logger, setup_logger
+from model_registry import model_registry
+from preview_store import preview_etag, preview_store
 from process import (
     Executor,
     NodeExecutionError,
@@ -46,6 +50,7 @@ from process_common import ExecutionId, NodeOutput
 from process_new import (
     Executor as NewExecutor,
 )
+from profiler import ExecutionProfiler
 from progress_controller import Aborted
 from response import (
     already_running_response,
@@ -53,6 +58,8 @@ from response import (
     no_executor_response,
     success_response,
 )
+from result_cache import ResultCache
+from schema_cache import SchemaCache, schema_key
 from server_config import ServerConfig
 
 
@@ -68,7 +75,52 @@ class AppContext:
         self.executor: Executor | NewExecutor | None = None
         self.individual_executors: dict[ExecutionId, Executor | NewExecutor] = {}
         self.cache: dict[NodeId, NodeOutput] = {}
-        self.pool: Final[ThreadPoolExecutor] = ThreadPoolExecutor(max_workers=4)
+        # profiles of the most recent executions, oldest first
+        self.profiles: OrderedDict[ExecutionId, ExecutionProfiler] = OrderedDict()
+        # parallel iterations need a worker thread per item in flight
+        self.pool: Final[ThreadPoolExecutor] = ThreadPoolExecutor(
+            max_workers=max(4, self.config.parallel_iterations)
+        )
+        # broadcasts (e.g. image previews) are encoded one at a time, so they
+        # never take more than one core away from the execution
+        self.broadcast_pool: Final[ThreadPoolExecutor] = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="broadcast"
+        )
+        self.sse_clients = 0
+        model_registry.max_bytes = self.config.model_cache_size * 1024 * 1024
+        # the response of /nodes, once it is known
+        self.nodes_json: dict | None = None
+        self.schema_cache: SchemaCache | None = None
+
+    MAX_PROFILES = 10
+
+    def has_sse_clients(self) -> bool:
+        return self.sse_clients > 0
+
+    def add_profile(self, profiler: ExecutionProfiler) -> None:
+        self.profiles[profiler.execution_id] = profiler
+        while len(self.profiles) > AppContext.MAX_PROFILES:
+            self.profiles.popitem(last=False)
+
+    @property
+    def cache_max_bytes(self) -> int | None:
+        if self.config.cache_max_memory == 0:
+            return None
+        return self.config.cache_max_memory * 1024 * 1024
+
+    @property
+    def cache_spill_dir(self) -> Path | None:
+        if self.config.cache_spill_dir is None:
+            return None
+        return Path(self.config.cache_spill_dir)
+
+    @cached_property
+    def result_cache(self) -> ResultCache | None:
+        if self.config.result_cache_size == 0:
+            return None
+        directory = self.storage_dir / "result-cache"
+        logger.info("Using result cache: %s", directory)
+        return ResultCache(directory, self.config.result_cache_size * 1024 * 1024)
 
     @cached_property
     def queue(self) -> EventQueue:
@@ -136,9 +188,16 @@ class ZeroCounter:
 
 run_individual_counter = ZeroCounter()
 
+packages_task = None
 setup_task = None
 
 
+async def packages_available():
+    """Waits until all packages are added. Their nodes might still be loading."""
+    if packages_task is not None:
+        await packages_task
+
+
 async def nodes_available():
     if setup_task is not None:
         await setup_task
@@ -153,12 +212,8 @@ async def health(_request: Request):
     return json({"status": "ok"})
 
 
-@app.route("/nodes")
-async def nodes(_request: Request):
-    """Gets a list of all nodes as well as the node information"""
-    await nodes_available()
-    logger.debug(api.registry.categories)
-
+def get_nodes_json() -> dict:
+    """Returns the schemas of all nodes as sent by `/nodes`."""
     node_list = []
     for node, sub in api.registry.nodes.values():
         node_dict = {
@@ -185,13 +240,25 @@ async def nodes(_request: Request):
         }
         node_list.append(node_dict)
 
-    return json(
-        {
-            "nodes": node_list,
-            "categories": [x.to_dict() for x in api.registry.categories],
-            "categoriesMissingNodes": [],
-        }
-    )
+    return {
+        "nodes": node_list,
+        "categories": [x.to_dict() for x in api.registry.categories],
+        "categoriesMissingNodes": [],
+    }
+
+
+@app.route("/nodes")
+async def nodes(request: Request):
+    """Gets a list of all nodes as well as the node information"""
+    ctx = AppContext.get(request.app)
+    # the schemas might be known from the schema cache before all nodes are loaded
+    await packages_available()
+    if ctx.nodes_json is None:
+        await nodes_available()
+        if ctx.nodes_json is None:
+            ctx.nodes_json = get_nodes_json()
+
+    return json(ctx.nodes_json)
 
 
 class RunRequest(TypedDict):
@@ -261,6 +328,16 @@ async def run(request: Request):
                 pool=ctx.pool,
                 storage_dir=ctx.storage_dir,
                 parent_cache=OutputCache(static_data=ctx.cache.copy()),
+                max_parallel_lineages=ctx.config.parallel_lineages,
+                generator_prefetch=ctx.config.generator_prefetch,
+                parallel_iterations=ctx.config.parallel_iterations,
+                cache_max_bytes=ctx.cache_max_bytes,
+                cache_spill_dir=ctx.cache_spill_dir,
+                result_cache=ctx.result_cache,
+                profile=ctx.config.profile,
+                profile_events=ctx.config.profile_events,
+                broadcast_pool=ctx.broadcast_pool,
+                has_subscribers=ctx.has_sse_clients,
             )
         else:
             executor = Executor(
@@ -273,7 +350,16 @@ async def run(request: Request):
                 pool=ctx.pool,
                 storage_dir=ctx.storage_dir,
                 parent_cache=OutputCache(static_data=ctx.cache.copy()),
+                cache_max_bytes=ctx.cache_max_bytes,
+                cache_spill_dir=ctx.cache_spill_dir,
+                result_cache=ctx.result_cache,
+                profile=ctx.config.profile,
+                profile_events=ctx.config.profile_events,
+                broadcast_pool=ctx.broadcast_pool,
+                has_subscribers=ctx.has_sse_clients,
             )
+        if executor.profiler.enabled:
+            ctx.add_profile(executor.profiler)
         try:
             ctx.executor = executor
             await executor.run()
@@ -401,6 +487,10 @@ async def run_individual(request: Request):
                 queue=throttled_queue,
                 storage_dir=ctx.storage_dir,
                 pool=ctx.pool,
+                broadcast_pool=ctx.broadcast_pool,
+                has_subscribers=ctx.has_sse_clients,
+                # the profiles of individual runs are not kept
+                profile=False,
             )
         else:
             executor = Executor(
@@ -412,6 +502,10 @@ async def run_individual(request: Request):
                 queue=throttled_queue,
                 storage_dir=ctx.storage_dir,
                 pool=ctx.pool,
+                broadcast_pool=ctx.broadcast_pool,
+                has_subscribers=ctx.has_sse_clients,
+                # the profiles of individual runs are not kept
+                profile=False,
             )
 
         with run_individual_counter:
@@ -475,6 +569,100 @@ async def clear_cache_individual(request: Request):
         return json({"success": False, "error": str(exception)})
 
 
+@app.route("/clear-cache/results", methods=["POST"])
+async def clear_cache_results(request: Request):
+    """
+    Removes entries from the persistent result cache. If a package id is given,
+    only the entries of nodes of that package are removed.
+    """
+    await nodes_available()
+    ctx = AppContext.get(request.app)
+    try:
+        full_data = dict(request.json or {})  # type: ignore
+        package_id: str | None = full_data.get("package", None)
+        if ctx.result_cache is not None:
+            if package_id is None:
+                ctx.result_cache.clear()
+            else:
+                ctx.result_cache.invalidate_package(package_id)
+        return json({"success": True, "data": None})
+    except Exception as exception:
+        logger.exception(exception)
+        return json({"success": False, "error": str(exception)})
+
+
+@app.route("/profile")
+async def profiles(request: Request):
+    """Returns the ids of the executions with a profile, most recent last."""
+    ctx = AppContext.get(request.app)
+    return json({"executions": list(ctx.profiles.keys())})
+
+
+@app.route("/profile/<execution_id>")
+async def profile(request: Request, execution_id: str):
+    """
+    Returns the per-node profile of the given execution. `latest` returns the
+    profile of the most recent execution.
+    """
+    ctx = AppContext.get(request.app)
+
+    profiler = None
+    if execution_id == "latest":
+        if len(ctx.profiles) > 0:
+            profiler = next(reversed(ctx.profiles.values()))
+    else:
+        profiler = ctx.profiles.get(ExecutionId(unquote(execution_id)))
+
+    if profiler is None:
+        return json(
+            error_response(
+                "Unknown execution", f"No profile for execution {execution_id}"
+            ),
+            status=404,
+        )
+    return json(profiler.to_json())
+
+
+@app.route("/models")
+async def models(_request: Request):
+    """Returns the models held by the model registry and their sizes in bytes."""
+    return json(
+        {
+            "models": model_registry.to_json(),
+            "residentBytes": model_registry.resident_bytes,
+            "maxBytes": model_registry.max_bytes,
+        }
+    )
+
+
+@app.route("/preview/<preview_id>")
+async def preview(request: Request, preview_id: str):
+    """Returns an image preview that is referenced by a node broadcast."""
+    if preview_id not in preview_store:
+        return json(
+            error_response("Unknown preview", f"No preview with id {preview_id}"),
+            status=404,
+        )
+
+    # previews never change, so the client can reuse its cached copy
+    etag = preview_etag(preview_id)
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=3600, immutable"}
+    if request.headers.get("if-none-match") == etag:
+        return empty(status=304, headers=headers)
+
+    ctx = AppContext.get(request.app)
+    encoded = await app.loop.run_in_executor(
+        ctx.broadcast_pool, preview_store.get, preview_id
+    )
+    if encoded is None:
+        return json(
+            error_response("Unknown preview", f"No preview with id {preview_id}"),
+            status=404,
+        )
+    data, content_type = encoded
+    return raw(data, content_type=content_type, headers=headers)
+
+
 @app.route("/pause", methods=["POST"])
 async def pause(request: Request):
     """Pauses the current execution"""
@@ -563,7 +751,11 @@ async def status(_request: Request):
 
 @app.route("/packages", methods=["GET"])
 async def get_packages(request: Request):
-    await nodes_available()
+    if AppContext.get(request.app).config.schema_cache:
+        # the packages are complete before their nodes are loaded
+        await packages_available()
+    else:
+        await nodes_available()
 
     hide_internal = request.args.get("hideInternal", "true") == "true"
 
@@ -639,16 +831,20 @@ async def sse(request: Request):
     if response is None:
         return
 
-    while True:
-        message = await ctx.queue.get()
-        await response.send(
-            f"event: {message['event']}\ndata: {stringify(message['data'])}\n\n"
-        )
+    ctx.sse_clients += 1
+    try:
+        while True:
+            message = await ctx.queue.get()
+            await response.send(
+                f"event: {message['event']}\ndata: {stringify(message['data'])}\n\n"
+            )
+    finally:
+        ctx.sse_clients -= 1
 
 
-async def import_packages(
-    config: ServerConfig,
-):
+async def import_packages(sanic_app: Sanic):
+    ctx = AppContext.get(sanic_app)
+
     importlib.import_module("packages.chaiNNer_standard")
     importlib.import_module("packages.chaiNNer_pytorch")
     importlib.import_module("packages.chaiNNer_ncnn")
@@ -656,6 +852,17 @@ async def import_packages(
     importlib.import_module("packages.chaiNNer_tensorrt")
     importlib.import_module("packages.chaiNNer_external")
 
+    if ctx.config.schema_cache:
+        package_dirs = [Path(p.where).parent for p in api.registry.packages.values()]
+        ctx.schema_cache = SchemaCache(
+            ctx.storage_dir / "schema-cache.json", schema_key(package_dirs)
+        )
+        ctx.nodes_json = ctx.schema_cache.load()
+        if ctx.nodes_json is not None:
+            logger.info("Using cached node schemas")
+
+
+def load_nodes(config: ServerConfig):
     logger.info("Loading Nodes...")
 
     load_errors = api.registry.load_nodes(__file__)
@@ -695,7 +902,23 @@ async def import_packages(
 
 
 async def setup(sanic_app: Sanic):
-    await import_packages(AppContext.get(sanic_app).config)
+    ctx = AppContext.get(sanic_app)
+    await packages_available()
+
+    if ctx.config.schema_cache:
+        # importing nodes takes a while, so the server keeps answering requests
+        # (e.g. /nodes from the schema cache) in the meantime
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, load_nodes, ctx.config)
+    else:
+        load_nodes(ctx.config)
+
+    nodes_json = get_nodes_json()
+    if ctx.schema_cache is not None and nodes_json != ctx.nodes_json:
+        if ctx.nodes_json is not None:
+            logger.warning("Cached node schemas were outdated")
+        ctx.schema_cache.save(nodes_json)
+    ctx.nodes_json = nodes_json
 
 
 exit_code = 0
@@ -719,10 +942,11 @@ async def close_server(sanic_app: Sanic):
 @app.after_server_start
 async def after_server_start(sanic_app: Sanic, loop: asyncio.AbstractEventLoop):
     # pylint: disable=global-statement
-    global setup_task
+    global packages_task, setup_task
     ctx = AppContext.get(sanic_app)
 
     # start the setup task
+    packages_task = loop.create_task(import_packages(sanic_app))
     setup_task = loop.create_task(setup(sanic_app))
 
     # start task to close the server
@@ -732,7 +956,10 @@ async def after_server_start(sanic_app: Sanic, loop: asyncio.AbstractEventLoop):
 
 def main():
     config = AppContext.get(app).config
-    app.run(port=config.port, single_process=True)
+    if config.unix_socket:
+        app.run(unix=config.unix_socket, single_process=True)
+    else:
+        app.run(port=config.port, single_process=True)
     if exit_code != 0:
         sys.exit(exit_code)
 
@@ -60,6 +60,122 @@ class ServerConfig:
     Usage: `--dev`
     """
 
+    parallel_lineages: int
+    """
+    The maximum number of independent lineages (unconnected parts of a chain) the
+    new executor runs at the same time. 1 means lineages run one after another.
+
+    Usage: `--parallel-lineages 2`
+    """
+
+    generator_prefetch: int
+    """
+    How many items each generator (e.g. Load Images) of the new executor decodes
+    ahead on a background thread. 0 disables prefetching.
+
+    Usage: `--generator-prefetch 2`
+    """
+
+    parallel_iterations: int
+    """
+    How many items the new executor processes at the same time when a generator
+    feeds only stateless nodes, side-effect leaves and collectors (e.g. Load Images
+    -> Resize -> Save Image). 1 processes items one after another.
+
+    Usage: `--parallel-iterations 8`
+    """
+
+    cache_max_memory: int
+    """
+    The maximum number of megabytes of images and other arrays the executor keeps
+    in its output cache. When the cache is full, the outputs that are cold, large,
+    and cheap to recompute are evicted first. 0 means no limit.
+
+    Usage: `--cache-max-memory 8192`
+    """
+
+    cache_spill_dir: str | None
+    """
+    Directory to write outputs evicted from the output cache to. If not set,
+    evicted outputs are dropped and computed again when needed.
+
+    Usage: `--cache-spill-dir /foo/bar`
+    """
+
+    result_cache_size: int
+    """
+    The maximum number of megabytes of the persistent result cache. The result cache
+    stores the outputs of expensive nodes in the storage directory, so re-running a
+    chain skips all nodes whose inputs did not change, even across restarts.
+    0 disables the result cache.
+
+    Usage: `--result-cache-size 20000`
+    """
+
+    profile: bool
+    """
+    Whether to record the timings of each node (time spent waiting for upstream
+    nodes, enforcing inputs, waiting for a worker thread, running, and computing
+    broadcasts). Profiles of recent executions are available via
+    `/profile/<execution_id>`.
+
+    Usage: `--no-profile` to disable
+    """
+
+    profile_events: bool
+    """
+    Whether to send a `node-profile` event with the timings of each node when it
+    finishes. Requires profiling.
+
+    Usage: `--profile-events`
+    """
+
+    model_cache_size: int
+    """
+    The maximum number of megabytes of models (e.g. PyTorch and ONNX models) the
+    model registry keeps loaded after they are no longer used, so the next run
+    doesn't have to load them again. Loaded models stay in (V)RAM while they are
+    kept. Loading a model file that is already loaded returns the same model
+    instead of a second copy. 0 only shares models that are still in use.
+
+    Usage: `--model-cache-size 4096`
+    """
+
+    schema_cache: bool
+    """
+    Whether to cache the node schemas in the storage directory. With a valid cache,
+    the server answers `/nodes` right after start and imports the node modules
+    (and their heavy dependencies) in the background.
+
+    Usage: `--schema-cache`
+    """
+
+    standby_worker: bool
+    """
+    Whether the host keeps a second, fully loaded worker process around. When the
+    current worker has to be killed (e.g. because a node hangs) or crashes, the
+    standby worker replaces it immediately. This roughly doubles the memory the
+    backend needs while idle.
+
+    Usage: `--standby-worker`
+    """
+
+    unix_socket: str | None
+    """
+    Path of a Unix domain socket to listen on instead of the TCP port. The host
+    uses this to talk to its worker without going through the TCP stack.
+
+    Usage: `--unix-socket /tmp/chainner-worker.sock`
+    """
+
+    worker_unix_socket: bool
+    """
+    Whether the host talks to its worker over a Unix domain socket instead of the
+    loopback TCP port. Ignored on Windows, where the worker always uses TCP.
+
+    Usage: `--worker-unix-socket`
+    """
+
     @staticmethod
     def parse_argv() -> ServerConfig:
         parser = argparse.ArgumentParser(description="ChaiNNer's server.")
@@ -106,6 +222,80 @@ class ServerConfig:
             help="Run in development mode.",
         )
 
+        parser.add_argument(
+            "--parallel-lineages",
+            type=int,
+            default=1,
+            help="Maximum number of independent lineages to run at the same time.",
+        )
+        parser.add_argument(
+            "--generator-prefetch",
+            type=int,
+            default=0,
+            help="Number of items each generator decodes ahead. 0 disables prefetching.",
+        )
+        parser.add_argument(
+            "--parallel-iterations",
+            type=int,
+            default=1,
+            help="Number of items of stateless iterated nodes to process at the same time.",
+        )
+        parser.add_argument(
+            "--cache-max-memory",
+            type=int,
+            default=0,
+            help="Maximum size of the output cache in megabytes. 0 means no limit.",
+        )
+        parser.add_argument(
+            "--cache-spill-dir",
+            type=str,
+            help="Directory to write outputs evicted from the output cache to.",
+        )
+        parser.add_argument(
+            "--result-cache-size",
+            type=int,
+            default=0,
+            help="Maximum size of the persistent result cache in megabytes. 0 disables it.",
+        )
+        parser.add_argument(
+            "--no-profile",
+            dest="profile",
+            action="store_false",
+            help="Don't record the timings of each node.",
+        )
+        parser.add_argument(
+            "--profile-events",
+            action="store_true",
+            help="Send the timings of each node as node-profile events.",
+        )
+
+        parser.add_argument(
+            "--model-cache-size",
+            type=int,
+            default=0,
+            help="Maximum size of unused models kept by the model registry in megabytes.",
+        )
+        parser.add_argument(
+            "--schema-cache",
+            action="store_true",
+            help="Cache node schemas to answer /nodes before all nodes are imported.",
+        )
+        parser.add_argument(
+            "--standby-worker",
+            action="store_true",
+            help="Keep a loaded standby worker to replace a killed or crashed worker.",
+        )
+        parser.add_argument(
+            "--unix-socket",
+            type=str,
+            help="Unix domain socket to listen on instead of the TCP port.",
+        )
+        parser.add_argument(
+            "--worker-unix-socket",
+            action="store_true",
+            help="Talk to the worker over a Unix domain socket instead of TCP.",
+        )
+
         parsed = parser.parse_args()
 
         return ServerConfig(
@@ -117,4 +307,17 @@ class ServerConfig:
             logs_dir=parsed.logs_dir or None,
             trace=parsed.trace,
             dev_mode=parsed.dev,
+            parallel_lineages=max(1, parsed.parallel_lineages),
+            generator_prefetch=max(0, parsed.generator_prefetch),
+            parallel_iterations=max(1, parsed.parallel_iterations),
+            cache_max_memory=max(0, parsed.cache_max_memory),
+            cache_spill_dir=parsed.cache_spill_dir or None,
+            result_cache_size=max(0, parsed.result_cache_size),
+            profile=parsed.profile,
+            profile_events=parsed.profile_events,
+            model_cache_size=max(0, parsed.model_cache_size),
+            schema_cache=parsed.schema_cache,
+            standby_worker=parsed.standby_worker,
+            unix_socket=parsed.unix_socket or None,
+            worker_unix_socket=parsed.worker_unix_socket,
         )
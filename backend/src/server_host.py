@@ -57,8 +57,47 @@ class AppContext:
             worker_flags.append("--trace")
         if self.config.dev_mode:
             worker_flags.append("--dev")
-
-        self._worker: Final[WorkerServer] = WorkerServer(worker_flags)
+        if self.config.parallel_lineages != 1:
+            worker_flags.extend(
+                ["--parallel-lineages", str(self.config.parallel_lineages)]
+            )
+        if self.config.generator_prefetch != 0:
+            worker_flags.extend(
+                ["--generator-prefetch", str(self.config.generator_prefetch)]
+            )
+        if self.config.parallel_iterations != 1:
+            worker_flags.extend(
+                ["--parallel-iterations", str(self.config.parallel_iterations)]
+            )
+        if self.config.cache_max_memory != 0:
+            worker_flags.extend(
+                ["--cache-max-memory", str(self.config.cache_max_memory)]
+            )
+        if self.config.cache_spill_dir is not None:
+            worker_flags.extend(["--cache-spill-dir", self.config.cache_spill_dir])
+        if self.config.result_cache_size != 0:
+            worker_flags.extend(
+                ["--result-cache-size", str(self.config.result_cache_size)]
+            )
+        if self.config.profile_events:
+            worker_flags.append("--profile-events")
+        if self.config.model_cache_size != 0:
+            worker_flags.extend(
+                ["--model-cache-size", str(self.config.model_cache_size)]
+            )
+        if self.config.schema_cache:
+            worker_flags.append("--schema-cache")
+
+        use_unix_socket = self.config.worker_unix_socket
+        self._worker: WorkerServer = WorkerServer(worker_flags, use_unix_socket)
+        # A second worker that is started in the background and has all nodes
+        # loaded. It replaces the current worker when that has to be killed or
+        # crashes, so we don't have to wait for a new worker to import everything.
+        self._standby: WorkerServer | None = None
+        if self.config.standby_worker and not self.config.close_after_start:
+            self._standby = WorkerServer(worker_flags, use_unix_socket)
+        self._standby_task: asyncio.Task[None] | None = None
+        self._replace_lock = asyncio.Lock()
         self.pool: Final[ThreadPoolExecutor] = ThreadPoolExecutor(max_workers=4)
         self.is_ready = False
 
@@ -76,6 +115,82 @@ class AppContext:
             await asyncio.sleep(0.1)
         return self._worker
 
+    @property
+    def has_standby(self) -> bool:
+        return self._standby is not None
+
+    def start_standby(self):
+        """Starts the standby worker in the background, if enabled."""
+        if self._standby is None or self._standby_task is not None:
+            return
+
+        standby = self._standby
+
+        async def warm_up():
+            logger.info("Starting standby worker...")
+            await standby.start()
+            await standby.wait_for_nodes()
+            logger.info("Standby worker ready")
+
+        self._standby_task = asyncio.get_running_loop().create_task(warm_up())
+
+    async def stop_standby(self):
+        """Stops the standby worker, e.g. because dependencies are about to change."""
+        task = self._standby_task
+        self._standby_task = None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        if self._standby is not None:
+            await self._standby.stop()
+
+    async def replace_worker(self, expected: WorkerServer | None = None):
+        """
+        Replaces the current worker with a fresh one.
+
+        If there is a standby worker, it takes over right away and the old worker
+        becomes the new standby. Otherwise, the current worker is restarted.
+        If `expected` is given, the worker is only replaced if it is still the
+        current worker.
+        """
+        async with self._replace_lock:
+            if expected is None or expected is self._worker:
+                await self.__replace_worker()
+
+    async def __replace_worker(self):
+        task = self._standby_task
+        if self._standby is None or task is None:
+            await self._worker.restart()
+            return
+
+        try:
+            # the standby worker might still be loading, but it's ahead of a restart
+            await task
+        except Exception as e:
+            logger.warning("Standby worker failed to start: %s", e)
+            await self.stop_standby()
+            await self._worker.restart()
+            self.start_standby()
+            return
+
+        old = self._worker
+        self._worker, self._standby = self._standby, old
+        self._standby_task = None
+        logger.info("Switched to standby worker")
+
+        await old.stop()
+        self.start_standby()
+
+    def standby_has_crashed(self) -> bool:
+        return self._standby is not None and self._standby.has_crashed()
+
+    async def stop_workers(self):
+        await self.stop_standby()
+        await self._worker.stop()
+
     @cached_property
     def setup_queue(self) -> EventQueue:
         return EventQueue()
@@ -133,6 +248,36 @@ async def clear_cache_individual(request: Request):
     return await worker.proxy_request(request)
 
 
+@app.route("/clear-cache/results", methods=["POST"])
+async def clear_cache_results(request: Request):
+    worker = await AppContext.get(request.app).get_worker()
+    return await worker.proxy_request(request)
+
+
+@app.route("/profile")
+async def profiles(request: Request):
+    worker = await AppContext.get(request.app).get_worker()
+    return await worker.proxy_request(request)
+
+
+@app.route("/profile/<_execution_id>")
+async def profile(request: Request, _execution_id: str):
+    worker = await AppContext.get(request.app).get_worker()
+    return await worker.proxy_request(request)
+
+
+@app.route("/models")
+async def models(request: Request):
+    worker = await AppContext.get(request.app).get_worker()
+    return await worker.proxy_request(request)
+
+
+@app.route("/preview/<_preview_id>")
+async def preview(request: Request, _preview_id: str):
+    worker = await AppContext.get(request.app).get_worker()
+    return await worker.proxy_request(request)
+
+
 @app.route("/pause", methods=["POST"])
 async def pause(request: Request):
     worker = await AppContext.get(request.app).get_worker()
@@ -159,9 +304,9 @@ async def kill(request: Request):
     except Exception:
         try:
             logger.debug(
-                "Regular kill failed, attempting to restart executor process..."
+                "Regular kill failed, attempting to replace executor process..."
             )
-            await worker.restart()
+            await AppContext.get(request.app).replace_worker()
         except Exception as exception:
             return json(
                 error_response("Error killing execution!", exception), status=500
@@ -291,11 +436,14 @@ async def uninstall_dependencies_request(request: Request):
             deps.extend(deps_to_dep_info(p.dependencies))
 
         if len(deps) > 0:
+            # the standby worker has imported the old dependencies
+            await ctx.stop_standby()
             await worker.stop()
             try:
                 await uninstall_dependencies(deps, progress, logger)
             finally:
                 await worker.start()
+                ctx.start_standby()
 
         return json({"status": "ok"})
     except Exception as ex:
@@ -332,11 +480,14 @@ async def install_dependencies_request(request: Request):
             deps.extend(deps_to_dep_info(p.dependencies))
 
         if len(deps) > 0:
+            # the standby worker has imported the old dependencies
+            await ctx.stop_standby()
             await worker.stop()
             try:
                 await install_dependencies(deps, progress, logger)
             finally:
                 await worker.start()
+                ctx.start_standby()
         return json({"status": "ok"})
     except Exception as ex:
         logger.exception("Error installing dependencies: %s", ex)
@@ -350,8 +501,10 @@ async def sse(request: Request):
     if response is None:
         return
 
-    worker = await AppContext.get(request.app).get_worker()
+    ctx = AppContext.get(request.app)
     while True:
+        # the worker might have been replaced since the last iteration
+        worker = await ctx.get_worker()
         try:
             async for data in worker.get_sse(request):
                 await response.send(data)
@@ -457,6 +610,7 @@ async def import_packages(
 
 
 async def setup(sanic_app: Sanic, loop: asyncio.AbstractEventLoop):
+    global watch_task
     ctx = AppContext.get(sanic_app)
     worker = ctx.get_worker_unmanaged()
     setup_queue = ctx.setup_queue
@@ -503,8 +657,31 @@ async def setup(sanic_app: Sanic, loop: asyncio.AbstractEventLoop):
 
     logger.info("Done.")
 
+    if ctx.has_standby:
+        # only start the standby worker now, so it doesn't slow down the start
+        ctx.start_standby()
+        watch_task = loop.create_task(watch_worker(ctx))
+
+
+async def watch_worker(ctx: AppContext):
+    """Replaces the worker if it crashes and restarts a crashed standby worker."""
+    while True:
+        await asyncio.sleep(0.25)
+        worker = ctx.get_worker_unmanaged()
+        if worker.has_crashed():
+            logger.error("Worker process crashed. Replacing it...")
+            try:
+                await ctx.replace_worker(worker)
+            except Exception:
+                logger.exception("Failed to replace crashed worker")
+        elif ctx.standby_has_crashed():
+            logger.warning("Standby worker crashed. Restarting it...")
+            await ctx.stop_standby()
+            ctx.start_standby()
+
 
 setup_task = None
+watch_task = None
 
 
 async def close_server(sanic_app: Sanic):
@@ -517,15 +694,17 @@ async def close_server(sanic_app: Sanic):
     except Exception as ex:
         logger.error("Error waiting for server to start: %s", ex)
 
-    worker = AppContext.get(sanic_app).get_worker_unmanaged()
-    await worker.stop()
+    if watch_task is not None:
+        watch_task.cancel()
+    await AppContext.get(sanic_app).stop_workers()
     sanic_app.stop()
 
 
 @app.after_server_stop
 async def after_server_stop(sanic_app: Sanic, _loop: asyncio.AbstractEventLoop):
-    worker = AppContext.get(sanic_app).get_worker_unmanaged()
-    await worker.stop()
+    if watch_task is not None:
+        watch_task.cancel()
+    await AppContext.get(sanic_app).stop_workers()
     logger.info("Server closed.")
 
 
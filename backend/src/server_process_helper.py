@@ -7,6 +7,7 @@ import re
 import socket
 import subprocess
 import sys
+import tempfile
 import threading
 import time
 from collections.abc import Iterable
@@ -29,6 +30,35 @@ def _port_in_use(port: int):
         return s.connect_ex(("127.0.0.1", port)) == 0
 
 
+def _unix_socket_in_use(path: str):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        return s.connect_ex(path) == 0
+
+
+def _get_unix_socket_path(port: int) -> str | None:
+    """
+    Returns the path of the Unix domain socket the worker should listen on, or
+    `None` if the worker has to use TCP.
+    """
+    # asyncio cannot serve Unix domain sockets on Windows
+    if sys.platform == "win32" or not hasattr(socket, "AF_UNIX"):
+        return None
+    path = os.path.join(tempfile.gettempdir(), f"chainner-{os.getpid()}-{port}.sock")
+    # socket paths are limited to ~100 bytes (e.g. 104 on macOS)
+    if len(path.encode()) > 100:
+        return None
+    return path
+
+
+def _remove_unix_socket(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except Exception:
+        logger.exception("Failed to remove worker socket %s", path)
+
+
 SANIC_LOG_REGEX = re.compile(r"^\s*\[[^\[\]]*\] \[\d*\] \[(\w*)\] (.*)")
 
 ENV = {**os.environ, "PYTHONIOENCODING": "utf-8"}
@@ -95,6 +125,11 @@ class _WorkerProcess:
         self._stdout_thread = None  # type: ignore
         self._stderr_thread = None  # type: ignore
 
+    def has_crashed(self) -> bool:
+        """Whether the process ended without being closed."""
+        p = self._process
+        return p is not None and p.poll() is not None
+
     def _handle_worker_termination(self, stream_name: str):
         """Handle worker process termination when a stream ends unexpectedly.
 
@@ -190,11 +225,17 @@ class _WorkerProcess:
 
 
 class WorkerServer:
-    def __init__(self, flags: Iterable[str] = []):
+    def __init__(self, flags: Iterable[str] = [], use_unix_socket: bool = False):
         self._process = None
 
         self._port = _find_free_port()
         self._base_url = f"http://127.0.0.1:{self._port}"
+        # If enabled and possible, requests are proxied to the worker over a Unix
+        # domain socket, which skips the TCP stack of the loopback interface.
+        # Otherwise, the worker listens on the TCP port.
+        self._unix_socket = (
+            _get_unix_socket_path(self._port) if use_unix_socket else None
+        )
         self._flags = list(flags)
         self._session = None
         self._is_ready = False
@@ -202,9 +243,22 @@ class WorkerServer:
         self._manually_close: set[aiohttp.ClientResponse] = set()
 
     async def start(self, extra_flags: Iterable[str] = []):
-        logger.info("Starting worker process on port %s...", self._port)
-        self._process = _WorkerProcess([str(self._port), *self._flags, *extra_flags])
-        self._session = aiohttp.ClientSession(base_url=self._base_url)
+        transport_flags: list[str] = []
+        connector = None
+        if self._unix_socket is not None:
+            logger.info("Starting worker process on %s...", self._unix_socket)
+            # a previous worker might have been killed before removing its socket
+            _remove_unix_socket(self._unix_socket)
+            transport_flags = ["--unix-socket", self._unix_socket]
+            connector = aiohttp.UnixConnector(path=self._unix_socket)
+        else:
+            logger.info("Starting worker process on port %s...", self._port)
+        self._process = _WorkerProcess(
+            [str(self._port), *transport_flags, *self._flags, *extra_flags]
+        )
+        self._session = aiohttp.ClientSession(
+            base_url=self._base_url, connector=connector
+        )
         self._is_ready = False
         self._is_checking_ready = False
         await self.wait_for_ready()
@@ -218,13 +272,24 @@ class WorkerServer:
                 resp.close()
             self._manually_close.clear()
             await self._session.close()
+        if self._unix_socket is not None:
+            _remove_unix_socket(self._unix_socket)
         logger.info("Worker process stopped")
 
+    def has_crashed(self) -> bool:
+        """Whether the worker process ended without being stopped."""
+        return self._process is not None and self._process.has_crashed()
+
     async def restart(self, extra_flags: Iterable[str] = []):
         logger.info("Restarting worker...")
         await self.stop()
         await self.start(extra_flags)
 
+    def _is_listening(self) -> bool:
+        if self._unix_socket is not None:
+            return _unix_socket_in_use(self._unix_socket)
+        return _port_in_use(self._port)
+
     async def wait_for_ready(self, timeout: float = 300):
         if self._is_ready:
             return
@@ -247,7 +312,7 @@ class WorkerServer:
                 if (
                     self._process is not None
                     and self._session is not None
-                    and _port_in_use(self._port)
+                    and self._is_listening()
                 ):
                     try:
                         if not self._is_ready:
@@ -265,6 +330,13 @@ class WorkerServer:
         finally:
             self._is_checking_ready = False
 
+    async def wait_for_nodes(self):
+        """Waits until the worker has loaded all nodes."""
+        await self.wait_for_ready()
+        assert self._session is not None
+        async with self._session.get("/status", timeout=None) as resp:
+            resp.raise_for_status()
+
     async def proxy_request(self, request: Request, timeout: int | None = 300):
         if request.route is None:
             raise ValueError("Route not found")
@@ -272,7 +344,8 @@ class WorkerServer:
         assert self._session is not None
         async with self._session.request(
             request.method,
-            f"/{request.route.path}",
+            # the actual path, so that routes with parameters are forwarded as is
+            request.path,
             headers=request.headers,
             data=request.body,
             timeout=timeout,
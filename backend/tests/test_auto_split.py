@@ -0,0 +1,220 @@
+"""Tests for splitting images into tiles, batching tiles, and blending them."""
+
+from __future__ import annotations
+
+import threading
+
+import numpy as np
+import pytest
+
+from nodes.impl.upscale.auto_split import Split, _Blender, auto_split
+from nodes.impl.upscale.tiler import MaxTileSize
+from nodes.utils.utils import Region
+
+
+def _image(h: int, w: int, c: int = 3) -> np.ndarray:
+    return np.random.default_rng(0).random((h, w, c), dtype=np.float32)
+
+
+def _upscale(img: np.ndarray, _: Region) -> np.ndarray:
+    return img.repeat(2, 0).repeat(2, 1)
+
+
+class BatchRecorder:
+    """Upscales batches and records their sizes. Batches larger than `max_size` are split."""
+
+    def __init__(self, max_size: int | None = None):
+        self.max_size = max_size
+        self.sizes: list[int] = []
+
+    def __call__(
+        self, imgs: list[np.ndarray], regions: list[Region]
+    ) -> list[np.ndarray] | Split:
+        assert len(imgs) == len(regions)
+        assert all(i.shape == imgs[0].shape for i in imgs)
+        self.sizes.append(len(imgs))
+        if self.max_size is not None and len(imgs) > self.max_size:
+            return Split()
+        return [_upscale(i, r) for i, r in zip(imgs, regions, strict=True)]
+
+
+# A 64x200 image with tiles of at most 32px is split into 2 rows of 7 tiles.
+# With an overlap of 16px, the 5 inner tiles of each row have the same size
+# (61x48px), while the first and last tiles are smaller.
+IMG_H, IMG_W = 64, 200
+TILER = MaxTileSize(32)
+INNER_TILE_PIXELS = 61 * 48
+
+
+class TestBatching:
+    def test_batches_match_single_tiles(self):
+        img = _image(IMG_H, IMG_W)
+        batch = BatchRecorder()
+
+        single = auto_split(img, _upscale, TILER)
+        batched = auto_split(
+            img,
+            _upscale,
+            TILER,
+            upscale_batch=batch,
+            max_batch_pixels=4 * INNER_TILE_PIXELS,
+        )
+
+        np.testing.assert_allclose(single, _upscale(img, Region(0, 0, 0, 0)), atol=1e-6)
+        np.testing.assert_array_equal(batched, single)
+        # a batch of 4 inner tiles per row, the 5th inner tile is upscaled alone
+        assert batch.sizes == [4, 4]
+
+    def test_split_shrinks_batch(self):
+        img = _image(IMG_H, IMG_W)
+        batch = BatchRecorder(max_size=2)
+
+        single = auto_split(img, _upscale, TILER)
+        result = auto_split(
+            img,
+            _upscale,
+            TILER,
+            upscale_batch=batch,
+            max_batch_pixels=4 * INNER_TILE_PIXELS,
+        )
+
+        np.testing.assert_array_equal(result, single)
+        # the batch of 4 is split into 2 batches of 2, and the smaller batch size
+        # is kept for the rest of the image
+        assert batch.sizes == [4, 2, 2, 2, 2]
+
+    def test_single_tile_split_lowers_tile_size(self):
+        img = _image(IMG_H, IMG_W)
+        upscaled: list[Region] = []
+
+        def upscale(i: np.ndarray, r: Region) -> np.ndarray | Split:
+            # only the 48px wide inner tiles of a 16px tile size fit
+            if r.width > 50:
+                return Split()
+            upscaled.append(r)
+            return _upscale(i, r)
+
+        def upscale_batch(
+            imgs: list[np.ndarray], regions: list[Region]
+        ) -> list[np.ndarray] | Split:
+            if len(imgs) > 1:
+                return Split()
+            result = upscale(imgs[0], regions[0])
+            return result if isinstance(result, Split) else [result]
+
+        result = auto_split(
+            img,
+            upscale,
+            TILER,
+            upscale_batch=upscale_batch,
+            max_batch_pixels=4 * INNER_TILE_PIXELS,
+        )
+
+        np.testing.assert_allclose(result, _upscale(img, upscaled[0]), atol=1e-6)
+        # 13x4 tiles of the lower tile size after the first tile
+        assert len(upscaled) == 1 + 13 * 4
+
+    def test_prefetch_gets_next_batch(self):
+        img = _image(IMG_H, IMG_W)
+        calls: list[tuple[str, list[Region]]] = []
+
+        def upscale(i: np.ndarray, r: Region) -> np.ndarray:
+            calls.append(("upscale", [r]))
+            return _upscale(i, r)
+
+        def upscale_batch(
+            imgs: list[np.ndarray], regions: list[Region]
+        ) -> list[np.ndarray]:
+            calls.append(("upscale", regions))
+            return [_upscale(i, r) for i, r in zip(imgs, regions, strict=True)]
+
+        def prefetch(imgs: list[np.ndarray], regions: list[Region]) -> None:
+            for i, r in zip(imgs, regions, strict=True):
+                np.testing.assert_array_equal(i, r.read_from(img))
+            calls.append(("prefetch", regions))
+
+        auto_split(
+            img,
+            upscale,
+            TILER,
+            upscale_batch=upscale_batch,
+            max_batch_pixels=4 * INNER_TILE_PIXELS,
+            prefetch=prefetch,
+        )
+
+        upscales = [regions for kind, regions in calls if kind == "upscale"]
+        prefetches = [regions for kind, regions in calls if kind == "prefetch"]
+        # every upscale call but the first was prefetched before the previous call
+        assert prefetches == upscales[1:]
+        for index, (kind, regions) in enumerate(calls):
+            if kind == "prefetch":
+                assert calls[index + 1][0] == "upscale"
+                assert calls[index + 1][1] != regions
+
+
+class TestBackgroundBlending:
+    def test_same_result(self):
+        img = _image(IMG_H, IMG_W)
+
+        foreground = auto_split(img, _upscale, TILER)
+        background = auto_split(
+            img,
+            _upscale,
+            TILER,
+            upscale_batch=BatchRecorder(max_size=2),
+            max_batch_pixels=4 * INNER_TILE_PIXELS,
+            blend_in_background=True,
+        )
+
+        np.testing.assert_array_equal(background, foreground)
+
+    @pytest.mark.parametrize("background", [False, True])
+    def test_split_after_blended_rows(self, background: bool):
+        img = _image(IMG_H, IMG_W)
+        rows: set[int] = set()
+
+        def upscale(i: np.ndarray, r: Region) -> np.ndarray | Split:
+            # request a split in the second row, after the first row was blended
+            rows.add(r.y)
+            if len(rows) > 1 and r.width > 50:
+                return Split()
+            return _upscale(i, r)
+
+        result = auto_split(img, upscale, TILER, blend_in_background=background)
+
+        np.testing.assert_allclose(result, _upscale(img, Region(0, 0, 0, 0)), atol=1e-6)
+
+    def test_blender_runs_in_order_on_other_thread(self):
+        blender = _Blender(background=True)
+        order: list[int] = []
+        threads: set[threading.Thread] = set()
+
+        def op(index: int):
+            def run():
+                threads.add(threading.current_thread())
+                order.append(index)
+
+            return run
+
+        try:
+            for index in range(10):
+                blender.submit(op(index))
+            blender.wait()
+        finally:
+            blender.close()
+
+        assert order == list(range(10))
+        assert threading.current_thread() not in threads
+
+    def test_blender_error_is_raised(self):
+        blender = _Blender(background=True)
+
+        def fail():
+            raise ValueError("blend failed")
+
+        try:
+            blender.submit(fail)
+            with pytest.raises(ValueError, match="blend failed"):
+                blender.wait()
+        finally:
+            blender.close()
@@ -4,12 +4,15 @@ from __future__ import annotations
 
 from unittest.mock import Mock
 
+import numpy as np
+
 from api import InputId, NodeId, OutputId
 from chain.cache import (
     CacheStrategy,
     OutputCache,
     StaticCaching,
     get_cache_strategies,
+    get_value_size,
 )
 from chain.chain import Chain, Edge, EdgeSource, EdgeTarget
 
@@ -336,3 +339,170 @@ def test_get_cache_strategies_no_outputs():
 
     # Node with no outputs should have hits_to_live = 0
     assert strategies[NodeId("node1")].hits_to_live == 0
+
+
+def test_get_value_size():
+    """Test that only array buffers are counted."""
+    assert get_value_size(np.zeros((4, 4), dtype=np.float32)) == 64
+    assert get_value_size([np.zeros(8, dtype=np.uint8), "text", 5]) == 8
+    assert get_value_size({"a": (np.zeros(2, dtype=np.float64),)}) == 16
+    assert get_value_size("text") == 0
+
+
+def test_output_cache_memory_bytes():
+    """Test that the cache tracks the bytes of its entries."""
+    cache: OutputCache[np.ndarray] = OutputCache()
+    cache.set(NodeId("a"), np.zeros(100, dtype=np.uint8), StaticCaching)
+    cache.set(NodeId("b"), np.zeros(50, dtype=np.uint8), CacheStrategy(1))
+    assert cache.memory_bytes == 150
+
+    # overwriting an entry replaces its size
+    cache.set(NodeId("a"), np.zeros(10, dtype=np.uint8), StaticCaching)
+    assert cache.memory_bytes == 60
+
+    # expired entries free their bytes
+    cache.get(NodeId("b"))
+    assert cache.memory_bytes == 10
+
+    cache.clear()
+    assert cache.memory_bytes == 0
+
+
+def test_output_cache_unlimited_never_evicts():
+    """Test that a cache without a budget keeps everything."""
+    cache: OutputCache[np.ndarray] = OutputCache()
+    for i in range(10):
+        cache.set(NodeId(f"n{i}"), np.zeros(1000, dtype=np.uint8), StaticCaching)
+    assert len(cache.keys()) == 10
+
+
+def test_output_cache_evicts_least_recently_used():
+    """Test that entries of equal cost are evicted least recently used first."""
+    cache: OutputCache[np.ndarray] = OutputCache(max_bytes=250)
+    cache.set(NodeId("a"), np.zeros(100, dtype=np.uint8), StaticCaching)
+    cache.set(NodeId("b"), np.zeros(100, dtype=np.uint8), StaticCaching)
+    cache.get(NodeId("a"))
+
+    cache.set(NodeId("c"), np.zeros(100, dtype=np.uint8), StaticCaching)
+
+    assert cache.has(NodeId("a"))
+    assert not cache.has(NodeId("b"))
+    assert cache.has(NodeId("c"))
+    assert cache.memory_bytes == 200
+
+
+def test_output_cache_prefers_evicting_cheap_entries():
+    """Test that entries which are expensive to recompute are kept."""
+    cache: OutputCache[np.ndarray] = OutputCache(max_bytes=250)
+    cache.set(NodeId("slow"), np.zeros(100, dtype=np.uint8), StaticCaching, 10.0)
+    cache.set(NodeId("fast"), np.zeros(100, dtype=np.uint8), StaticCaching, 0.01)
+
+    cache.set(NodeId("new"), np.zeros(100, dtype=np.uint8), StaticCaching, 1.0)
+
+    assert cache.has(NodeId("slow"))
+    assert not cache.has(NodeId("fast"))
+    assert cache.has(NodeId("new"))
+
+
+def test_output_cache_keeps_new_entry_larger_than_budget():
+    """Test that the entry that was just set is never evicted."""
+    cache: OutputCache[np.ndarray] = OutputCache(max_bytes=50)
+    cache.set(NodeId("a"), np.zeros(10, dtype=np.uint8), StaticCaching)
+    cache.set(NodeId("big"), np.zeros(100, dtype=np.uint8), StaticCaching)
+
+    assert not cache.has(NodeId("a"))
+    assert cache.get(NodeId("big")) is not None
+
+
+def test_output_cache_never_evicts_sizeless_entries():
+    """Test that entries without arrays are not evicted."""
+    cache: OutputCache[object] = OutputCache(max_bytes=50)
+    cache.set(NodeId("state"), "generator state", StaticCaching)
+    cache.set(NodeId("a"), np.zeros(100, dtype=np.uint8), StaticCaching)
+    cache.set(NodeId("b"), np.zeros(100, dtype=np.uint8), StaticCaching)
+
+    assert cache.has(NodeId("state"))
+    assert not cache.has(NodeId("a"))
+
+
+def test_output_cache_custom_size_of():
+    """Test that a custom size function is used."""
+    cache: OutputCache[str] = OutputCache(max_bytes=10, size_of=len)
+    cache.set(NodeId("a"), "123456", StaticCaching)
+    cache.set(NodeId("b"), "123456", StaticCaching)
+
+    assert not cache.has(NodeId("a"))
+    assert cache.memory_bytes == 6
+
+
+def test_output_cache_spills_to_disk(tmp_path):
+    """Test that evicted entries are spilled to disk and loaded again."""
+    cache: OutputCache[np.ndarray] = OutputCache(max_bytes=150, spill_dir=tmp_path)
+    a = np.arange(100, dtype=np.uint8)
+    cache.set(NodeId("a"), a, StaticCaching)
+    cache.set(NodeId("b"), np.zeros(100, dtype=np.uint8), StaticCaching)
+
+    assert cache.has(NodeId("a"))
+    assert cache.is_spilled(NodeId("a"))
+    assert cache.memory_bytes == 100
+    assert len(list(tmp_path.iterdir())) == 1
+
+    loaded = cache.get(NodeId("a"))
+    assert loaded is not None
+    np.testing.assert_array_equal(loaded, a)
+    assert not cache.is_spilled(NodeId("a"))
+    # loading "a" made room by spilling "b"
+    assert cache.is_spilled(NodeId("b"))
+    assert cache.memory_bytes == 100
+
+    cache.clear()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_output_cache_spilled_counted_entry_expires(tmp_path):
+    """Test that spilled counted entries keep their hits to live."""
+    cache: OutputCache[np.ndarray] = OutputCache(max_bytes=150, spill_dir=tmp_path)
+    cache.set(NodeId("a"), np.zeros(100, dtype=np.uint8), CacheStrategy(1))
+    cache.set(NodeId("b"), np.zeros(100, dtype=np.uint8), StaticCaching)
+    assert cache.is_spilled(NodeId("a"))
+
+    assert cache.get(NodeId("a")) is not None
+    assert not cache.has(NodeId("a"))
+    assert cache.has(NodeId("b"))
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_output_cache_drops_unpicklable_entries(tmp_path):
+    """Test that entries which cannot be spilled are dropped instead."""
+    cache: OutputCache[object] = OutputCache(max_bytes=150, spill_dir=tmp_path)
+    unpicklable = [np.zeros(100, dtype=np.uint8), lambda: None]
+    cache.set(NodeId("a"), unpicklable, StaticCaching)
+    cache.set(NodeId("b"), np.zeros(100, dtype=np.uint8), StaticCaching)
+
+    assert not cache.has(NodeId("a"))
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_output_cache_keeps_entries_that_cannot_be_recomputed():
+    """Test that entries set with recomputable=False are never dropped."""
+    cache: OutputCache[np.ndarray] = OutputCache(max_bytes=150)
+    cache.set(NodeId("item"), np.zeros(100, dtype=np.uint8), StaticCaching, 0, False)
+    cache.set(NodeId("b"), np.zeros(100, dtype=np.uint8), StaticCaching)
+
+    assert cache.has(NodeId("item"))
+    assert cache.memory_bytes == 200
+
+    cache.set(NodeId("c"), np.zeros(100, dtype=np.uint8), StaticCaching)
+    assert cache.has(NodeId("item"))
+    assert not cache.has(NodeId("b"))
+
+
+def test_output_cache_spills_entries_that_cannot_be_recomputed(tmp_path):
+    """Test that entries set with recomputable=False are spilled if possible."""
+    cache: OutputCache[np.ndarray] = OutputCache(max_bytes=150, spill_dir=tmp_path)
+    item = np.arange(100, dtype=np.uint8)
+    cache.set(NodeId("item"), item, StaticCaching, 0, False)
+    cache.set(NodeId("b"), np.zeros(100, dtype=np.uint8), StaticCaching)
+
+    assert cache.is_spilled(NodeId("item"))
+    np.testing.assert_array_equal(cache.get(NodeId("item")), item)  # type: ignore
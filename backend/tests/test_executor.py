@@ -11,12 +11,15 @@ These tests validate the execution of chains, including:
 from __future__ import annotations
 
 import asyncio
+import threading
+import time
 from collections.abc import Callable
 from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any
 from unittest.mock import Mock, patch
 
+import numpy as np
 import pytest  # type: ignore[import-untyped]
 
 from api import (
@@ -24,20 +27,31 @@ from api import (
     BaseOutput,
     Collector,
     ExecutionOptions,
+    Generator,
     InputId,
     IteratorInputInfo,
+    IteratorOutputInfo,
     NodeData,
     NodeId,
     OutputId,
 )
 from api.settings import SettingsParser
-from chain.chain import Chain, CollectorNode, FunctionNode
+from chain.chain import (
+    Chain,
+    CollectorNode,
+    Edge,
+    EdgeSource,
+    EdgeTarget,
+    FunctionNode,
+    GeneratorNode,
+)
 from chain.input import InputMap
 from events import EventQueue
 from process_new import (
     CollectorOutput,
     ExecutionId,
     Executor,
+    NodeExecutionError,
     RegularOutput,
     _ExecutorNodeContext,
 )
@@ -492,3 +506,759 @@ class TestCollectorIteration:
         # Test completion
         final_result = collector_obj.on_complete()
         assert final_result == [10, 20, 30]
+
+
+def create_leaf(node_id: NodeId, run_fn: Callable[[], None]) -> FunctionNode:
+    """Create a side-effect leaf node that runs the given function."""
+    node = create_function_node(node_id, "test:leaf", "Leaf")
+    node.data.run = run_fn
+    node.data.side_effects = True
+    return node
+
+
+class ConcurrencyTracker:
+    """Records how many leaf nodes run at the same time."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+
+    def leaf(self, node_id: NodeId, wait: Callable[[], object] = lambda: None):
+        def run_fn() -> None:
+            with self.lock:
+                self.running += 1
+                self.max_running = max(self.max_running, self.running)
+            try:
+                wait()
+            finally:
+                with self.lock:
+                    self.running -= 1
+
+        return create_leaf(node_id, run_fn)
+
+
+class TestParallelLineages:
+    """Test running independent lineages concurrently."""
+
+    TIMEOUT = 5
+
+    async def _run(self, executor_setup, nodes, max_parallel_lineages, queue=None):
+        for node in nodes:
+            executor_setup["chain"].add_node(node)
+
+        from api.api import registry
+
+        mock_package = Mock()
+        mock_package.id = "test:package"
+        with patch.object(registry, "get_package", return_value=mock_package):
+            executor = Executor(
+                id=ExecutionId("test-exec"),
+                chain=executor_setup["chain"],
+                send_broadcast_data=False,
+                options=executor_setup["options"],
+                loop=asyncio.get_running_loop(),
+                queue=queue or executor_setup["queue"],
+                pool=ThreadPoolExecutor(max_workers=4),
+                storage_dir=executor_setup["storage_dir"],
+                max_parallel_lineages=max_parallel_lineages,
+            )
+            await executor.run()
+
+    @pytest.mark.asyncio
+    async def test_sequential_by_default(self, executor_setup):
+        """Test that lineages run one after another with the default limit."""
+        tracker = ConcurrencyTracker()
+        nodes = [tracker.leaf(NodeId(f"n{i}")) for i in range(3)]
+        await self._run(executor_setup, nodes, 1)
+
+        assert tracker.max_running == 1
+
+    @pytest.mark.asyncio
+    async def test_lineages_run_concurrently(self, executor_setup):
+        """Test that all lineages are running at the same time."""
+        # every node waits until all nodes are running
+        barrier = threading.Barrier(3, timeout=self.TIMEOUT)
+        tracker = ConcurrencyTracker()
+        nodes = [tracker.leaf(NodeId(f"n{i}"), barrier.wait) for i in range(3)]
+        await self._run(executor_setup, nodes, 3)
+
+        assert tracker.max_running == 3
+
+    @pytest.mark.asyncio
+    async def test_concurrency_limit(self, executor_setup):
+        """Test that no more than the configured number of lineages run at once."""
+        # nodes run in pairs, so at least 2 lineages must run at once
+        barrier = threading.Barrier(2, timeout=self.TIMEOUT)
+        tracker = ConcurrencyTracker()
+        nodes = [tracker.leaf(NodeId(f"n{i}"), barrier.wait) for i in range(4)]
+        await self._run(executor_setup, nodes, 2)
+
+        assert tracker.max_running == 2
+
+    @pytest.mark.asyncio
+    async def test_lineage_events(self, executor_setup):
+        """Test that every lineage reports its start and finish."""
+        events = []
+        queue = Mock()
+        queue.put = events.append
+
+        nodes = [create_leaf(NodeId(f"n{i}"), lambda: None) for i in range(2)]
+        await self._run(executor_setup, nodes, 2, queue=queue)
+
+        starts = [e["data"] for e in events if e["event"] == "lineage-start"]
+        finishes = [e["data"] for e in events if e["event"] == "lineage-finish"]
+        assert sorted(s["lineage"] for s in starts) == [0, 1]
+        assert sorted(f["lineage"] for f in finishes) == [0, 1]
+        assert sorted(n for s in starts for n in s["nodes"]) == ["n0", "n1"]
+
+    @pytest.mark.asyncio
+    async def test_failure_cancels_other_lineages(self, executor_setup):
+        """Test that an error in one lineage is raised and cancels the others."""
+        blocked_started = threading.Event()
+        release = threading.Event()
+        ran: list[str] = []
+
+        def fail() -> None:
+            # fail only once the other lineage is running
+            assert blocked_started.wait(self.TIMEOUT)
+            raise ValueError("fail failed")
+
+        def blocked() -> None:
+            blocked_started.set()
+            release.wait(self.TIMEOUT)
+
+        events = []
+        queue = Mock()
+        queue.put = events.append
+
+        nodes = [
+            create_leaf(NodeId("fail"), fail),
+            create_leaf(NodeId("blocked"), blocked),
+            create_leaf(NodeId("queued"), lambda: ran.append("queued")),
+        ]
+        try:
+            with pytest.raises(NodeExecutionError):
+                await self._run(executor_setup, nodes, 2, queue=queue)
+        finally:
+            release.set()
+
+        starts = {
+            e["data"]["nodes"][0]: e["data"]["lineage"]
+            for e in events
+            if e["event"] == "lineage-start"
+        }
+        finished = {
+            e["data"]["lineage"] for e in events if e["event"] == "lineage-finish"
+        }
+        # the running lineage was cancelled before it finished
+        assert "blocked" in starts
+        assert starts["blocked"] not in finished
+        # the lineage waiting for a slot never started
+        assert "queued" not in starts
+        assert ran == []
+
+
+def create_generator_chain(
+    chain: Chain,
+    items: list[object],
+    produce_time: float,
+    consume_time: float,
+    consumed: list[object],
+    fail_fast: bool = True,
+) -> None:
+    """Create a generator feeding a side-effect leaf that records its inputs."""
+
+    def generator_run_fn() -> Generator:
+        def supplier():
+            for item in items:
+                time.sleep(produce_time)
+                yield item
+
+        return Generator(supplier, expected_length=len(items)).with_fail_fast(fail_fast)
+
+    output_mock = Mock(spec=BaseOutput)
+    output_mock.id = OutputId(0)
+    output_mock.enforce = Mock(side_effect=lambda x: x)
+
+    gen_data = create_mock_node_data(
+        "test:gen", "Generator", "generator", run_fn=generator_run_fn
+    )
+    gen_iter_output = Mock(spec=IteratorOutputInfo)
+    gen_iter_output.outputs = [OutputId(0)]
+    gen_data.single_iterable_output = gen_iter_output  # type: ignore
+    gen_data.outputs = [output_mock]  # type: ignore
+
+    gen_node = Mock(spec=GeneratorNode)
+    gen_node.id = NodeId("gen")
+    gen_node.schema_id = "test:gen"
+    gen_node.data = gen_data
+    gen_node.has_side_effects = Mock(return_value=False)
+
+    def consume_fn(value: object) -> None:
+        time.sleep(consume_time)
+        consumed.append(value)
+
+    input_mock = Mock(spec=BaseInput)
+    input_mock.id = InputId(0)
+    input_mock.enforce_ = Mock(side_effect=lambda x: x)
+    input_mock.lazy = False
+    input_mock.optional = False
+
+    leaf = create_function_node(NodeId("leaf"), "test:leaf", "Leaf")
+    leaf.data.run = consume_fn
+    leaf.data.side_effects = True
+    leaf.data.inputs = [input_mock]  # type: ignore
+
+    chain.add_node(gen_node)
+    chain.add_node(leaf)
+    chain.add_edge(
+        Edge(
+            EdgeSource(NodeId("gen"), OutputId(0)),
+            EdgeTarget(NodeId("leaf"), InputId(0)),
+        )
+    )
+
+
+class TestGeneratorPrefetch:
+    """Test pulling generator items ahead on a background thread."""
+
+    async def _run(self, executor_setup, generator_prefetch):
+        from api.api import registry
+
+        mock_package = Mock()
+        mock_package.id = "test:package"
+        with patch.object(registry, "get_package", return_value=mock_package):
+            executor = Executor(
+                id=ExecutionId("test-exec"),
+                chain=executor_setup["chain"],
+                send_broadcast_data=False,
+                options=executor_setup["options"],
+                loop=asyncio.get_running_loop(),
+                queue=executor_setup["queue"],
+                pool=executor_setup["pool"],
+                storage_dir=executor_setup["storage_dir"],
+                generator_prefetch=generator_prefetch,
+            )
+            start = time.monotonic()
+            await executor.run()
+            return time.monotonic() - start
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("generator_prefetch", [0, 1, 3])
+    async def test_items_arrive_in_order(self, executor_setup, generator_prefetch):
+        """Test that all items are consumed in generator order."""
+        consumed: list[object] = []
+        items = list(range(10))
+        create_generator_chain(executor_setup["chain"], items, 0, 0, consumed)
+
+        await self._run(executor_setup, generator_prefetch)
+
+        assert consumed == items
+
+    @pytest.mark.asyncio
+    async def test_decode_overlaps_with_downstream_work(self, executor_setup):
+        """Test that producing the next item overlaps with consuming the current one."""
+        consumed: list[object] = []
+        create_generator_chain(
+            executor_setup["chain"], [1, 2, 3, 4], 0.1, 0.1, consumed
+        )
+
+        duration = await self._run(executor_setup, 2)
+
+        assert consumed == [1, 2, 3, 4]
+        # serial execution would take 8 * 0.1s
+        assert duration < 0.7
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("generator_prefetch", [0, 2])
+    async def test_fail_fast_raises(self, executor_setup, generator_prefetch):
+        """Test that a yielded exception stops a fail-fast generator."""
+        consumed: list[object] = []
+        items = [1, ValueError("broken"), 3]
+        create_generator_chain(executor_setup["chain"], items, 0, 0, consumed)
+
+        with pytest.raises(NodeExecutionError, match="broken"):
+            await self._run(executor_setup, generator_prefetch)
+
+        assert consumed == [1]
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("generator_prefetch", [0, 2])
+    async def test_failed_items_are_deferred(self, executor_setup, generator_prefetch):
+        """Test that a non-fail-fast generator skips failed items and reports them at the end."""
+        consumed: list[object] = []
+        items = [1, ValueError("broken"), 3]
+        create_generator_chain(
+            executor_setup["chain"], items, 0, 0, consumed, fail_fast=False
+        )
+
+        with pytest.raises(
+            Exception, match="Errors occurred during iteration"
+        ) as exc_info:
+            await self._run(executor_setup, generator_prefetch)
+
+        assert consumed == [1, 3]
+        assert exc_info.value.__cause__ is items[1]
+
+
+def create_item_node(
+    node_id: NodeId,
+    run_fn: Callable[..., Any],
+    has_output: bool = True,
+    side_effects: bool = False,
+) -> FunctionNode:
+    """Create a function node with a single input and an optional single output."""
+    input_mock = Mock(spec=BaseInput)
+    input_mock.id = InputId(0)
+    input_mock.enforce_ = Mock(side_effect=lambda x: x)
+    input_mock.lazy = False
+    input_mock.optional = False
+
+    node = create_function_node(node_id, f"test:{node_id}", str(node_id))
+    node.data.run = run_fn
+    node.data.side_effects = side_effects
+    node.has_side_effects = Mock(return_value=side_effects)
+    node.data.inputs = [input_mock]  # type: ignore
+    if has_output:
+        output_mock = Mock(spec=BaseOutput)
+        output_mock.id = OutputId(0)
+        output_mock.enforce = Mock(side_effect=lambda x: x)
+        node.data.outputs = [output_mock]  # type: ignore
+    return node
+
+
+def create_list_collector(node_id: NodeId, collected: list[object]) -> CollectorNode:
+    """Create a collector node that appends every item to the given list."""
+
+    def run_fn(_items: object) -> Collector:
+        return Collector(on_iterate=collected.append, on_complete=lambda: None)
+
+    iter_input_info = Mock(spec=IteratorInputInfo)
+    iter_input_info.inputs = [InputId(0)]
+
+    input_mock = Mock(spec=BaseInput)
+    input_mock.id = InputId(0)
+    input_mock.enforce_ = Mock(side_effect=lambda x: x)
+    input_mock.lazy = False
+    input_mock.optional = False
+
+    node_data = create_mock_node_data(
+        f"test:{node_id}", str(node_id), "collector", run_fn=run_fn
+    )
+    node_data.inputs = [input_mock]  # type: ignore
+    node_data.single_iterable_input = iter_input_info  # type: ignore
+
+    node = Mock(spec=CollectorNode)
+    node.id = node_id
+    node.schema_id = f"test:{node_id}"
+    node.data = node_data
+    node.has_side_effects = Mock(return_value=False)
+    return node
+
+
+def connect(chain: Chain, source: NodeId, target: NodeId) -> None:
+    chain.add_edge(
+        Edge(EdgeSource(source, OutputId(0)), EdgeTarget(target, InputId(0)))
+    )
+
+
+class TestParallelIteration:
+    """Test processing several items of a stateless per-item subgraph at once."""
+
+    SLEEP = 0.01
+    TIMEOUT = 5
+
+    def _build(
+        self,
+        chain,
+        items,
+        saved,
+        collected,
+        wait: Callable[[], object] = lambda: None,
+    ):
+        """gen -> double -> {save, collect}"""
+        consumed: list[object] = []
+        create_generator_chain(chain, items, 0, 0, consumed)
+        # replace the generator's leaf with a per-item subgraph
+        chain.remove_node(NodeId("leaf"))
+
+        def double(x: int) -> int:
+            wait()
+            # later items may finish first
+            time.sleep(self.SLEEP * (1 + x % 3) / 2)
+            return x * 2
+
+        def save(x: int) -> None:
+            time.sleep(self.SLEEP)
+            saved.append(x)
+
+        chain.add_node(create_item_node(NodeId("double"), double))
+        chain.add_node(
+            create_item_node(NodeId("save"), save, has_output=False, side_effects=True)
+        )
+        chain.add_node(create_list_collector(NodeId("collect"), collected))
+        connect(chain, NodeId("gen"), NodeId("double"))
+        connect(chain, NodeId("double"), NodeId("save"))
+        connect(chain, NodeId("double"), NodeId("collect"))
+
+    def _executor(self, executor_setup, parallel_iterations):
+        return Executor(
+            id=ExecutionId("test-exec"),
+            chain=executor_setup["chain"],
+            send_broadcast_data=False,
+            options=executor_setup["options"],
+            loop=asyncio.get_running_loop(),
+            queue=executor_setup["queue"],
+            pool=ThreadPoolExecutor(max_workers=8),
+            storage_dir=executor_setup["storage_dir"],
+            parallel_iterations=parallel_iterations,
+        )
+
+    @pytest.mark.asyncio
+    async def test_plan_detects_per_item_subgraph(self, executor_setup):
+        """Test that a generator feeding stateless nodes, leaves and collectors is planned."""
+        self._build(executor_setup["chain"], [1], [], [])
+        executor = self._executor(executor_setup, 4)
+
+        plan = executor._plan_parallel_iteration(set(executor.chain.nodes))  # noqa: SLF001
+
+        assert plan is not None
+        assert [n.id for n in plan.nodes].index("double") < [
+            n.id for n in plan.nodes
+        ].index("save")
+        assert [n.id for n in plan.collectors] == ["collect"]
+
+    @pytest.mark.asyncio
+    async def test_plan_rejects_side_effects_with_downstream(self, executor_setup):
+        """Test that a node with side effects in the middle disables parallel iteration."""
+        self._build(executor_setup["chain"], [1], [], [])
+        double = executor_setup["chain"].nodes[NodeId("double")]
+        double.has_side_effects = Mock(return_value=True)
+        executor = self._executor(executor_setup, 4)
+
+        plan = executor._plan_parallel_iteration(set(executor.chain.nodes))  # noqa: SLF001
+
+        assert plan is None
+
+    @pytest.mark.asyncio
+    async def test_plan_disabled_by_default(self, executor_setup):
+        """Test that parallel iteration is off with the default limit."""
+        self._build(executor_setup["chain"], [1], [], [])
+        executor = self._executor(executor_setup, 1)
+
+        plan = executor._plan_parallel_iteration(set(executor.chain.nodes))  # noqa: SLF001
+
+        assert plan is None
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("parallel_iterations", [1, 4])
+    async def test_collector_order_is_deterministic(
+        self, executor_setup, parallel_iterations
+    ):
+        """Test that collectors receive items in generator order."""
+        saved: list[object] = []
+        collected: list[object] = []
+        items = list(range(8))
+        self._build(executor_setup["chain"], items, saved, collected)
+
+        from api.api import registry
+
+        mock_package = Mock()
+        mock_package.id = "test:package"
+        with patch.object(registry, "get_package", return_value=mock_package):
+            await self._executor(executor_setup, parallel_iterations).run()
+
+        assert collected == [x * 2 for x in items]
+        assert sorted(saved) == [x * 2 for x in items]
+
+    async def _run(self, executor_setup, parallel_iterations) -> Executor:
+        from api.api import registry
+
+        mock_package = Mock()
+        mock_package.id = "test:package"
+        with patch.object(registry, "get_package", return_value=mock_package):
+            executor = self._executor(executor_setup, parallel_iterations)
+            await executor.run()
+        return executor
+
+    @pytest.mark.asyncio
+    async def test_items_are_processed_concurrently(self, executor_setup):
+        """Test that as many items as allowed are in flight at the same time."""
+        saved: list[object] = []
+        collected: list[object] = []
+        items = list(range(8))
+        # every item waits until 4 items are being processed
+        barrier = threading.Barrier(4, timeout=self.TIMEOUT)
+        self._build(executor_setup["chain"], items, saved, collected, barrier.wait)
+
+        await self._run(executor_setup, 4)
+
+        assert collected == [x * 2 for x in items]
+
+    @pytest.mark.asyncio
+    async def test_collector_uses_generator_static_output(self, executor_setup):
+        """Test a collector fed by both outputs of a generator (e.g. frames and FPS)."""
+        chain = executor_setup["chain"]
+        collected: list[object] = []
+        begun_with: list[object] = []
+        items = list(range(4))
+        self._build(chain, items, [], collected)
+
+        # the generator gets a non-iterable output
+        gen = chain.nodes[NodeId("gen")]
+        run_generator = gen.data.run
+        gen.data.run = lambda: (run_generator(), 30)
+        fps_output = Mock(spec=BaseOutput)
+        fps_output.id = OutputId(1)
+        fps_output.enforce = Mock(side_effect=lambda x: x)
+        gen.data.outputs = [*gen.data.outputs, fps_output]
+
+        # which is passed to the non-iterable input of the collector
+        collector = chain.nodes[NodeId("collect")]
+        fps_input = Mock(spec=BaseInput)
+        fps_input.id = InputId(1)
+        fps_input.enforce_ = Mock(side_effect=lambda x: x)
+        fps_input.lazy = False
+        fps_input.optional = False
+        collector.data.inputs = [*collector.data.inputs, fps_input]
+
+        def run_collector(_items: object, fps: int) -> Collector:
+            begun_with.append(fps)
+            return Collector(on_iterate=collected.append, on_complete=lambda: None)
+
+        collector.data.run = run_collector
+        chain.add_edge(
+            Edge(
+                EdgeSource(NodeId("gen"), OutputId(1)),
+                EdgeTarget(NodeId("collect"), InputId(1)),
+            )
+        )
+
+        await self._run(executor_setup, 4)
+
+        assert begun_with == [30]
+        assert collected == [x * 2 for x in items]
+
+    @pytest.mark.asyncio
+    async def test_static_source_is_released(self, executor_setup):
+        """Test that a static source used by several per-item nodes finishes after the last item."""
+        chain = executor_setup["chain"]
+        collected: list[object] = []
+        items = list(range(4))
+        self._build(chain, items, [], collected)
+
+        # offset -> {add, double}, gen -> add -> save_added
+        added: list[object] = []
+        offset = create_item_node(NodeId("offset"), lambda: 10)
+        offset.data.inputs = []
+        chain.add_node(offset)
+        chain.add_node(create_item_node(NodeId("add"), lambda x, k: x + k))
+        chain.add_node(
+            create_item_node(
+                NodeId("save_added"), added.append, has_output=False, side_effects=True
+            )
+        )
+        connect(chain, NodeId("gen"), NodeId("add"))
+        connect(chain, NodeId("add"), NodeId("save_added"))
+        chain.nodes[NodeId("double")].data.run = lambda x, _k: x * 2
+        for nid in [NodeId("add"), NodeId("double")]:
+            k_input = Mock(spec=BaseInput)
+            k_input.id = InputId(1)
+            k_input.enforce_ = Mock(side_effect=lambda x: x)
+            k_input.lazy = False
+            k_input.optional = False
+            node = chain.nodes[nid]
+            node.data.inputs = [*node.data.inputs, k_input]
+            chain.add_edge(
+                Edge(
+                    EdgeSource(NodeId("offset"), OutputId(0)),
+                    EdgeTarget(nid, InputId(1)),
+                )
+            )
+
+        executor = self._executor(executor_setup, 4)
+        plan = executor._plan_parallel_iteration(set(chain.nodes))  # noqa: SLF001
+        assert plan is not None
+        assert plan.static_sources == {NodeId("offset"): 2}
+
+        from api.api import registry
+
+        mock_package = Mock()
+        mock_package.id = "test:package"
+        with patch.object(registry, "get_package", return_value=mock_package):
+            await executor._run_parallel_iteration(plan)  # noqa: SLF001
+
+        assert collected == [x * 2 for x in items]
+        assert sorted(added) == [x + 10 for x in items]
+        runtime = executor.runtimes[NodeId("offset")]
+        assert runtime._finished  # noqa: SLF001
+        assert runtime._current_value is None  # noqa: SLF001
+
+
+class TestLegacyExecutorCacheBudget:
+    """Test the memory budget of the node cache in the legacy executor."""
+
+    @pytest.mark.asyncio
+    async def test_iterator_items_are_not_evicted(self, executor_setup):
+        """Test that the current item stays cached while downstream outputs push it out."""
+        import process
+
+        items = [np.full(100, i, dtype=np.uint8) for i in range(3)]
+
+        def generator_run_fn() -> Generator:
+            return Generator.from_list(items, lambda item, _: item)
+
+        output_mock = Mock(spec=BaseOutput)
+        output_mock.id = OutputId(0)
+        output_mock.enforce = Mock(side_effect=lambda x: x)
+
+        gen_data = create_mock_node_data(
+            "test:gen", "Generator", "generator", run_fn=generator_run_fn
+        )
+        gen_iter_output = Mock(spec=IteratorOutputInfo)
+        gen_iter_output.outputs = [OutputId(0)]
+        gen_data.single_iterable_output = gen_iter_output  # type: ignore
+        gen_data.outputs = [output_mock]  # type: ignore
+        gen_node = Mock(spec=GeneratorNode)
+        gen_node.id = NodeId("gen")
+        gen_node.schema_id = "test:gen"
+        gen_node.data = gen_data
+        gen_node.has_side_effects = Mock(return_value=False)
+
+        def create_input(input_id: int) -> BaseInput:
+            input_mock = Mock(spec=BaseInput)
+            input_mock.id = InputId(input_id)
+            input_mock.enforce_ = Mock(side_effect=lambda x: x)
+            input_mock.lazy = False
+            input_mock.optional = False
+            return input_mock
+
+        # a pure node with a large output, which pushes the item out of the budget
+        double = create_function_node(NodeId("double"), "test:double", "Double")
+        double.data.run = lambda img: img * 2
+        double.data.side_effects = False
+        double.has_side_effects = Mock(return_value=False)
+        double.data.inputs = [create_input(0)]  # type: ignore
+        double.data.outputs = [output_mock]  # type: ignore
+
+        pairs: list[tuple[int, int]] = []
+        leaf = create_function_node(NodeId("leaf"), "test:leaf", "Leaf")
+        leaf.data.run = lambda doubled, img: pairs.append((doubled[0], img[0]))
+        leaf.data.side_effects = True
+        leaf.data.inputs = [create_input(0), create_input(1)]  # type: ignore
+
+        chain = executor_setup["chain"]
+        for node in (gen_node, double, leaf):
+            chain.add_node(node)
+        for source, target, input_id in (
+            ("gen", "double", 0),
+            ("double", "leaf", 0),
+            ("gen", "leaf", 1),
+        ):
+            chain.add_edge(
+                Edge(
+                    EdgeSource(NodeId(source), OutputId(0)),
+                    EdgeTarget(NodeId(target), InputId(input_id)),
+                )
+            )
+
+        from api.api import registry
+
+        mock_package = Mock()
+        mock_package.id = "test:package"
+        with patch.object(registry, "get_package", return_value=mock_package):
+            executor = process.Executor(
+                id=ExecutionId("test-exec"),
+                chain=chain,
+                send_broadcast_data=False,
+                options=executor_setup["options"],
+                loop=asyncio.get_running_loop(),
+                queue=executor_setup["queue"],
+                pool=executor_setup["pool"],
+                storage_dir=executor_setup["storage_dir"],
+                cache_max_bytes=150,
+            )
+            await executor.run()
+
+        assert pairs == [(0, 0), (2, 1), (4, 2)]
+
+
+class TestChainCleanup:
+    """Test that a failed chain runs its cleanups and clears its node cache."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("legacy", [False, True])
+    async def test_cleanup_after_failure(self, executor_setup, legacy: bool):
+        """Test that cleanups registered by a node run after a downstream node raised."""
+        import process
+
+        cleaned_up: list[str] = []
+
+        def cleanup() -> None:
+            cleaned_up.append("source")
+
+        def source_run_fn(context) -> int:
+            context.add_cleanup(cleanup, after="chain")
+            return 1
+
+        def fail(_value: int) -> None:
+            raise ValueError("downstream failed")
+
+        output_mock = Mock(spec=BaseOutput)
+        output_mock.id = OutputId(0)
+        output_mock.enforce = Mock(side_effect=lambda x: x)
+
+        source = create_function_node(NodeId("source"), "test:source", "Source")
+        source.data.run = source_run_fn
+        source.data.node_context = True
+        source.data.outputs = [output_mock]  # type: ignore
+        source.has_side_effects = Mock(return_value=False)
+
+        input_mock = Mock(spec=BaseInput)
+        input_mock.id = InputId(0)
+        input_mock.enforce_ = Mock(side_effect=lambda x: x)
+        input_mock.lazy = False
+        input_mock.optional = False
+
+        leaf = create_leaf(NodeId("leaf"), fail)
+        leaf.data.inputs = [input_mock]  # type: ignore
+
+        chain = executor_setup["chain"]
+        chain.add_node(source)
+        chain.add_node(leaf)
+        chain.add_edge(
+            Edge(
+                EdgeSource(NodeId("source"), OutputId(0)),
+                EdgeTarget(NodeId("leaf"), InputId(0)),
+            )
+        )
+
+        from api.api import registry
+
+        mock_package = Mock()
+        mock_package.id = "test:package"
+        mock_package.settings = []
+        executor_class = process.Executor if legacy else Executor
+        with patch.object(registry, "get_package", return_value=mock_package):
+            executor = executor_class(
+                id=ExecutionId("test-exec"),
+                chain=chain,
+                send_broadcast_data=False,
+                options=executor_setup["options"],
+                loop=asyncio.get_running_loop(),
+                queue=executor_setup["queue"],
+                pool=executor_setup["pool"],
+                storage_dir=executor_setup["storage_dir"],
+            )
+            with (
+                patch.object(
+                    executor.node_cache, "clear", wraps=executor.node_cache.clear
+                ) as clear_cache,
+                pytest.raises(Exception, match="downstream failed"),
+            ):
+                await executor.run()
+
+        assert cleaned_up == ["source"]
+        # cached (and spilled) outputs are dropped as well
+        clear_cache.assert_called_once()
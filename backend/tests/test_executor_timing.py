@@ -895,3 +895,147 @@ class TestTimingDoesNotIncludeUpstreamWait:
         # It should only reflect its own execution, not waiting for upstream
         assert downstream_time < SLEEP_TIME
         assert downstream_time >= SLEEP_TIME / 2 - TIMING_TOLERANCE
+
+
+class TestNodeProfile:
+    """Test that node runs are recorded by the executor's profiler."""
+
+    @pytest.mark.asyncio
+    async def test_run_node_async_records_profile(self, executor_setup):
+        """Test that run_node_async records the run time of the node."""
+
+        def slow_run_fn():
+            time.sleep(SLEEP_TIME)
+            return 42
+
+        node_data = create_mock_node_data("test:slow", "Slow Node", run_fn=slow_run_fn)
+        output_mock = Mock()
+        output_mock.id = OutputId(0)
+        output_mock.enforce = Mock(side_effect=lambda x: x)
+        node_data.outputs = [output_mock]
+
+        node = create_function_node(
+            NodeId("node1"), "test:slow", "Slow Node", slow_run_fn
+        )
+        node.data = node_data
+        executor_setup["chain"].add_node(node)
+
+        recorded_events = []
+        mock_queue = Mock()
+        mock_queue.put = recorded_events.append
+
+        loop = asyncio.get_running_loop()
+        executor = Executor(
+            id=ExecutionId("test-exec"),
+            chain=executor_setup["chain"],
+            send_broadcast_data=False,
+            options=executor_setup["options"],
+            loop=loop,
+            queue=mock_queue,
+            pool=executor_setup["pool"],
+            storage_dir=executor_setup["storage_dir"],
+            profile_events=True,
+        )
+
+        settings = SettingsParser({})
+        context = _ExecutorNodeContext(
+            executor.progress, settings, executor_setup["storage_dir"]
+        )
+        await executor.run_node_async(node, context, [])
+        await executor.run_node_async(node, context, [])
+
+        profile = executor.profiler.profiles[-1]
+        assert profile.node_id == node.id
+        assert profile.iteration == 1
+        assert profile.run >= SLEEP_TIME - TIMING_TOLERANCE
+        assert profile.run < SLEEP_TIME + TIMING_TOLERANCE + 0.1
+
+        executor.send_node_finish(node, 0)
+        profile_events = [
+            e for e in recorded_events if e.get("event") == "node-profile"
+        ]
+        assert len(profile_events) == 1
+        assert profile_events[0]["data"]["nodeId"] == node.id
+        assert profile_events[0]["data"]["iterations"] == 2
+
+    @pytest.mark.asyncio
+    async def test_broadcast_is_charged_to_its_run(self, executor_setup):
+        """Test that broadcast time goes to the profile of the run of the output."""
+
+        def slow_broadcast(value):
+            time.sleep(SLEEP_TIME)
+            return value
+
+        node_data = create_mock_node_data("test:node", "Node", run_fn=lambda: 42)
+        output_mock = Mock()
+        output_mock.id = OutputId(0)
+        output_mock.enforce = Mock(side_effect=lambda x: x)
+        output_mock.get_broadcast_data = Mock(side_effect=slow_broadcast)
+        node_data.outputs = [output_mock]
+
+        node = create_function_node(NodeId("node1"), "test:node", "Node", lambda: 42)
+        node.data = node_data
+        executor_setup["chain"].add_node(node)
+
+        loop = asyncio.get_running_loop()
+        executor = Executor(
+            id=ExecutionId("test-exec"),
+            chain=executor_setup["chain"],
+            send_broadcast_data=True,
+            options=executor_setup["options"],
+            loop=loop,
+            queue=Mock(),
+            pool=executor_setup["pool"],
+            storage_dir=executor_setup["storage_dir"],
+        )
+
+        settings = SettingsParser({})
+        context = _ExecutorNodeContext(
+            executor.progress, settings, executor_setup["storage_dir"]
+        )
+        first = executor.profiler.start(node.id, node.schema_id)
+        output, _ = await executor.run_node_async(node, context, [], first)
+        assert isinstance(output, RegularOutput)
+        # e.g. the next item of a parallel iteration started in the meantime
+        second = executor.profiler.start(node.id, node.schema_id)
+
+        executor.send_node_broadcast(node, output.output, profile=first)
+        await executor._finalize_chain()  # noqa: SLF001
+
+        assert first.broadcast >= SLEEP_TIME - TIMING_TOLERANCE
+        assert second.broadcast == 0
+
+    @pytest.mark.asyncio
+    async def test_disabled(self, executor_setup):
+        """Test that nothing is recorded if profiling is disabled."""
+        node = create_function_node(NodeId("node1"), "test:node", "Node", lambda: None)
+        executor_setup["chain"].add_node(node)
+
+        recorded_events = []
+        mock_queue = Mock()
+        mock_queue.put = recorded_events.append
+
+        loop = asyncio.get_running_loop()
+        executor = Executor(
+            id=ExecutionId("test-exec"),
+            chain=executor_setup["chain"],
+            send_broadcast_data=False,
+            options=executor_setup["options"],
+            loop=loop,
+            queue=mock_queue,
+            pool=executor_setup["pool"],
+            storage_dir=executor_setup["storage_dir"],
+            profile=False,
+            profile_events=True,
+        )
+
+        settings = SettingsParser({})
+        context = _ExecutorNodeContext(
+            executor.progress, settings, executor_setup["storage_dir"]
+        )
+        await executor.run_node_async(node, context, [])
+        executor.send_node_finish(node, 0)
+
+        assert len(executor.profiler.profiles) == 0
+        assert executor.profiler.to_json()["nodes"] == []
+        assert not any(e.get("event") == "node-profile" for e in recorded_events)
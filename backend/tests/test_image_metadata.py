@@ -0,0 +1,93 @@
+"""Tests for header-only image metadata probing."""
+
+from __future__ import annotations
+
+from pathlib import Path
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+from nodes.impl.image_metadata import ImageMetadata, ImageSizeRange, probe_image
+
+
+def save_pil(path: Path, mode: str, size: tuple[int, int] = (7, 5), **kwargs) -> Path:
+    Image.new(mode, size).save(path, **kwargs)
+    return path
+
+
+class TestProbeImage:
+    @pytest.mark.parametrize(
+        ("name", "mode", "expected"),
+        [
+            ("gray.png", "L", ImageMetadata(7, 5, 1, 8, "png")),
+            ("rgb.png", "RGB", ImageMetadata(7, 5, 3, 8, "png")),
+            ("rgba.png", "RGBA", ImageMetadata(7, 5, 4, 8, "png")),
+            ("palette.png", "P", ImageMetadata(7, 5, 3, 8, "png")),
+            ("rgb.jpg", "RGB", ImageMetadata(7, 5, 3, 8, "jpeg")),
+            ("gray.jpg", "L", ImageMetadata(7, 5, 1, 8, "jpeg")),
+            ("rgb.webp", "RGB", ImageMetadata(7, 5, 3, 8, "webp")),
+            ("rgb.tiff", "RGB", ImageMetadata(7, 5, 3, 8, "tiff")),
+        ],
+    )
+    def test_formats(self, tmp_path: Path, name: str, mode: str, expected):
+        assert probe_image(save_pil(tmp_path / name, mode)) == expected
+
+    def test_palette_with_transparency(self, tmp_path: Path):
+        path = save_pil(tmp_path / "palette.png", "P", transparency=0)
+        assert probe_image(path) == ImageMetadata(7, 5, 4, 8, "png")
+
+    def test_lossless_webp_with_alpha(self, tmp_path: Path):
+        path = save_pil(tmp_path / "rgba.webp", "RGBA", lossless=True)
+        assert probe_image(path) == ImageMetadata(7, 5, 4, 8, "webp")
+
+    def test_16_bit_png(self, tmp_path: Path):
+        path = tmp_path / "deep.png"
+        cv2.imwrite(str(path), np.zeros((5, 7, 3), dtype=np.uint16))
+        assert probe_image(path) == ImageMetadata(7, 5, 3, 16, "png")
+
+    def test_progressive_jpeg(self, tmp_path: Path):
+        path = save_pil(tmp_path / "progressive.jpg", "RGB", progressive=True)
+        assert probe_image(path) == ImageMetadata(7, 5, 3, 8, "jpeg")
+
+    def test_missing_file(self, tmp_path: Path):
+        assert probe_image(tmp_path / "missing.png") is None
+
+    def test_directory(self, tmp_path: Path):
+        assert probe_image(tmp_path) is None
+
+    def test_not_an_image(self, tmp_path: Path):
+        path = tmp_path / "text.png"
+        path.write_text("not an image")
+        assert probe_image(path) is None
+
+    def test_truncated_header(self, tmp_path: Path):
+        path = save_pil(tmp_path / "image.png", "RGB")
+        path.write_bytes(path.read_bytes()[:12])
+        assert probe_image(path) is None
+
+
+class TestImageSizeRange:
+    def test_probe(self, tmp_path: Path):
+        paths = [
+            save_pil(tmp_path / "a.png", "RGB", (4, 8)),
+            save_pil(tmp_path / "b.jpg", "RGB", (16, 2)),
+            save_pil(tmp_path / "c.webp", "RGB", (10, 5)),
+        ]
+        assert ImageSizeRange.probe(paths) == ImageSizeRange(4, 16, 2, 8)
+
+    def test_unreadable_file(self, tmp_path: Path):
+        paths = [save_pil(tmp_path / "a.png", "RGB"), tmp_path / "missing.png"]
+        assert ImageSizeRange.probe(paths) == ImageSizeRange(7, 7, 5, 5)
+        assert ImageSizeRange.probe(paths[1:]) is None
+
+    def test_no_files(self):
+        assert ImageSizeRange.probe([]) is None
+
+    def test_too_many_files(self, tmp_path: Path):
+        paths = [save_pil(tmp_path / f"{i}.png", "RGB") for i in range(3)]
+        assert ImageSizeRange.probe(paths, max_files=3) is not None
+        with patch("nodes.impl.image_metadata.probe_image", side_effect=AssertionError):
+            assert ImageSizeRange.probe(paths, max_files=2) is None
@@ -6,6 +6,8 @@ from __future__ import annotations
 
 import importlib.util
 import sys
+import threading
+import time
 from pathlib import Path
 
 # Import Generator and Collector directly from api.iter without triggering api.__init__
@@ -76,6 +78,44 @@ class TestGeneratorFromList:
         assert isinstance(results[1], ValueError)
         assert results[2] == 3
 
+    def test_workers_keep_order(self):
+        """Test that items mapped on a thread pool are yielded in order."""
+
+        def slow_first(x: int, i: int) -> tuple[int, int]:
+            if i == 0:
+                time.sleep(0.05)
+            if i == 3:
+                raise ValueError("Test error")
+            return (x, i)
+
+        gen = Generator.from_list(list(range(10)), slow_first, workers=4)
+        results = list(gen.supplier())
+
+        assert gen.expected_length == 10
+        assert isinstance(results[3], ValueError)
+        assert [r for r in results if not isinstance(r, Exception)] == [
+            (x, x) for x in range(10) if x != 3
+        ]
+
+    def test_workers_map_ahead(self):
+        """Test that items are mapped concurrently, but only a bounded number ahead."""
+        started: list[int] = []
+        barrier = threading.Barrier(2, timeout=5)
+
+        def wait_for_others(x: int, i: int) -> int:
+            started.append(i)
+            if i < 2:
+                # only passes if the first 2 items are mapped at the same time
+                barrier.wait()
+            return x
+
+        gen = Generator.from_list(list(range(100)), wait_for_others, workers=2)
+        iterator = iter(gen.supplier())
+        assert next(iterator) == 0
+        iterator.close()
+
+        assert len(started) <= 3
+
 
 class TestGeneratorFromRange:
     """Test Generator.from_range functionality."""
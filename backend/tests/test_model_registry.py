@@ -0,0 +1,190 @@
+"""Tests for the process-wide model registry."""
+
+from __future__ import annotations
+
+import gc
+import os
+import threading
+from pathlib import Path
+
+import pytest
+
+from model_registry import ModelRegistry
+
+
+class Model:
+    def __init__(self, name: str):
+        self.name = name
+
+
+def _loader(name: str, calls: list[str]):
+    def load() -> Model:
+        calls.append(name)
+        return Model(name)
+
+    return load
+
+
+class TestFileKey:
+    def test_same_content_same_key(self, tmp_path: Path):
+        a = tmp_path / "a.pth"
+        b = tmp_path / "b.pth"
+        a.write_bytes(b"weights")
+        b.write_bytes(b"weights")
+
+        registry = ModelRegistry()
+        assert registry.file_key([a]) == registry.file_key([b])
+
+    def test_options_are_part_of_key(self, tmp_path: Path):
+        a = tmp_path / "a.pth"
+        a.write_bytes(b"weights")
+
+        registry = ModelRegistry()
+        assert registry.file_key([a], fp16=True) != registry.file_key([a], fp16=False)
+        assert registry.file_key([a], fp16=True, device="cpu") == registry.file_key(
+            [a], device="cpu", fp16=True
+        )
+
+    def test_changed_file(self, tmp_path: Path):
+        a = tmp_path / "a.pth"
+        a.write_bytes(b"weights")
+
+        registry = ModelRegistry()
+        before = registry.file_key([a])
+
+        a.write_bytes(b"other weights")
+        stat = a.stat()
+        os.utime(a, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        assert registry.file_key([a]) != before
+
+
+class TestModelRegistry:
+    def test_load_once(self):
+        registry = ModelRegistry()
+        calls: list[str] = []
+
+        a = registry.get_or_load(("a",), _loader("a", calls), lambda _: 10, "a")
+        b = registry.get_or_load(("a",), _loader("a", calls), lambda _: 10, "a")
+
+        assert a is b
+        assert calls == ["a"]
+        assert registry.to_json()[0]["uses"] == 2
+
+    def test_key_of(self):
+        registry = ModelRegistry()
+        a = registry.get_or_load(("a",), _loader("a", []), lambda _: 10, "a")
+
+        assert registry.key_of(a) == ("a",)
+        assert registry.key_of(Model("a")) is None
+
+    def test_concurrent_loads(self):
+        registry = ModelRegistry()
+        calls: list[str] = []
+        barrier = threading.Barrier(4, timeout=5)
+        results: list[Model] = []
+
+        def load() -> Model:
+            calls.append("a")
+            return Model("a")
+
+        def run():
+            barrier.wait()
+            results.append(registry.get_or_load(("a",), load, lambda _: 10))
+
+        threads = [threading.Thread(target=run) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5)
+
+        assert calls == ["a"]
+        assert len(results) == 4
+        assert all(r is results[0] for r in results)
+
+    def test_release_least_recently_used(self):
+        registry = ModelRegistry(max_bytes=25)
+        calls: list[str] = []
+
+        registry.get_or_load(("a",), _loader("a", calls), lambda _: 10, "a")
+        registry.get_or_load(("b",), _loader("b", calls), lambda _: 10, "b")
+        # use a, so b is the least recently used model
+        registry.get_or_load(("a",), _loader("a", calls), lambda _: 10, "a")
+        registry.get_or_load(("c",), _loader("c", calls), lambda _: 10, "c")
+        gc.collect()
+
+        assert registry.resident_bytes == 20
+        assert {m["name"] for m in registry.to_json()} == {"a", "c"}
+
+        registry.get_or_load(("b",), _loader("b", calls), lambda _: 10, "b")
+        assert calls == ["a", "b", "c", "b"]
+
+    def test_released_models_in_use_are_shared(self):
+        registry = ModelRegistry(max_bytes=0)
+        calls: list[str] = []
+
+        a = registry.get_or_load(("a",), _loader("a", calls), lambda _: 10, "a")
+        assert registry.resident_bytes == 0
+
+        # still alive, so it is not loaded again
+        assert registry.get_or_load(("a",), _loader("a", calls), lambda _: 10) is a
+        assert calls == ["a"]
+
+        del a
+        gc.collect()
+        assert len(registry) == 0
+
+        registry.get_or_load(("a",), _loader("a", calls), lambda _: 10)
+        assert calls == ["a", "a"]
+
+    def test_failed_load(self):
+        registry = ModelRegistry()
+
+        def fail() -> Model:
+            raise ValueError("unsupported")
+
+        with pytest.raises(ValueError, match="unsupported"):
+            registry.get_or_load(("a",), fail, lambda _: 10)
+
+        assert len(registry) == 0
+        calls: list[str] = []
+        registry.get_or_load(("a",), _loader("a", calls), lambda _: 10)
+        assert calls == ["a"]
+
+    def test_to_json(self):
+        registry = ModelRegistry(max_bytes=100)
+        registry.get_or_load(("a",), lambda: Model("a"), lambda _: 10, "a.pth")
+        registry.get_or_load(("b",), lambda: Model("b"), lambda _: 20, "b.onnx")
+
+        models = registry.to_json()
+        assert [m["name"] for m in models] == ["b.onnx", "a.pth"]
+        assert [m["size"] for m in models] == [20, 10]
+        assert all(m["resident"] for m in models)
+
+
+class TestSharedPyTorchModels:
+    def test_conversion_does_not_leak(self):
+        """Test that converting a shared model for one consumer doesn't change it for others."""
+        torch = pytest.importorskip("torch")
+        spandrel = pytest.importorskip("spandrel")
+        from spandrel.architectures.Compact import Compact
+
+        from nodes.impl.pytorch.utils import to_device_and_dtype
+
+        def load():
+            net = Compact(num_in_ch=3, num_out_ch=3, num_feat=4, num_conv=1)
+            return spandrel.ModelLoader().load_from_state_dict(net.state_dict())
+
+        registry = ModelRegistry()
+        a = registry.get_or_load(("model",), load, lambda _: 10)
+        cpu = torch.device("cpu")
+
+        # e.g. Convert to ONNX with fp16
+        half = to_device_and_dtype(a, cpu, torch.float16)
+        assert half.dtype == torch.float16
+        assert half is to_device_and_dtype(a, cpu, torch.float16)
+
+        b = registry.get_or_load(("model",), load, lambda _: 10)
+        assert b is a
+        assert b.dtype == torch.float32
+        assert all(p.dtype == torch.float32 for p in b.model.parameters())
+        assert to_device_and_dtype(b, cpu, torch.float32) is b
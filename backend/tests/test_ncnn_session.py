@@ -0,0 +1,217 @@
+"""Tests for the NCNN session cache. A stub `ncnn` module is used."""
+
+from __future__ import annotations
+
+import gc
+import importlib
+import sys
+import threading
+import types
+from unittest.mock import patch
+
+import pytest
+
+
+class StubNet:
+    def __init__(self):
+        self.opt = types.SimpleNamespace(
+            use_winograd_convolution=True,
+            use_sgemm_convolution=True,
+            num_threads=4,
+            openmp_blocktime=20,
+        )
+        self.param: str | None = None
+        self.weights: bytes | None = None
+
+    def load_param_mem(self, param: str):
+        self.param = param
+
+    def load_model_mem(self, weights: bytes):
+        self.weights = weights
+
+
+class StubAllocator:
+    def __init__(self):
+        self.cleared = 0
+
+    def clear(self):
+        self.cleared += 1
+
+
+class StubModel:
+    def __init__(self, param: str, weights: bytes):
+        self.param = param
+        self.bin = weights
+
+    def write_param(self) -> str:
+        return self.param
+
+
+class StubModelWrapper:
+    def __init__(self, model: StubModel):
+        self.model = model
+        self.fp = "fp32"
+
+
+@pytest.fixture(scope="module")
+def session_module():
+    ncnn_module = types.ModuleType("ncnn")
+    ncnn_module.ncnn = types.SimpleNamespace(  # type: ignore
+        Net=StubNet, PoolAllocator=StubAllocator
+    )
+    # `None` makes importing the Vulkan bindings fail
+    with patch.dict(sys.modules, {"ncnn": ncnn_module, "ncnn_vulkan": None}):
+        yield importlib.import_module("nodes.impl.ncnn.session")
+
+
+@pytest.fixture(scope="module")
+def settings(session_module):
+    from packages.chaiNNer_ncnn.settings import NcnnSettings
+
+    return NcnnSettings(
+        gpu_index=0,
+        winograd=True,
+        sgemm=True,
+        threads=4,
+        blocktime=20,
+        budget_limit=0,
+    )
+
+
+def wrapper(param: str = "param", weights: bytes = b"weights") -> StubModelWrapper:
+    return StubModelWrapper(StubModel(param, weights))
+
+
+class TestGetNcnnSession:
+    def test_same_content_shares_net(self, session_module, settings):
+        a, b = wrapper(), wrapper()
+
+        session = session_module.get_ncnn_session(a, settings)
+        assert session_module.get_ncnn_session(b, settings) is session
+        assert session.net.param == "param"
+        assert session.net.weights == b"weights"
+
+    def test_different_content(self, session_module, settings):
+        get = session_module.get_ncnn_session
+        session = get(wrapper(), settings)
+
+        assert get(wrapper("other"), settings) is not session
+        assert get(wrapper(weights=b"other"), settings) is not session
+
+    @pytest.mark.parametrize(
+        "change",
+        [
+            {"threads": 2},
+            {"winograd": False},
+            {"sgemm": False},
+            {"blocktime": 0},
+        ],
+    )
+    def test_settings_are_part_of_key(self, session_module, settings, change):
+        model = wrapper()
+        session = session_module.get_ncnn_session(model, settings)
+        other = session_module.get_ncnn_session(
+            model, type(settings)(**{**vars(settings), **change})
+        )
+
+        assert other is not session
+
+    def test_unrelated_settings_share_net(self, session_module, settings):
+        model = wrapper()
+        session = session_module.get_ncnn_session(model, settings)
+        other = type(settings)(**{**vars(settings), "budget_limit": 2})
+
+        assert session_module.get_ncnn_session(model, other) is session
+
+    def test_session_is_dropped_with_models(self, session_module, settings):
+        model = wrapper()
+        sessions = session_module.__dict__["__sessions"]
+        session_module.get_ncnn_session(model, settings)
+        gc.collect()
+        count = len(sessions)
+
+        del model
+        gc.collect()
+        assert len(sessions) == count - 1
+
+    def test_concurrent_creation(self, session_module, settings, monkeypatch):
+        barrier = threading.Barrier(4, timeout=5)
+        created = []
+        create_ncnn_net = session_module.create_ncnn_net
+
+        def counting_create(*args, **kwargs):
+            created.append(args[0])
+            return create_ncnn_net(*args, **kwargs)
+
+        monkeypatch.setattr(session_module, "create_ncnn_net", counting_create)
+        models = [wrapper("concurrent") for _ in range(4)]
+        results = []
+
+        def run(model: StubModelWrapper):
+            barrier.wait()
+            results.append(session_module.get_ncnn_session(model, settings))
+
+        threads = [threading.Thread(target=run, args=(m,)) for m in models]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5)
+
+        assert len(created) == 1
+        assert len(results) == 4
+        assert all(r is results[0] for r in results)
+
+    def test_slow_creation_does_not_block_other_models(
+        self, session_module, settings, monkeypatch
+    ):
+        cached = wrapper("cached")
+        session = session_module.get_ncnn_session(cached, settings)
+        started, release = threading.Event(), threading.Event()
+        create_ncnn_net = session_module.create_ncnn_net
+
+        def slow_create(model, *args, **kwargs):
+            if model.model.param == "slow":
+                started.set()
+                assert release.wait(5)
+            return create_ncnn_net(model, *args, **kwargs)
+
+        monkeypatch.setattr(session_module, "create_ncnn_net", slow_create)
+        slow = wrapper("slow")
+        thread = threading.Thread(
+            target=session_module.get_ncnn_session, args=(slow, settings)
+        )
+        done = threading.Event()
+
+        def lookup():
+            assert session_module.get_ncnn_session(cached, settings) is session
+            session_module.get_ncnn_session(wrapper("new"), settings)
+            done.set()
+
+        thread.start()
+        try:
+            assert started.wait(5)
+            threading.Thread(target=lookup).start()
+            # the lookups don't wait for the slow net
+            assert done.wait(2)
+        finally:
+            release.set()
+            thread.join(5)
+
+
+class TestCpuAllocators:
+    def test_allocators_are_reused_and_cleared(self, session_module, settings):
+        session = session_module.get_ncnn_session(wrapper(), settings)
+
+        with session.cpu_allocators() as first:
+            assert first is not None
+            assert all(a.cleared == 0 for a in first)
+        assert all(a.cleared == 1 for a in first)
+
+        with session.cpu_allocators() as second:
+            assert second is first
+
+    def test_concurrent_upscales(self, session_module, settings):
+        session = session_module.get_ncnn_session(wrapper(), settings)
+
+        with session.cpu_allocators() as a, session.cpu_allocators() as b:
+            assert a is not b
@@ -0,0 +1,125 @@
+"""Tests for the output cache of `@cached` nodes."""
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from nodes.node_cache import (
+    CachedNumpyArray,
+    NodeOutputCache,
+    cached,
+    fingerprint_array,
+)
+
+
+class TestCachedNumpyArray:
+    """Tests for arrays stored on disk."""
+
+    def test_roundtrip(self):
+        """Test that the stored array has the same content."""
+        arr = np.arange(24, dtype=np.float32).reshape(2, 3, 4)
+        stored = CachedNumpyArray(arr)
+
+        value = stored.value()
+        assert value.shape == arr.shape
+        assert value.dtype == arr.dtype
+        np.testing.assert_array_equal(value, arr)
+
+    def test_non_contiguous(self):
+        """Test that non-contiguous arrays are stored in C order."""
+        arr = np.arange(12, dtype=np.uint8).reshape(3, 4).T
+        np.testing.assert_array_equal(CachedNumpyArray(arr).value(), arr)
+
+    def test_value_is_read_only_view(self):
+        """Test that hits return the same read-only view without copying."""
+        stored = CachedNumpyArray(np.zeros((4, 4), dtype=np.uint8))
+
+        value = stored.value()
+        assert stored.value() is value
+        assert not value.flags.writeable
+        with pytest.raises(ValueError):
+            value[0, 0] = 1
+
+    def test_empty_array(self):
+        """Test that empty arrays can be stored."""
+        stored = CachedNumpyArray(np.zeros((0, 3), dtype=np.float32))
+        assert stored.value().shape == (0, 3)
+
+    def test_close_keeps_views_valid(self):
+        """Test that views handed out stay valid after the file is closed."""
+        arr = np.arange(16, dtype=np.uint8)
+        stored = CachedNumpyArray(arr)
+        value = stored.value()
+
+        stored.close()
+        np.testing.assert_array_equal(value, arr)
+
+
+class TestFingerprint:
+    """Tests for array fingerprints."""
+
+    def test_equal_content(self):
+        """Test that arrays with the same content have the same fingerprint."""
+        a = np.arange(100, dtype=np.float32)
+        assert fingerprint_array(a) == fingerprint_array(a.copy())
+
+    def test_different_content(self):
+        """Test that arrays with different content have different fingerprints."""
+        a = np.arange(100, dtype=np.float32)
+        b = a.copy()
+        b[50] = -1
+        assert fingerprint_array(a) != fingerprint_array(b)
+
+    def test_views_are_not_confused_with_their_base(self):
+        """Test that a view of an array is fingerprinted by its own content."""
+        a = np.arange(100, dtype=np.uint8)
+        assert fingerprint_array(a) != fingerprint_array(a[::2])
+
+
+class TestCached:
+    """Tests for the `@cached` decorator."""
+
+    def test_hit_skips_run(self):
+        """Test that the node only runs once for the same inputs."""
+        calls: list[int] = []
+
+        @cached
+        def run(img: np.ndarray, amount: int) -> np.ndarray:
+            calls.append(amount)
+            return img * amount
+
+        img = np.ones((8, 8), dtype=np.float32)
+        first = run(img, 2)
+        second = run(img.copy(), 2)
+
+        assert calls == [2]
+        np.testing.assert_array_equal(first, second)
+
+        run(img, 3)
+        assert calls == [2, 3]
+
+    def test_multiple_outputs(self):
+        """Test that nodes with multiple outputs are cached."""
+
+        @cached
+        def run(img: np.ndarray) -> tuple[np.ndarray, int]:
+            return img + 1, 5
+
+        img = np.zeros(4, dtype=np.uint8)
+        run(img)
+        out_img, out_int = run(img)  # type: ignore
+
+        np.testing.assert_array_equal(out_img, img + 1)
+        assert out_int == 5
+
+    def test_drop_closes_files(self):
+        """Test that dropped entries release their files."""
+        cache = NodeOutputCache()
+        cache.put([1], np.zeros(16, dtype=np.uint8))
+        (key,) = cache._data.keys()  # noqa: SLF001
+        (stored,) = cache._data[key]  # noqa: SLF001
+
+        cache.drop(key)
+        assert cache.empty()
+        assert stored.file is None
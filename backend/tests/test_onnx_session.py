@@ -0,0 +1,368 @@
+"""Tests for the ONNX session pool. Only the CPU execution provider is used."""
+
+from __future__ import annotations
+
+import gc
+import threading
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+onnx = pytest.importorskip("onnx")
+ort = pytest.importorskip("onnxruntime")
+
+import nodes.impl.onnx.session as session_module  # noqa: E402
+from nodes.impl.onnx.auto_split import _TileRunner, onnx_auto_split  # noqa: E402
+from nodes.impl.onnx.model import OnnxGeneric, OnnxInfo, SizeReq  # noqa: E402
+from nodes.impl.onnx.session import (  # noqa: E402
+    SessionConfig,
+    SessionPool,
+    create_session,
+)
+from nodes.impl.upscale.tiler import MaxTileSize, NoTiling  # noqa: E402
+
+CPU = SessionConfig(gpu_index=0, execution_provider="CPUExecutionProvider")
+
+
+def _model(
+    nodes: list,
+    input_shape: list,
+    output_shape: list,
+    initializers: list | None = None,
+) -> OnnxGeneric:
+    helper = onnx.helper
+    graph = helper.make_graph(
+        nodes,
+        "test",
+        [helper.make_tensor_value_info("input", onnx.TensorProto.FLOAT, input_shape)],
+        [helper.make_tensor_value_info("output", onnx.TensorProto.FLOAT, output_shape)],
+        initializer=initializers,
+    )
+    model = helper.make_model(
+        graph, opset_imports=[helper.make_opsetid("", 13)], ir_version=8
+    )
+    return OnnxGeneric(model.SerializeToString(), OnnxInfo(opset=13, dtype="fp32"))
+
+
+def _identity_model(shape: list | None = None) -> OnnxGeneric:
+    shape = shape or [1, 3, "height", "width"]
+    return _model(
+        [onnx.helper.make_node("Identity", ["input"], ["output"])], shape, shape
+    )
+
+
+def _upscale_model() -> OnnxGeneric:
+    """A model that upscales 2x with nearest-neighbor interpolation."""
+    helper = onnx.helper
+    scales = helper.make_tensor(
+        "scales", onnx.TensorProto.FLOAT, [4], [1.0, 1.0, 2.0, 2.0]
+    )
+    resize = helper.make_node(
+        "Resize", ["input", "", "scales"], ["output"], mode="nearest"
+    )
+    return _model(
+        [resize],
+        ["batch", 3, "height", "width"],
+        ["batch", 3, "out_height", "out_width"],
+        [scales],
+    )
+
+
+def _image(h: int, w: int, c: int = 3) -> np.ndarray:
+    return np.random.default_rng(0).random((h, w, c), dtype=np.float32)
+
+
+class CountingSession:
+    def __init__(self, session: ort.InferenceSession):
+        self.session = session
+        self.runs = 0
+
+    def __getattr__(self, name: str):
+        return getattr(self.session, name)
+
+    def run(self, *args, **kwargs):
+        self.runs += 1
+        return self.session.run(*args, **kwargs)
+
+    def run_with_iobinding(self, *args, **kwargs):
+        self.runs += 1
+        return self.session.run_with_iobinding(*args, **kwargs)
+
+
+class TestSessionPool:
+    def test_same_config(self):
+        pool = SessionPool()
+        model = _identity_model()
+
+        assert pool.get(model, CPU) is pool.get(model, CPU)
+        assert len(pool) == 1
+
+    def test_different_configs_are_kept(self):
+        pool = SessionPool()
+        model = _identity_model()
+        single = SessionConfig(0, "CPUExecutionProvider", intra_op_threads=1)
+
+        a = pool.get(model, CPU)
+        b = pool.get(model, single)
+        assert a is not b
+        assert pool.get(model, CPU) is a
+        assert pool.get(model, single) is b
+        assert len(pool) == 2
+
+    def test_max_per_model(self):
+        pool = SessionPool(max_per_model=2)
+        model = _identity_model()
+
+        a = pool.get(model, CPU)
+        pool.get(model, SessionConfig(0, "CPUExecutionProvider", intra_op_threads=1))
+        pool.get(model, SessionConfig(0, "CPUExecutionProvider", intra_op_threads=2))
+
+        assert len(pool) == 2
+        assert pool.get(model, CPU) is not a
+
+    def test_sessions_are_dropped_with_model(self):
+        pool = SessionPool()
+        model = _identity_model()
+        pool.get(model, CPU)
+
+        del model
+        gc.collect()
+        assert len(pool) == 0
+
+    def test_slow_creation_does_not_block_other_sessions(self, monkeypatch):
+        pool = SessionPool()
+        cached_model, slow_model = _identity_model(), _identity_model()
+        cached = pool.get(cached_model, CPU)
+
+        started, release = threading.Event(), threading.Event()
+
+        def slow_create(model, config):
+            started.set()
+            assert release.wait(5)
+            return create_session(model, config)
+
+        monkeypatch.setattr(session_module, "create_session", slow_create)
+        thread = threading.Thread(target=pool.get, args=(slow_model, CPU))
+        thread.start()
+        try:
+            assert started.wait(5)
+            assert pool.get(cached_model, CPU) is cached
+        finally:
+            release.set()
+            thread.join(5)
+        assert len(pool) == 2
+
+    def test_concurrent_creation(self, monkeypatch):
+        pool = SessionPool()
+        model = _identity_model()
+        barrier = threading.Barrier(4, timeout=5)
+        created: list[SessionConfig] = []
+
+        def counting_create(model, config):
+            created.append(config)
+            return create_session(model, config)
+
+        monkeypatch.setattr(session_module, "create_session", counting_create)
+        results = []
+
+        def run():
+            barrier.wait()
+            results.append(pool.get(model, CPU))
+
+        threads = [threading.Thread(target=run) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5)
+
+        assert created == [CPU]
+        assert len(results) == 4
+        assert all(r is results[0] for r in results)
+
+    def test_session_options(self):
+        config = SessionConfig(
+            0,
+            "CPUExecutionProvider",
+            intra_op_threads=2,
+            graph_optimization="basic",
+            cpu_memory_arena=False,
+        )
+        options = config.get_session_options()
+
+        assert options.intra_op_num_threads == 2
+        assert (
+            options.graph_optimization_level
+            == ort.GraphOptimizationLevel.ORT_ENABLE_BASIC
+        )
+        assert not options.enable_cpu_mem_arena
+
+    def test_warm_up_once_per_shape(self):
+        pool = SessionPool()
+        session = CountingSession(pool.get(_identity_model(), CPU))
+
+        pool.warm_up(session, (1, 3, 64, 64))  # type: ignore
+        pool.warm_up(session, (1, 3, 64, 64))  # type: ignore
+        pool.warm_up(session, (1, 3, 32, 64))  # type: ignore
+        assert session.runs == 2
+
+
+class TestOptimizedModelCache:
+    def test_store_and_load(self, tmp_path: Path):
+        model = _identity_model()
+        config = SessionConfig(
+            0, "CPUExecutionProvider", optimized_model_cache_path=str(tmp_path)
+        )
+
+        create_session(model, config)
+        stored = list(tmp_path.iterdir())
+        assert [p.name for p in stored] == [f"{config.optimized_model_key(model)}.onnx"]
+
+        session = create_session(model, config)
+        assert session.get_inputs()[0].name == "input"
+        assert list(tmp_path.iterdir()) == stored
+
+    def test_key_depends_on_options(self, tmp_path: Path):
+        model = _identity_model()
+        a = SessionConfig(0, "CPUExecutionProvider", optimized_model_cache_path="a")
+        b = SessionConfig(
+            0,
+            "CPUExecutionProvider",
+            graph_optimization="basic",
+            optimized_model_cache_path="b",
+        )
+
+        assert a.optimized_model_key(model) != b.optimized_model_key(model)
+        assert (
+            SessionConfig(0, "CPUExecutionProvider").optimized_model_key(model) is None
+        )
+
+    def test_invalid_stored_model(self, tmp_path: Path):
+        model = _identity_model()
+        config = SessionConfig(
+            0, "CPUExecutionProvider", optimized_model_cache_path=str(tmp_path)
+        )
+        path = tmp_path / f"{config.optimized_model_key(model)}.onnx"
+        path.write_bytes(b"not a model")
+
+        session = create_session(model, config)
+        assert session.get_inputs()[0].name == "input"
+        assert path.read_bytes() != b"not a model"
+
+    def test_store_error(self, tmp_path: Path, monkeypatch):
+        model = _identity_model()
+        config = SessionConfig(
+            0, "CPUExecutionProvider", optimized_model_cache_path=str(tmp_path)
+        )
+        created = []
+        inference_session = ort.InferenceSession
+
+        def counting_session(*args, **kwargs):
+            created.append(args[0])
+            return inference_session(*args, **kwargs)
+
+        def replace(src, dst):
+            raise PermissionError("read-only")
+
+        monkeypatch.setattr(ort, "InferenceSession", counting_session)
+        monkeypatch.setattr(session_module.os, "replace", replace)
+
+        session = create_session(model, config)
+        assert session.get_inputs()[0].name == "input"
+        # the session is not created a second time without the cache
+        assert created == [model.bytes]
+        assert list(tmp_path.iterdir()) == []
+
+
+class TestAutoSplit:
+    def test_tiles(self):
+        session = create_session(_identity_model(), CPU)
+        img = _image(40, 50)
+
+        result = onnx_auto_split(img, session, False, MaxTileSize(24))
+        np.testing.assert_allclose(result, img, atol=1e-6)
+
+    def test_padding(self):
+        session = create_session(_upscale_model(), CPU)
+        img = _image(11, 13)
+
+        result = onnx_auto_split(
+            img, session, False, NoTiling(), size_req=SizeReq(multiple_of=8)
+        )
+        np.testing.assert_array_equal(result, img.repeat(2, 0).repeat(2, 1))
+
+    def test_channel_order(self):
+        # the model sees RGB, so its first channel is the red (last) image channel
+        helper = onnx.helper
+        starts = helper.make_tensor("starts", onnx.TensorProto.INT64, [1], [0])
+        ends = helper.make_tensor("ends", onnx.TensorProto.INT64, [1], [1])
+        axes = helper.make_tensor("axes", onnx.TensorProto.INT64, [1], [1])
+        model = _model(
+            [
+                helper.make_node(
+                    "Slice", ["input", "starts", "ends", "axes"], ["output"]
+                )
+            ],
+            [1, 3, "height", "width"],
+            [1, 1, "height", "width"],
+            [starts, ends, axes],
+        )
+        session = create_session(model, CPU)
+        img = _image(8, 8)
+
+        result = onnx_auto_split(img, session, False, NoTiling())
+        np.testing.assert_array_equal(result, img[:, :, 2:3])
+
+    def test_channels_last(self):
+        session = create_session(_identity_model([1, "height", "width", 4]), CPU)
+        img = _image(9, 7, 4)
+
+        result = onnx_auto_split(
+            img, session, True, NoTiling(), size_req=SizeReq(multiple_of=4)
+        )
+        np.testing.assert_array_equal(result, img)
+
+    def test_batches(self):
+        session = CountingSession(create_session(_upscale_model(), CPU))
+        img = _image(24, 96)
+
+        result = onnx_auto_split(
+            img,
+            session,  # type: ignore
+            False,
+            MaxTileSize(24),
+            size_req=SizeReq(multiple_of=8),
+            max_batch_pixels=4 * 32 * 32,
+        )
+        np.testing.assert_array_equal(result, img.repeat(2, 0).repeat(2, 1))
+        # only the 2 inner tiles of the 4 have the same size
+        assert session.runs == 3
+
+
+class TestTileRunner:
+    def test_batch_of_two(self):
+        session = create_session(_upscale_model(), CPU)
+        runner = _TileRunner(session, False, SizeReq(multiple_of=8))
+        tiles = [_image(5, 6), 1 - _image(5, 6)]
+
+        for _ in range(2):
+            results = runner.run(tiles)
+            assert len(results) == 2
+            for tile, result in zip(tiles, results, strict=True):
+                np.testing.assert_array_equal(result, tile.repeat(2, 0).repeat(2, 1))
+        assert len(runner._buffers) == 1  # noqa: SLF001
+
+    def test_output_without_batch_dimension(self):
+        # averaging over the batch is the identity for a single tile
+        mean = onnx.helper.make_node(
+            "ReduceMean", ["input"], ["output"], axes=[0], keepdims=0
+        )
+        model = _model([mean], ["batch", 3, "height", "width"], [3, "height", "width"])
+        runner = _TileRunner(create_session(model, CPU), False, SizeReq(multiple_of=4))
+        tiles = [_image(5, 6), 1 - _image(5, 6)]
+
+        assert len(runner.run(tiles[:1])) == 1
+        results = runner.run(tiles)
+        assert len(results) == 2
+        for tile, result in zip(tiles, results, strict=True):
+            np.testing.assert_allclose(result, tile, atol=1e-6)
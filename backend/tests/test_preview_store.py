@@ -0,0 +1,119 @@
+"""Tests for the preview store that serves broadcast image previews."""
+
+from __future__ import annotations
+
+import threading
+
+from preview_store import PreviewStore, preview_etag, preview_url
+
+
+class TestPreviewStore:
+    def test_encode_once_on_first_get(self):
+        calls: list[int] = []
+
+        def encode():
+            calls.append(1)
+            return b"png-data", "image/png"
+
+        store = PreviewStore(max_bytes=1000)
+        preview_id = store.add(100, encode)
+
+        assert preview_id in store
+        assert calls == []
+        assert store.get(preview_id) == (b"png-data", "image/png")
+        assert store.get(preview_id) == (b"png-data", "image/png")
+        assert calls == [1]
+
+    def test_add_encoded(self):
+        store = PreviewStore(max_bytes=1000)
+        preview_id = store.add_encoded((b"jpeg-data", "image/jpeg"))
+
+        assert store.get(preview_id) == (b"jpeg-data", "image/jpeg")
+
+    def test_encoded_size_counts_towards_limit(self):
+        store = PreviewStore(max_bytes=15)
+        first = store.add_encoded((b"x" * 10, "image/png"))
+        second = store.add_encoded((b"y" * 10, "image/png"))
+
+        assert first not in store
+        assert second in store
+
+    def test_unknown_id(self):
+        store = PreviewStore(max_bytes=1000)
+        assert store.get("missing") is None
+        assert "missing" not in store
+
+    def test_unique_ids(self):
+        store = PreviewStore(max_bytes=1000)
+        ids = {store.add(1, lambda: (b"", "image/png")) for _ in range(50)}
+        assert len(ids) == 50
+
+    def test_evicts_oldest_by_size(self):
+        store = PreviewStore(max_bytes=250)
+        first = store.add(100, lambda: (b"1", "image/png"))
+        second = store.add(100, lambda: (b"2", "image/png"))
+        third = store.add(100, lambda: (b"3", "image/png"))
+
+        assert first not in store
+        assert second in store
+        assert third in store
+        assert len(store) == 2
+
+    def test_keeps_single_oversized_entry(self):
+        store = PreviewStore(max_bytes=10)
+        preview_id = store.add(100, lambda: (b"big", "image/png"))
+        assert store.get(preview_id) == (b"big", "image/png")
+
+    def test_size_shrinks_after_encoding(self):
+        store = PreviewStore(max_bytes=250)
+        first = store.add(200, lambda: (b"x" * 10, "image/png"))
+        store.get(first)
+        # the encoded preview only takes 10 bytes, so there is room for another
+        second = store.add(200, lambda: (b"y", "image/png"))
+
+        assert first in store
+        assert second in store
+
+    def test_concurrent_get_encodes_once(self):
+        calls: list[int] = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def encode():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return b"data", "image/webp"
+
+        store = PreviewStore(max_bytes=1000)
+        preview_id = store.add(100, encode)
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(store.get(preview_id)))
+            for _ in range(4)
+        ]
+        for t in threads:
+            t.start()
+        started.wait(5)
+        release.set()
+        for t in threads:
+            t.join(5)
+
+        assert calls == [1]
+        assert results == [(b"data", "image/webp")] * 4
+
+    def test_clear(self):
+        store = PreviewStore(max_bytes=1000)
+        preview_id = store.add(100, lambda: (b"", "image/png"))
+        store.clear()
+        assert preview_id not in store
+        assert len(store) == 0
+
+
+def test_preview_url():
+    assert preview_url("abc") == "/preview/abc"
+
+
+def test_preview_etag():
+    assert preview_etag("abc") == '"abc"'
@@ -0,0 +1,133 @@
+"""Tests for the per-node execution profiler."""
+
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from api import NodeId
+from process_common import ExecutionId
+from profiler import ExecutionProfiler
+
+
+def test_iterations_are_counted_per_node():
+    """Test that every run of a node gets its own profile."""
+    profiler = ExecutionProfiler(ExecutionId("test"))
+    a0 = profiler.start(NodeId("a"), "test:a")
+    b0 = profiler.start(NodeId("b"), "test:b")
+    a1 = profiler.start(NodeId("a"), "test:a")
+
+    assert (a0.iteration, b0.iteration, a1.iteration) == (0, 0, 1)
+    assert list(profiler.profiles) == [a0, b0, a1]
+
+
+def test_upstream_wait_is_attributed_to_the_next_run():
+    """Test that upstream wait recorded before a run ends up in its profile."""
+    profiler = ExecutionProfiler(ExecutionId("test"))
+    profiler.add_upstream_wait(NodeId("a"), 1.0)
+    profiler.add_upstream_wait(NodeId("a"), 0.5)
+
+    assert profiler.start(NodeId("a"), "test:a").upstream_wait == 1.5
+    assert profiler.start(NodeId("a"), "test:a").upstream_wait == 0
+
+
+def test_queue_wait():
+    """Test that time waiting for a busy thread pool is recorded."""
+    profiler = ExecutionProfiler(ExecutionId("test"))
+    profile = profiler.start(NodeId("a"), "test:a")
+    release = threading.Event()
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pool.submit(release.wait)
+        future = pool.submit(profile.queued(lambda: 42))
+        time.sleep(0.05)
+        release.set()
+        assert future.result() == 42
+
+    assert profile.queue_wait >= 0.04
+
+
+def test_measure():
+    """Test that measured phases add up."""
+    profiler = ExecutionProfiler(ExecutionId("test"))
+    profile = profiler.start(NodeId("a"), "test:a")
+    with profile.measure("run"):
+        time.sleep(0.02)
+    profile.add("run", 1)
+
+    assert profile.run >= 1.02
+    assert profile.enforce == 0
+
+
+def test_to_json():
+    """Test that the profile of an execution summarizes each node."""
+    profiler = ExecutionProfiler(ExecutionId("test"))
+    for run, output_bytes in [(1, 100), (3, 300), (2, 200)]:
+        profile = profiler.start(NodeId("a"), "test:a")
+        profile.add("run", run)
+        profile.add("broadcast", 0.5)
+        profile.set_output_bytes(output_bytes)
+    profiler.start(NodeId("b"), "test:b")
+    profiler.finish()
+
+    data = profiler.to_json()
+    assert data["executionId"] == "test"
+    assert [p["iteration"] for p in data["iterations"]] == [0, 1, 2, 0]
+    assert data["droppedIterations"] == 0
+
+    summary = data["nodes"][0]
+    assert summary["nodeId"] == "a"
+    assert summary["iterations"] == 3
+    assert summary["run"] == 6
+    assert summary["minRun"] == 1
+    assert summary["maxRun"] == 3
+    assert summary["broadcast"] == 1.5
+    assert summary["peakOutputBytes"] == 300
+    assert profiler.summary(NodeId("b")) == data["nodes"][1]
+    assert profiler.summary(NodeId("c")) is None
+
+
+def test_iterations_are_capped():
+    """Test that only the latest profiles are kept, while the summary counts all."""
+    profiler = ExecutionProfiler(ExecutionId("test"), max_iterations=3)
+    for _ in range(10):
+        profiler.start(NodeId("a"), "test:a").add("run", 1)
+
+    data = profiler.to_json()
+    assert [p["iteration"] for p in data["iterations"]] == [7, 8, 9]
+    assert data["droppedIterations"] == 7
+    summary = profiler.summary(NodeId("a"))
+    assert summary is not None
+    assert summary["iterations"] == 10
+    assert summary["run"] == 10
+
+
+def test_summary_is_updated_as_phases_are_recorded():
+    """Test that the summary includes phases recorded after a run started."""
+    profiler = ExecutionProfiler(ExecutionId("test"))
+    profile = profiler.start(NodeId("a"), "test:a")
+    profile.add("run", 2)
+    profiler.start(NodeId("a"), "test:a").add("run", 1)
+
+    # e.g. a broadcast that finishes after the next run started
+    profile.add("broadcast", 0.5)
+
+    summary = profiler.summary(NodeId("a"))
+    assert summary is not None
+    assert summary["broadcast"] == 0.5
+    assert (summary["minRun"], summary["maxRun"]) == (1, 2)
+
+
+def test_disabled():
+    """Test that a disabled profiler records nothing."""
+    profiler = ExecutionProfiler(ExecutionId("test"), enabled=False)
+    profiler.add_upstream_wait(NodeId("a"), 1.0)
+    profile = profiler.start(NodeId("a"), "test:a")
+    profile.add("run", 1)
+
+    assert profile.run == 1
+    assert profiler.summary(NodeId("a")) is None
+    data = profiler.to_json()
+    assert data["nodes"] == []
+    assert data["iterations"] == []
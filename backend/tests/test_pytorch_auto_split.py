@@ -0,0 +1,126 @@
+"""Tests for upscaling images with PyTorch models. Only the CPU is used."""
+
+from __future__ import annotations
+
+import threading
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+spandrel = pytest.importorskip("spandrel")
+
+import nodes.impl.pytorch.auto_split as auto_split_module  # noqa: E402
+from nodes.impl.pytorch.auto_split import pytorch_auto_split  # noqa: E402
+from nodes.impl.upscale.tiler import MaxTileSize, NoTiling  # noqa: E402
+
+CPU = torch.device("cpu")
+
+
+@pytest.fixture(scope="module")
+def model():
+    from spandrel.architectures.Compact import Compact
+
+    torch.manual_seed(0)
+    net = Compact(num_in_ch=3, num_out_ch=3, num_feat=4, num_conv=1, upscale=2)
+    return spandrel.ModelLoader().load_from_state_dict(net.state_dict())
+
+
+def _image(h: int, w: int) -> np.ndarray:
+    return np.random.default_rng(0).random((h, w, 3), dtype=np.float32)
+
+
+def _on_prefetch_thread() -> bool:
+    return threading.current_thread().name.startswith("tile-prefetch")
+
+
+def _sequential(img: np.ndarray, model, **kwargs) -> np.ndarray:
+    """Upscales the image without prefetching."""
+    with pytest.MonkeyPatch.context() as m:
+        m.setattr(
+            auto_split_module._InputPrefetcher,  # noqa: SLF001
+            "prefetch",
+            lambda self, imgs, regions: None,
+        )
+        return pytorch_auto_split(img, model, CPU, False, **kwargs)
+
+
+class TestPrefetch:
+    @pytest.mark.parametrize("max_batch_pixels", [0, 4 * 61 * 48])
+    def test_same_result_as_sequential(self, model, monkeypatch, max_batch_pixels):
+        img = _image(64, 200)
+        tiler = MaxTileSize(32)
+
+        expected = _sequential(img, model, tiler=tiler, max_batch_pixels=0)
+
+        prepared: list[bool] = []
+        prepare_input = auto_split_module._prepare_input  # noqa: SLF001
+
+        def counting_prepare(*args, **kwargs):
+            prepared.append(_on_prefetch_thread())
+            return prepare_input(*args, **kwargs)
+
+        monkeypatch.setattr(auto_split_module, "_prepare_input", counting_prepare)
+        result = pytorch_auto_split(
+            img, model, CPU, False, tiler, max_batch_pixels=max_batch_pixels
+        )
+
+        np.testing.assert_allclose(result, expected, atol=1e-5)
+        # all inputs but the first were prepared on the prefetch thread
+        assert len(prepared) > 1
+        assert prepared.count(False) == 1
+
+    def test_tiles_match_whole_image(self, model):
+        img = _image(64, 200)
+
+        whole = pytorch_auto_split(img, model, CPU, False, NoTiling())
+        tiled = pytorch_auto_split(img, model, CPU, False, MaxTileSize(32))
+
+        assert tiled.shape == (128, 400, 3)
+        np.testing.assert_allclose(tiled, whole, atol=1e-5)
+
+    def test_prefetch_error_reaches_caller(self, model, monkeypatch):
+        img = _image(64, 200)
+        prepare_input = auto_split_module._prepare_input  # noqa: SLF001
+        failed = threading.Event()
+
+        def failing_prepare(*args, **kwargs):
+            if _on_prefetch_thread():
+                failed.set()
+                raise ValueError("unable to prepare tile")
+            return prepare_input(*args, **kwargs)
+
+        monkeypatch.setattr(auto_split_module, "_prepare_input", failing_prepare)
+
+        with pytest.raises(ValueError, match="unable to prepare tile"):
+            pytorch_auto_split(img, model, CPU, False, MaxTileSize(32))
+        assert failed.is_set()
+
+    def test_out_of_memory_disables_prefetch(self, model, monkeypatch):
+        img = _image(64, 200)
+        expected = _sequential(img, model, tiler=MaxTileSize(16))
+
+        forward = type(model.model).forward
+        out_of_memory: list[int] = []
+
+        def limited_forward(self, x):
+            if x.shape[-1] > 50:
+                out_of_memory.append(x.shape[-1])
+                raise RuntimeError("CUDA out of memory. Tried to allocate 2 MiB")
+            return forward(self, x)
+
+        monkeypatch.setattr(type(model.model), "forward", limited_forward)
+        prepared: list[bool] = []
+        prepare_input = auto_split_module._prepare_input  # noqa: SLF001
+
+        def counting_prepare(*args, **kwargs):
+            prepared.append(_on_prefetch_thread())
+            return prepare_input(*args, **kwargs)
+
+        monkeypatch.setattr(auto_split_module, "_prepare_input", counting_prepare)
+        result = pytorch_auto_split(img, model, CPU, False, MaxTileSize(32))
+
+        np.testing.assert_allclose(result, expected, atol=1e-5)
+        assert out_of_memory == [61]
+        # after the split, inputs are only prepared when they are upscaled
+        assert not prepared[-1]
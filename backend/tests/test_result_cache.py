@@ -0,0 +1,284 @@
+"""Tests for the persistent result cache."""
+
+from __future__ import annotations
+
+import os
+from enum import Enum
+from unittest.mock import Mock, patch
+
+import numpy as np
+import pytest
+
+import result_cache
+from api import ExecutionOptions, registry
+from model_registry import ModelRegistry
+from process_common import RegularOutput
+from result_cache import ResultCache
+
+
+class Mode(Enum):
+    A = "a"
+    B = "b"
+
+
+class Model:
+    pass
+
+
+def double(img: np.ndarray) -> np.ndarray:
+    return img * 2
+
+
+def create_node_data(
+    schema_id: str = "test:double",
+    kind: str = "regularNode",
+    side_effects: bool = False,
+) -> Mock:
+    node = Mock()
+    node.schema_id = schema_id
+    node.kind = kind
+    node.side_effects = side_effects
+    node.run = double
+    return node
+
+
+@pytest.fixture
+def package():
+    package = Mock()
+    package.id = "test_package"
+    package.dependencies = []
+    with patch.object(registry, "get_package", return_value=package):
+        yield package
+
+
+@pytest.fixture
+def cache(tmp_path, package):
+    cache = ResultCache(
+        tmp_path / "results", max_bytes=10_000_000, min_execution_time=0
+    )
+    yield cache
+    cache.close()
+
+
+def options(settings: dict | None = None) -> ExecutionOptions:
+    return ExecutionOptions.parse({"test_package": settings or {}})
+
+
+class TestNodeKey:
+    """Tests for the keys of nodes."""
+
+    def test_stable(self, cache):
+        """Test that equal inputs give equal keys."""
+        node = create_node_data()
+        img = np.arange(16, dtype=np.float32)
+        key = cache.node_key(node, {}, [img, 1, "a", Mode.A, None])
+        assert key is not None
+        assert key == cache.node_key(node, {}, [img.copy(), 1, "a", Mode.A, None])
+
+    def test_depends_on_inputs(self, cache):
+        """Test that different inputs give different keys."""
+        node = create_node_data()
+        img = np.arange(16, dtype=np.float32)
+        key = cache.node_key(node, {}, [img, Mode.A])
+        assert key != cache.node_key(node, {}, [img + 1, Mode.A])
+        assert key != cache.node_key(node, {}, [img, Mode.B])
+
+    def test_depends_on_schema_and_settings(self, cache):
+        """Test that the schema id and package settings are part of the key."""
+        key = cache.node_key(create_node_data(), {"fp16": False}, [1])
+        assert key != cache.node_key(
+            create_node_data("test:other"), {"fp16": False}, [1]
+        )
+        assert key != cache.node_key(create_node_data(), {"fp16": True}, [1])
+
+    def test_depends_on_file_contents(self, cache, tmp_path):
+        """Test that file paths are keyed by the state of the file."""
+        file = tmp_path / "image.png"
+        file.write_bytes(b"1")
+        node = create_node_data()
+        key = cache.node_key(node, {}, [file])
+
+        file.write_bytes(b"22")
+        os.utime(file, ns=(1, 1))
+        assert key != cache.node_key(node, {}, [file])
+
+    def test_depends_on_shared_code(self, cache):
+        """Test that changes to the shared code of nodes give different keys."""
+        node = create_node_data()
+        key = cache.node_key(node, {}, [1])
+
+        with (
+            patch.object(result_cache, "_SHARED_CODE_VERSION", b"changed"),
+            patch.object(result_cache, "_NODE_VERSIONS", {}),
+        ):
+            assert key != cache.node_key(node, {}, [1])
+
+    def test_remember_outputs(self, cache):
+        """Test that each output of a node is fingerprinted separately."""
+        a, b = Model(), Model()
+        cache.remember("00" * 32, [a, b])
+        key_a = cache.node_key(create_node_data(), {}, [a])
+        assert key_a is not None
+        assert key_a != cache.node_key(create_node_data(), {}, [b])
+
+    def test_unsupported_input(self, cache):
+        """Test that nodes with inputs that cannot be fingerprinted have no key."""
+        assert cache.node_key(create_node_data(), {}, [object()]) is None
+
+    def test_outputs_of_cached_nodes(self, cache):
+        """Test that outputs of keyed nodes are fingerprinted by their node's key."""
+        model = Model()
+        assert cache.node_key(create_node_data(), {}, [model]) is None
+        cache.remember("00" * 32, [model])
+        assert cache.node_key(create_node_data(), {}, [model]) is not None
+
+
+class TestStorage:
+    """Tests for storing and loading entries."""
+
+    def test_roundtrip(self, cache):
+        """Test that stored outputs can be loaded."""
+        cache.put("ab" * 32, "test_package", [np.ones(4, dtype=np.uint8), 5])
+        output = cache.get("ab" * 32)
+        assert output is not None
+        np.testing.assert_array_equal(output[0], np.ones(4, dtype=np.uint8))
+        assert output[1] == 5
+        assert cache.get("cd" * 32) is None
+
+    def test_persistent(self, cache, tmp_path):
+        """Test that entries survive reopening the cache."""
+        cache.put("ab" * 32, "test_package", [1])
+        reopened = ResultCache(tmp_path / "results", max_bytes=10_000_000)
+        try:
+            assert reopened.get("ab" * 32) == [1]
+        finally:
+            reopened.close()
+
+    def test_unpicklable(self, cache):
+        """Test that outputs which cannot be pickled are not stored."""
+        cache.put("ab" * 32, "test_package", [lambda: None])
+        assert len(cache) == 0
+        assert cache.get("ab" * 32) is None
+
+    def test_lru_eviction(self, cache):
+        """Test that the least recently used entries are evicted."""
+        cache.put("01" * 32, "test_package", [np.zeros(1000, dtype=np.uint8)])
+        cache.max_bytes = cache.size * 2 + 100
+        cache.put("02" * 32, "test_package", [np.zeros(1000, dtype=np.uint8)])
+        cache.get("01" * 32)
+
+        cache.put("03" * 32, "test_package", [np.zeros(1000, dtype=np.uint8)])
+
+        assert cache.get("01" * 32) is not None
+        assert cache.get("02" * 32) is None
+        assert cache.get("03" * 32) is not None
+        assert cache.size <= cache.max_bytes
+
+    def test_invalidate_package(self, cache):
+        """Test that entries can be removed per package."""
+        cache.put("01" * 32, "test_package", [1])
+        cache.put("02" * 32, "other_package", [2])
+
+        assert cache.invalidate_package("test_package") == 1
+        assert cache.get("01" * 32) is None
+        assert cache.get("02" * 32) == [2]
+
+        cache.clear()
+        assert len(cache) == 0
+
+
+class TestRun:
+    """Tests for running nodes through the cache."""
+
+    def test_hit_skips_run(self, cache):
+        """Test that the node only runs once for the same inputs."""
+        node = create_node_data()
+        calls: list[int] = []
+
+        def run() -> RegularOutput:
+            calls.append(1)
+            return RegularOutput([np.full(4, 2, dtype=np.uint8)])
+
+        img = np.ones(4, dtype=np.uint8)
+        first = cache.run(node, options(), [img], run)
+        second = cache.run(node, options(), [img.copy()], run)
+
+        assert len(calls) == 1
+        assert isinstance(second, RegularOutput)
+        np.testing.assert_array_equal(second.output[0], first.output[0])  # type: ignore
+
+    def test_downstream_of_hit(self, cache):
+        """Test that outputs loaded from the cache key downstream nodes cheaply."""
+        upstream = create_node_data("test:upstream")
+        downstream = create_node_data("test:downstream")
+        img = np.ones(4, dtype=np.uint8)
+
+        def run() -> RegularOutput:
+            return RegularOutput([img * 2])
+
+        out = cache.run(upstream, options(), [img], run)
+        key = cache.node_key(downstream, {}, out.output)  # type: ignore
+
+        hit = cache.run(upstream, options(), [img], run)
+        assert hit.output[0] is not out.output[0]  # type: ignore
+        assert cache.node_key(downstream, {}, hit.output) == key  # type: ignore
+
+    def test_min_execution_time(self, cache):
+        """Test that cheap nodes are not stored."""
+        cache.min_execution_time = 60
+        cache.run(create_node_data(), options(), [1], lambda: RegularOutput([2]))
+        assert len(cache) == 0
+
+    def test_side_effects_are_not_cached(self, cache):
+        """Test that nodes with side effects always run."""
+        node = create_node_data(side_effects=True)
+        calls: list[int] = []
+
+        def run() -> RegularOutput:
+            calls.append(1)
+            return RegularOutput([])
+
+        cache.run(node, options(), [1], run)
+        cache.run(node, options(), [1], run)
+        assert len(calls) == 2
+        assert len(cache) == 0
+
+    def test_downstream_of_loaded_model(self, cache, tmp_path):
+        """Test that upscaling with a model loaded by a node with side effects is cached."""
+        model_file = tmp_path / "model.pth"
+        model_file.write_bytes(b"weights")
+        load_model = create_node_data("test:load_model", side_effects=True)
+        upscale = create_node_data("test:upscale")
+        img = np.ones(4, dtype=np.uint8)
+        upscaled: list[int] = []
+
+        def run_chain(model_registry: ModelRegistry) -> np.ndarray:
+            def load() -> RegularOutput:
+                key = model_registry.file_key([model_file], format="pytorch")
+                return RegularOutput(
+                    [model_registry.get_or_load(key, Model, size_of=lambda _: 1)]
+                )
+
+            def run_upscale() -> RegularOutput:
+                upscaled.append(1)
+                return RegularOutput([img * 2])
+
+            with patch.object(result_cache, "model_registry", model_registry):
+                model = cache.run(load_model, options(), [model_file], load).output
+                out = cache.run(upscale, options(), [*model, img], run_upscale)
+            return out.output[0]  # type: ignore
+
+        models = ModelRegistry()
+        first = run_chain(models)
+        second = run_chain(models)
+        # the model is loaded again after a restart
+        third = run_chain(ModelRegistry())
+
+        assert len(upscaled) == 1
+        np.testing.assert_array_equal(first, second)
+        np.testing.assert_array_equal(first, third)
+
+        # a changed model file is upscaled again
+        model_file.write_bytes(b"other weights")
+        run_chain(models)
+        assert len(upscaled) == 2
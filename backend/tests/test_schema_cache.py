@@ -0,0 +1,67 @@
+"""Tests for the node schema cache."""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+from schema_cache import SchemaCache, schema_key
+
+
+def _write(path: Path, content: str):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding="utf-8")
+
+
+class TestSchemaKey:
+    def test_stable(self, tmp_path: Path):
+        _write(tmp_path / "pkg" / "node.py", "x = 1")
+        assert schema_key([tmp_path / "pkg"]) == schema_key([tmp_path / "pkg"])
+
+    def test_changes_with_modified_file(self, tmp_path: Path):
+        node = tmp_path / "pkg" / "node.py"
+        _write(node, "x = 1")
+        before = schema_key([tmp_path / "pkg"])
+
+        stat = node.stat()
+        os.utime(node, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        assert schema_key([tmp_path / "pkg"]) != before
+
+    def test_changes_with_new_file(self, tmp_path: Path):
+        _write(tmp_path / "pkg" / "node.py", "x = 1")
+        before = schema_key([tmp_path / "pkg"])
+
+        _write(tmp_path / "pkg" / "sub" / "other.py", "y = 2")
+        assert schema_key([tmp_path / "pkg"]) != before
+
+    def test_ignores_non_python_files(self, tmp_path: Path):
+        _write(tmp_path / "pkg" / "node.py", "x = 1")
+        before = schema_key([tmp_path / "pkg"])
+
+        _write(tmp_path / "pkg" / "README.md", "docs")
+        assert schema_key([tmp_path / "pkg"]) == before
+
+
+class TestSchemaCache:
+    def test_missing(self, tmp_path: Path):
+        cache = SchemaCache(tmp_path / "schema-cache.json", "key")
+        assert cache.load() is None
+
+    def test_round_trip(self, tmp_path: Path):
+        schemas = {"nodes": [{"schemaId": "a"}], "categories": []}
+        SchemaCache(tmp_path / "sub" / "schema-cache.json", "key").save(schemas)
+
+        cache = SchemaCache(tmp_path / "sub" / "schema-cache.json", "key")
+        assert cache.load() == schemas
+
+    def test_outdated_key(self, tmp_path: Path):
+        SchemaCache(tmp_path / "schema-cache.json", "old").save({"nodes": []})
+
+        cache = SchemaCache(tmp_path / "schema-cache.json", "new")
+        assert cache.load() is None
+
+    def test_corrupt_file(self, tmp_path: Path):
+        path = tmp_path / "schema-cache.json"
+        path.write_text("{not json", encoding="utf-8")
+
+        assert SchemaCache(path, "key").load() is None
@@ -22,6 +22,19 @@ def test_server_config_default_values():
         assert config.storage_dir is None
         assert config.logs_dir is None
         assert config.trace is False
+        assert config.parallel_lineages == 1
+        assert config.generator_prefetch == 0
+        assert config.parallel_iterations == 1
+        assert config.cache_max_memory == 0
+        assert config.cache_spill_dir is None
+        assert config.result_cache_size == 0
+        assert config.profile is True
+        assert config.profile_events is False
+        assert config.model_cache_size == 0
+        assert config.schema_cache is False
+        assert config.standby_worker is False
+        assert config.unix_socket is None
+        assert config.worker_unix_socket is False
     finally:
         sys.argv = original_argv
 
@@ -110,6 +123,162 @@ def test_server_config_trace():
         sys.argv = original_argv
 
 
+def test_server_config_parallel_lineages():
+    """Test ServerConfig with a parallel lineage limit."""
+    original_argv = sys.argv
+    try:
+        sys.argv = ["server.py", "--parallel-lineages", "3"]
+        config = ServerConfig.parse_argv()
+
+        assert config.parallel_lineages == 3
+
+        sys.argv = ["server.py", "--parallel-lineages", "0"]
+        config = ServerConfig.parse_argv()
+
+        assert config.parallel_lineages == 1
+    finally:
+        sys.argv = original_argv
+
+
+def test_server_config_generator_prefetch():
+    """Test ServerConfig with generator prefetching."""
+    original_argv = sys.argv
+    try:
+        sys.argv = ["server.py", "--generator-prefetch", "4"]
+        config = ServerConfig.parse_argv()
+
+        assert config.generator_prefetch == 4
+    finally:
+        sys.argv = original_argv
+
+
+def test_server_config_parallel_iterations():
+    """Test ServerConfig with parallel iterations."""
+    original_argv = sys.argv
+    try:
+        sys.argv = ["server.py", "--parallel-iterations", "8"]
+        config = ServerConfig.parse_argv()
+
+        assert config.parallel_iterations == 8
+    finally:
+        sys.argv = original_argv
+
+
+def test_server_config_cache_limits():
+    """Test ServerConfig with a limited output cache."""
+    original_argv = sys.argv
+    try:
+        sys.argv = [
+            "server.py",
+            "--cache-max-memory",
+            "4096",
+            "--cache-spill-dir",
+            "/tmp/spill",
+        ]
+        config = ServerConfig.parse_argv()
+
+        assert config.cache_max_memory == 4096
+        assert config.cache_spill_dir == "/tmp/spill"
+    finally:
+        sys.argv = original_argv
+
+
+def test_server_config_result_cache_size():
+    """Test ServerConfig with the persistent result cache enabled."""
+    original_argv = sys.argv
+    try:
+        sys.argv = ["server.py", "--result-cache-size", "20000"]
+        config = ServerConfig.parse_argv()
+
+        assert config.result_cache_size == 20000
+    finally:
+        sys.argv = original_argv
+
+
+def test_server_config_no_profile():
+    """Test ServerConfig with profiling disabled."""
+    original_argv = sys.argv
+    try:
+        sys.argv = ["server.py", "--no-profile"]
+        config = ServerConfig.parse_argv()
+
+        assert config.profile is False
+    finally:
+        sys.argv = original_argv
+
+
+def test_server_config_profile_events():
+    """Test ServerConfig with profile events enabled."""
+    original_argv = sys.argv
+    try:
+        sys.argv = ["server.py", "--profile-events"]
+        config = ServerConfig.parse_argv()
+
+        assert config.profile_events is True
+    finally:
+        sys.argv = original_argv
+
+
+def test_server_config_model_cache_size():
+    """Test ServerConfig with a custom model cache size."""
+    original_argv = sys.argv
+    try:
+        sys.argv = ["server.py", "--model-cache-size", "4096"]
+        config = ServerConfig.parse_argv()
+
+        assert config.model_cache_size == 4096
+    finally:
+        sys.argv = original_argv
+
+
+def test_server_config_schema_cache():
+    """Test ServerConfig with the schema cache enabled."""
+    original_argv = sys.argv
+    try:
+        sys.argv = ["server.py", "--schema-cache"]
+        config = ServerConfig.parse_argv()
+
+        assert config.schema_cache is True
+    finally:
+        sys.argv = original_argv
+
+
+def test_server_config_standby_worker():
+    """Test ServerConfig with the standby worker enabled."""
+    original_argv = sys.argv
+    try:
+        sys.argv = ["server.py", "--standby-worker"]
+        config = ServerConfig.parse_argv()
+
+        assert config.standby_worker is True
+    finally:
+        sys.argv = original_argv
+
+
+def test_server_config_unix_socket():
+    """Test ServerConfig with a Unix domain socket."""
+    original_argv = sys.argv
+    try:
+        sys.argv = ["server.py", "--unix-socket", "/tmp/worker.sock"]
+        config = ServerConfig.parse_argv()
+
+        assert config.unix_socket == "/tmp/worker.sock"
+    finally:
+        sys.argv = original_argv
+
+
+def test_server_config_worker_unix_socket():
+    """Test ServerConfig with the Unix domain socket transport to the worker."""
+    original_argv = sys.argv
+    try:
+        sys.argv = ["server.py", "--worker-unix-socket"]
+        config = ServerConfig.parse_argv()
+
+        assert config.worker_unix_socket is True
+    finally:
+        sys.argv = original_argv
+
+
 def test_server_config_multiple_flags():
     """Test ServerConfig with multiple flags and arguments."""
     original_argv = sys.argv
@@ -0,0 +1,158 @@
+"""Tests for blending tiles into an image."""
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from nodes.impl.upscale.tile_blending import (
+    BlendDirection,
+    StreamingTileBlender,
+    TileBlender,
+    TileOverlap,
+    empty_result,
+    half_sin_blend_fn,
+)
+from nodes.utils.utils import Region
+
+# (tile height, vertical overlap, [(tile width, horizontal overlap)])
+Row = tuple[int, TileOverlap, list[tuple[int, TileOverlap]]]
+
+
+def _grid(w: int, h: int, tile_w: int, tile_h: int, overlap: int) -> list[Row]:
+    """Splits an image into padded tiles the same way auto split does."""
+    img_region = Region(0, 0, w, h)
+    count_x = -(-w // tile_w)
+    count_y = -(-h // tile_h)
+    size_x = -(-w // count_x)
+    size_y = -(-h // count_y)
+
+    rows: list[Row] = []
+    for y in range(count_y):
+        tiles: list[tuple[int, TileOverlap]] = []
+        row_height, row_overlap = 0, TileOverlap(0, 0)
+        for x in range(count_x):
+            tile = Region(x * size_x, y * size_y, size_x, size_y).intersect(img_region)
+            pad = img_region.child_padding(tile).min(overlap)
+            padded = tile.add_padding(pad)
+            tiles.append((padded.width, TileOverlap(pad.left, pad.right)))
+            row_height, row_overlap = padded.height, TileOverlap(pad.top, pad.bottom)
+        rows.append((row_height, row_overlap, tiles))
+    return rows
+
+
+def _tiles(rows: list[Row], c: int, seed: int = 0) -> list[list[np.ndarray]]:
+    # every tile has different content, so that blending is visible everywhere
+    rng = np.random.default_rng(seed)
+    return [
+        [rng.random((height, width, c), dtype=np.float32) for width, _ in tiles]
+        for height, _, tiles in rows
+    ]
+
+
+def _blend(rows: list[Row], tiles: list[list[np.ndarray]], w: int, h: int, c: int):
+    """Blends each row with a `TileBlender` and then the rows with another one."""
+    result = TileBlender(w, h, c, BlendDirection.Y, blend_fn=half_sin_blend_fn)
+    for (height, row_overlap, row), row_tiles in zip(rows, tiles, strict=True):
+        row_blender = TileBlender(w, height, c, BlendDirection.X, half_sin_blend_fn)
+        for (_, overlap), tile in zip(row, row_tiles, strict=True):
+            row_blender.add_tile(tile, overlap)
+        result.add_tile(row_blender.get_result(), row_overlap)
+    return result.get_result()
+
+
+def _stream(
+    rows: list[Row],
+    tiles: list[list[np.ndarray]],
+    blender: StreamingTileBlender,
+) -> np.ndarray:
+    for (height, row_overlap, row), row_tiles in zip(rows, tiles, strict=True):
+        blender.begin_row(height, row_overlap)
+        for (_, overlap), tile in zip(row, row_tiles, strict=True):
+            blender.add_tile(tile, overlap)
+        blender.end_row()
+    return blender.get_result()
+
+
+def _streaming_blender(w: int, h: int, c: int) -> StreamingTileBlender:
+    return StreamingTileBlender(empty_result(h, w, c), blend_fn=half_sin_blend_fn)
+
+
+class TestStreamingTileBlender:
+    @pytest.mark.parametrize(
+        ("w", "h", "tile_w", "tile_h", "overlap"),
+        [
+            (200, 64, 32, 32, 16),
+            (97, 131, 40, 30, 8),
+            (130, 75, 64, 16, 16),
+            (50, 90, 50, 24, 5),
+            (120, 40, 23, 17, 3),
+            (64, 64, 16, 16, 0),
+            (33, 33, 64, 64, 16),
+        ],
+    )
+    def test_same_as_tile_blender(self, w, h, tile_w, tile_h, overlap):
+        rows = _grid(w, h, tile_w, tile_h, overlap)
+        tiles = _tiles(rows, 3)
+
+        expected = _blend(rows, tiles, w, h, 3)
+        result = _stream(rows, tiles, _streaming_blender(w, h, 3))
+
+        assert result.shape == (h, w, 3)
+        np.testing.assert_allclose(result, expected, atol=1e-6)
+        # the first and last rows and columns are covered by tiles
+        np.testing.assert_array_equal(result[0, 0], tiles[0][0][0, 0])
+        np.testing.assert_array_equal(result[-1, -1], tiles[-1][-1][-1, -1])
+        np.testing.assert_array_equal(result[0, -1], tiles[0][-1][0, -1])
+        np.testing.assert_array_equal(result[-1, 0], tiles[-1][0][-1, 0])
+
+    def test_uneven_overlaps(self):
+        # the second row overlaps more than the first row allows, so its start is
+        # cut off, and the last row has a smaller overlap than the one before
+        w, h, c = 60, 70, 4
+        rows: list[Row] = [
+            (24, TileOverlap(0, 4), [(34, TileOverlap(0, 6)), (38, TileOverlap(6, 0))]),
+            (
+                36,
+                TileOverlap(8, 10),
+                [
+                    (20, TileOverlap(0, 2)),
+                    (26, TileOverlap(8, 8)),
+                    (36, TileOverlap(4, 0)),
+                ],
+            ),
+            (34, TileOverlap(2, 0), [(60, TileOverlap(0, 0))]),
+        ]
+        tiles = _tiles(rows, c)
+
+        expected = _blend(rows, tiles, w, h, c)
+        result = _stream(rows, tiles, _streaming_blender(w, h, c))
+
+        np.testing.assert_allclose(result, expected, atol=1e-6)
+
+    def test_grayscale(self):
+        w, h = 45, 37
+        rows = _grid(w, h, 20, 20, 6)
+        tiles = _tiles(rows, 1)
+
+        np.testing.assert_allclose(
+            _stream(rows, tiles, _streaming_blender(w, h, 1)),
+            _blend(rows, tiles, w, h, 1),
+            atol=1e-6,
+        )
+
+    def test_rewind_discards_unfinished_row(self):
+        w, h = 100, 60
+        rows = _grid(w, h, 40, 40, 8)
+        tiles = _tiles(rows, 3)
+        blender = _streaming_blender(w, h, 3)
+
+        # start the first row with other tiles, then start over
+        height, row_overlap, row = rows[0]
+        blender.begin_row(height, row_overlap)
+        blender.add_tile(_tiles(rows, 3, seed=1)[0][0], row[0][1])
+        blender.rewind(0)
+
+        np.testing.assert_allclose(
+            _stream(rows, tiles, blender), _blend(rows, tiles, w, h, 3), atol=1e-6
+        )
@@ -0,0 +1,183 @@
+"""Tests for reading and writing raw video frames."""
+
+from __future__ import annotations
+
+import io
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+import ffmpeg
+import numpy as np
+import pytest
+
+from nodes.impl.ffmpeg import FFMpegEnv
+from nodes.impl.video import (
+    FrameWriter,
+    VideoLoader,
+    VideoMetadata,
+    VideoPixelFormat,
+    _FramePool,
+    to_pixel_format,
+)
+
+PATH = Path("video.mp4")
+METADATA = VideoMetadata(width=4, height=2, fps=25, frame_count=100)
+
+
+@pytest.fixture
+def loader():
+    with patch.object(VideoMetadata, "from_file", return_value=METADATA):
+        return VideoLoader(PATH, FFMpegEnv("ffmpeg", "ffprobe"))
+
+
+class BlockingPipe(io.BytesIO):
+    """A pipe that blocks writes until it is released, like a busy encoder."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+        self.data = b""
+
+    def write(self, b) -> int:
+        self.release.wait()
+        self.data += bytes(b)
+        return len(b)
+
+
+def frame(value: float) -> np.ndarray:
+    return np.full((2, 2, 3), value, dtype=np.float32)
+
+
+class TestFrameWriter:
+    def test_close_writes_all_frames(self):
+        pipe = BlockingPipe()
+        pipe.release.set()
+        writer = FrameWriter(pipe, VideoPixelFormat.BGR24)
+
+        writer.write(frame(0))
+        writer.write(frame(1))
+        writer.close()
+
+        assert pipe.closed
+        assert pipe.data == bytes(12) + bytes([255] * 12)
+
+    def test_abort_discards_frames(self):
+        pipe = BlockingPipe()
+        writer = FrameWriter(pipe, VideoPixelFormat.BGR24, queue_size=2)
+        for i in range(3):
+            writer.write(frame(i))
+
+        # let the encoder continue once the queued frames have been discarded
+        frames = writer._frames  # noqa: SLF001
+        put = frames.put
+
+        def put_and_release(item, *args, **kwargs):
+            if item is None:
+                pipe.release.set()
+            put(item, *args, **kwargs)
+
+        with patch.object(frames, "put", put_and_release):
+            writer.abort()
+
+        assert pipe.closed
+        # only the frame that was being written when aborting is written
+        assert pipe.data == bytes(12)
+
+    def test_write_error(self):
+        class BrokenPipe(io.BytesIO):
+            def write(self, b) -> int:
+                raise BrokenPipeError("ffmpeg exited")
+
+        writer = FrameWriter(BrokenPipe(), VideoPixelFormat.BGR24)
+        writer.write(frame(0))
+
+        with pytest.raises(RuntimeError, match="ffmpeg exited"):
+            writer.close()
+
+
+class TestFrameRange:
+    @pytest.mark.parametrize(
+        ("start", "end", "stride", "expected"),
+        [
+            (0, None, 1, 100),
+            (10, None, 1, 90),
+            (10, 20, 1, 10),
+            (10, 20, 3, 4),
+            (0, None, 3, 34),
+            (0, 1000, 1, 100),
+            (20, 10, 1, 0),
+            (100, None, 1, 0),
+        ],
+    )
+    def test_frame_count(self, loader, start, end, stride, expected):
+        assert loader.frame_count(start, end, stride) == expected
+
+    def test_reader_args(self, loader):
+        args = loader.get_frame_reader(VideoPixelFormat.BGR48).get_args()
+
+        assert args[:2] == ["-i", PATH]
+        assert "-ss" not in args
+        assert "-vframes" not in args
+        assert "-filter_complex" not in args
+        assert args[args.index("-pix_fmt") + 1] == "bgr48le"
+        assert args[-1] == "pipe:"
+
+    def test_reader_args_with_range(self, loader):
+        args = loader.get_frame_reader(
+            VideoPixelFormat.BGR24, start_frame=10, end_frame=20, stride=3
+        ).get_args()
+
+        # the seek is an input option, half a frame before the start
+        assert args[:4] == ["-ss", str(9.5 / 25), "-i", PATH]
+        assert "framestep=3" in args[args.index("-filter_complex") + 1]
+        assert args[args.index("-vframes") + 1] == "4"
+
+    def test_audio_args(self, loader):
+        audio = loader.get_audio_stream(start_frame=50, end_frame=75)
+        args = ffmpeg.output(audio, "audio.wav").get_args()
+
+        assert args[:6] == ["-ss", "2.0", "-t", "1.0", "-i", PATH]
+
+
+class TestFramePool:
+    def test_read_packed(self):
+        pool = _FramePool(4, 2, VideoPixelFormat.BGR24)
+        data = bytes(range(24))
+        stream = io.BufferedReader(io.BytesIO(data * 2))
+
+        first = pool.read(stream)
+        assert first is not None
+        assert first.shape == (2, 4, 3)
+        assert first.tobytes() == data
+        assert first.flags.writeable
+
+        assert pool.read(stream) is not None
+        assert pool.read(stream) is None
+
+    def test_read_planar(self):
+        img = np.random.default_rng(0).random((2, 4, 3), dtype=np.float32)
+        raw = to_pixel_format(img, VideoPixelFormat.GBRPF32)
+        pool = _FramePool(4, 2, VideoPixelFormat.GBRPF32)
+
+        frame = pool.read(io.BufferedReader(io.BytesIO(raw.tobytes())))
+        assert frame is not None
+        np.testing.assert_array_equal(frame, img)
+
+    def test_incomplete_frame(self):
+        pool = _FramePool(4, 2, VideoPixelFormat.BGR24)
+        assert pool.read(io.BufferedReader(io.BytesIO(bytes(23)))) is None
+
+    def test_buffers_are_reused(self):
+        pool = _FramePool(4, 2, VideoPixelFormat.BGR24)
+        stream = io.BufferedReader(io.BytesIO(bytes(24 * 3)))
+
+        def address(frame: np.ndarray | None) -> int:
+            assert frame is not None
+            return frame.__array_interface__["data"][0]
+
+        kept = pool.read(stream)
+        first = address(pool.read(stream))
+        # the buffer of the dropped frame is used for the next frame
+        assert address(pool.read(stream)) == first
+        assert address(kept) != first
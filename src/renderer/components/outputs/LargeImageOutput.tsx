@@ -6,6 +6,7 @@ import { CSSProperties, memo, useEffect, useMemo, useRef, useState } from 'react
 import { useTranslation } from 'react-i18next';
 import { useContextSelector } from 'use-context-selector';
 import { Size } from '../../../common/common-types';
+import { BackendContext } from '../../contexts/BackendContext';
 import { GlobalVolatileContext } from '../../contexts/GlobalNodeState';
 import { useDevicePixelRatio } from '../../hooks/useDevicePixelRatio';
 import { useMemoArray } from '../../hooks/useMemo';
@@ -45,6 +46,7 @@ export const LargeImageOutput = memo(
 
         const dpr = useDevicePixelRatio();
         const zoom = useContextSelector(GlobalVolatileContext, (c) => c.zoom);
+        const backendUrl = useContextSelector(BackendContext, (c) => c.url);
         const realWidth = (currentSize ?? size).width * zoom * dpr;
 
         const { last, stale } = useOutputData<LargeImageBroadcastData>(output.id);
@@ -220,7 +222,7 @@ export const LargeImageOutput = memo(
                                                 : ''
                                         }
                                         draggable={false}
-                                        src={previewImage.url}
+                                        src={`${backendUrl}${previewImage.url}`}
                                         style={imageStyle}
                                         sx={{
                                             imageRendering: